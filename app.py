@@ -1,127 +1,549 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, abort, g, jsonify, request
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from dotenv import load_dotenv
 import random
 import os
+import json
+import hashlib
 import logging
-from logging.handlers import RotatingFileHandler
-from datetime import datetime
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import http_date, parse_accept_header
 import atexit
 from auto_update import init_auto_updater, get_auto_updater
+from health import LIVE_BODY, STALE_ERROR, HealthMonitor, get_health_monitor, init_health_monitor
+from log_pipeline import get_log_pipeline, init_log_pipeline
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, init_metrics
+from profiling import get_profiler, init_profiler, init_request_timing, mark_phase
+from config import Config, get_config
+import ratelimit  # noqa: F401 - registruje úložiště shm:// a redis+lease:// pro Flask-Limiter
+from jokestore import JokeStore, StaleView, StoredJokes
+from ingest import BatchTooLarge, IngestError, IngestLog, parse_ndjson, parse_record, read_lines
+from corpus import CorpusSnapshot, LazyIndex, MappedCorpus, MappedJokes, RenderedView, file_signature, parse_jokes
+from reloader import init_corpus_watcher
+from precompressed import IDENTITY, choose_encoding, compress_variants
+from length_index import LENGTH_PARAMS, LengthIndex, parse_length_limits
+from search import SearchError, SearchIndex
+from shuffle import CursorError, ShuffleCursor
+from wrapping import WrappedJokes, WrappedView, wrap_cache
+from streaming import NDJSON_MIMETYPE, SSE_MIMETYPE, joke_stream
+from functools import partial, wraps
 
 # Načtení environment variables
 load_dotenv()
 
-app = Flask(__name__)
-
-# Konfigurace z environment variables
-app.config['ENV'] = os.getenv('FLASK_ENV', 'production')
-app.config['DEBUG'] = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', os.urandom(24).hex())
-
-# CORS konfigurace - plně otevřená služba pro PrintMastery z celého světa
-# Joker je veřejná služba bez omezení původu požadavků
-CORS(app, resources={
-    r"/*": {
-        "origins": "*",
-        "methods": ["GET", "OPTIONS"],
-        "allow_headers": ["Content-Type"],
-        "expose_headers": ["Content-Type"],
-        "supports_credentials": False,
-        "max_age": 3600
-    }
-})
-
-# Rate limiting - ochrana proti zneužití
-limiter = Limiter(
-    app=app,
-    key_func=get_remote_address,
-    default_limits=[os.getenv('RATE_LIMIT', '100 per minute')],
-    storage_uri=os.getenv('REDIS_URL', 'memory://')
-)
-
-# Logging konfigurace
-if not app.debug:
-    if not os.path.exists('logs'):
-        os.mkdir('logs')
-    file_handler = RotatingFileHandler('logs/joker.log', maxBytes=10240000, backupCount=10)
-    file_handler.setFormatter(logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-    ))
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.setLevel(logging.INFO)
-    app.logger.info('Joker API startup')
+# Logger aplikace (stejný jako app.logger - Flask loguje pod jménem modulu)
+logger = logging.getLogger(__name__)
+
+# Rate limiting - ochrana proti zneužití; výchozí limit, úložiště a strategii dodá create_app
+# z konfigurace (RATELIMIT_ENABLED=false jen pro benchmarky)
+limiter = Limiter(key_func=get_remote_address)
+
+# Požadavek, který ASGI vstup (asgi.py) předal Flasku až po započítání do limitu, nese výsledek
+# nativní kontroly (False = překročeno) - Flask-Limiter ho podruhé nepočítá
+NATIVE_RATE_LIMIT = 'joker.rate_limit'
+
+@limiter.request_filter
+def charged_natively():
+    """Požadavek už započítaný nativní cestou ASGI se do limitu nepočítá znovu"""
+    return NATIVE_RATE_LIMIT in request.environ
+
+def enforce_native_rate_limit():
+    """Překročení limitu zjištěné nativní cestou vrátí 429 stejným handlerem jako Flask-Limiter"""
+    if request.environ.get(NATIVE_RATE_LIMIT) is False:
+        abort(429)
 
 # Podporované jazyky a kategorie
-SUPPORTED_LANGUAGES = ['cz', 'sk', 'en-gb', 'en-us']
-SUPPORTED_CATEGORIES = ['normal', 'explicit']
+SUPPORTED_LANGUAGES = Config.SUPPORTED_LANGUAGES
+SUPPORTED_CATEGORIES = Config.SUPPORTED_CATEGORIES
 
-# Cache pro vtipy (načte se při startu)
-jokes_cache = {}
+# Volitelný zkompilovaný korpus (python corpus.py compile) sdílený workery přes mmap
+CORPUS_FILE = Config.CORPUS_FILE
+mapped_corpus = None
 
-def load_jokes(language, category):
-    """Načte vtipy ze souboru pro daný jazyk a kategorii"""
-    cache_key = f"{language}_{category}"
+# Volitelné SQLite úložiště (python jokestore.py import) - má přednost před CORPUS_FILE
+CORPUS_DB = Config.CORPUS_DB
+joke_store = None
 
-    # Použití cache pokud existuje
-    if cache_key in jokes_cache:
-        return jokes_cache[cache_key]
+# Přidávání vtipů přes POST /admin/jokes (ingest.py) - prázdný ADMIN_API_KEY endpoint vypíná
+ADMIN_API_KEY = Config.ADMIN_API_KEY
+INGEST_MAX_BATCH = Config.INGEST_MAX_BATCH
+ingest_log = IngestLog(Config.INGEST_LOG)
+ingest_position = None  # (inode, offset) dočteného logu
+ingested = {}  # {klíč: vtipy z logu} - připojí se i k TXT souboru, který se načte znovu
 
-    filename = f"jokes/{language}_{category}.txt"
+# Cache pro vtipy - neměnný snímek, který reload_jokes() atomicky nahrazuje novým
+corpus_snapshot = CorpusSnapshot(0, {}, {}, {})
+reload_lock = threading.Lock()
+reload_errors = {}  # {klíč: chyba posledního neúspěšného načtení} - pro /health/ready
 
-    if not os.path.exists(filename):
-        app.logger.warning(f"Soubor s vtipy nenalezen: {filename}")
-        return []
+# Limity endpointů (stejné hodnoty používá i ASGI vstup asgi.py)
+JOKE_RATE_LIMIT = "200 per minute"
+INFO_RATE_LIMIT = "50 per minute"
+STATS_RATE_LIMIT = "30 per minute"
+STREAM_RATE_LIMIT = "20 per minute"
+SEARCH_RATE_LIMIT = "60 per minute"
+UPDATE_STATUS_RATE_LIMIT = "10 per minute"
+ADMIN_RATE_LIMIT = "30 per minute"
 
-    try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            # Čtení celého obsahu a rozdělení podle dvojitého odřádkování
-            # To umožňuje víceřádkové vtipy oddělené prázdným řádkem
-            content = f.read()
-            jokes = [joke.strip() for joke in content.split('\n\n') if joke.strip()]
+# Klíč podpisu tokenů ?cursor= (HMAC) - odvozený ze SECRET_KEY v create_app
+CURSOR_KEY = b''
 
-        # Uložení do cache
-        jokes_cache[cache_key] = jokes
-        app.logger.info(f"Načteno {len(jokes)} vtipů z {filename}")
+# Dávkový endpoint /jokes - výchozí a maximální počet vtipů v jedné odpovědi
+BATCH_DEFAULT_COUNT = Config.BATCH_DEFAULT_COUNT
+BATCH_MAX_COUNT = Config.BATCH_MAX_COUNT
 
-        return jokes
-    except Exception as e:
-        app.logger.error(f"Chyba při načítání vtipů z {filename}: {str(e)}")
-        return []
+# Streamování /stream - intervaly v sekundách, počet souběžných streamů na worker
+STREAM_DEFAULT_INTERVAL = Config.STREAM_DEFAULT_INTERVAL
+STREAM_MIN_INTERVAL = Config.STREAM_MIN_INTERVAL
+STREAM_HEARTBEAT = Config.STREAM_HEARTBEAT
+STREAM_MAX_DURATION = Config.STREAM_MAX_DURATION
+STREAM_MAX_CONNECTIONS = Config.STREAM_MAX_CONNECTIONS
+stream_slots = threading.BoundedSemaphore(STREAM_MAX_CONNECTIONS)
+
+# Šířky tiskáren pro /joke?width= - zalomené texty se připraví při načtení korpusu
+# (zkompilovaný korpus a SQLite se zalamují při přístupu přes LRU cache o WRAP_CACHE_SIZE vtipech)
+PRINT_WIDTHS = Config.PRINT_WIDTHS
+WRAP_CACHE_SIZE = Config.WRAP_CACHE_SIZE
+wrapped_cache = wrap_cache(WRAP_CACHE_SIZE)
+
+# Vtip intervalu /joke/<interval> - {jméno: délka v sekundách}
+JOKE_PERIODS = Config.JOKE_PERIODS
+
+# Fulltextové vyhledávání /search - index se staví při načtení a reloadu korpusu
+# (nad zkompilovaným korpusem a SQLite až při prvním hledání v záznamu)
+SEARCH_ENABLED = Config.SEARCH_ENABLED
+
+# Bezpečnostní hlavičky - pevná sada, sestavená jednou při startu
+SECURITY_HEADERS = [
+    ('X-Content-Type-Options', 'nosniff'),
+    ('X-Frame-Options', 'DENY'),
+    ('X-XSS-Protection', '1; mode=block'),
+    ('Strict-Transport-Security', 'max-age=31536000; includeSubDomains'),
+    ('Content-Security-Policy', "default-src 'self'"),
+]
+
+# Hlavičky pro předrenderované JSON odpovědi (včetně bezpečnostních)
+JSON_RESPONSE_HEADERS = [('Content-Type', 'application/json')] + SECURITY_HEADERS
+HEALTH_RESPONSE_HEADERS = JSON_RESPONSE_HEADERS + [('Cache-Control', 'no-store')]
+TEXT_RESPONSE_HEADERS = [('Content-Type', 'text/plain; charset=utf-8')] + SECURITY_HEADERS
+
+# Formáty odpovědi /joke (?format=, jinak podle Accept) - compact je JSON jen s polem joke
+JOKE_FORMATS = ('json', 'compact', 'text')
+ACCEPT_FORMATS = {'application/json': 'json', 'text/plain': 'text'}
+
+# Začátek plného JSON těla, který kompaktní tělo vynechává
+FULL_BODY_PREFIX = len(b'{"success":true,')
+
+# Cache-Control pro metadata endpointy (/, /languages, /categories, /stats)
+METADATA_MAX_AGE = Config.METADATA_MAX_AGE
+METADATA_CACHE_CONTROL = f'public, max-age={METADATA_MAX_AGE}'
+# Cachovaná těla od této velikosti (B) dostanou předkomprimované varianty (0 = vypnuto)
+COMPRESS_MIN_SIZE = Config.COMPRESS_MIN_SIZE
+# Značky fází požadavku pro Server-Timing (profiling.py)
+PHASE_TIMING = Config.PHASE_TIMING
+
+def render_joke_body(joke, language, category):
+    """Předrenderuje JSON tělo odpovědi /joke do UTF-8 bytes"""
+    return json.dumps({
+        'success': True,
+        'joke': joke,
+        'language': language,
+        'category': category,
+        'service': 'Joker'
+    }, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+def compact_body(body, language, category):
+    """Kompaktní JSON {"joke": ...} vyřízne z předrenderovaného těla render_joke_body bez nové serializace"""
+    suffix = f',"language":"{language}","category":"{category}","service":"Joker"}}\n'
+    return b'{' + body[FULL_BODY_PREFIX:-len(suffix.encode('utf-8'))] + b'}\n'
+
+def render_compact_body(joke):
+    """Kompaktní JSON tělo jen s textem vtipu"""
+    return json.dumps({'joke': joke}, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+def append_json_field(body, name, value):
+    """Připojí pole na konec předrenderovaného JSON objektu bez nové serializace celého těla"""
+    field = json.dumps({name: value}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return body[:-2] + b',' + field[1:] + b'\n'
+
+# Views s odpovědí cachovanou pro generaci korpusu (jméno -> funkce vracející dict)
+cached_views = {}
+
+def cached_variant(body, etag, encoding, vary):
+    """(tělo, ETag, validátory, hlavičky) jedné varianty cachované odpovědi"""
+    validators = [('ETag', etag), ('Cache-Control', METADATA_CACHE_CONTROL)] + SECURITY_HEADERS
+    if vary:
+        validators.append(('Vary', 'Accept-Encoding'))
+    headers = [('Content-Type', 'application/json')] + validators
+    if encoding != IDENTITY:
+        headers.append(('Content-Encoding', encoding))
+    return body, etag, validators, headers
+
+def cached_json(name, accept_encoding=None):
+    """Vrátí (tělo, ETag, validátory, hlavičky) cachovaného view z aktuálního snímku korpusu
+
+    Komprimované varianty vzniknou spolu s tělem jednou pro generaci, požadavek jen vybere
+    variantu podle Accept-Encoding. Každá varianta má vlastní ETag (jiné bytes).
+    """
+    snapshot = corpus_snapshot
+    variants = snapshot.cache.get(name)
+    if variants is None:
+        body = json.dumps(cached_views[name](), ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        compressed = compress_variants(body, COMPRESS_MIN_SIZE) if COMPRESS_MIN_SIZE else {}
+        # Pořadí = preference serveru, identity jako poslední záloha
+        variants = {encoding: cached_variant(data, f'"{digest}-{encoding}"', encoding, True)
+                    for encoding, data in compressed.items()}
+        variants[IDENTITY] = cached_variant(body, f'"{digest}"', IDENTITY, bool(compressed))
+        snapshot.cache[name] = variants
+    return variants[choose_encoding(accept_encoding, variants)]
+
+def is_not_modified(etag, if_none_match):
+    """Vyhodnotí If-None-Match proti ETagu (slabé porovnání podle RFC 9110)"""
+    return bool(if_none_match) and (etag in if_none_match or if_none_match.strip() == '*')
+
+def cached_per_generation(view):
+    """Dekorátor - JSON odpověď view se sestaví jednou pro generaci korpusu
+
+    Odpověď nese silný ETag (hash těla, stejný ve všech workerech) a Cache-Control.
+    If-None-Match se vyhodnotí dřív, než se sahá na tělo - shoda vrací 304.
+    Hot reload vymění snímek korpusu a tím i cache.
+    """
+    name = view.__name__
+    cached_views[name] = view
+
+    @wraps(view)
+    def wrapper():
+        body, etag, validators, headers = cached_json(name, request.headers.get('Accept-Encoding'))
+        if is_not_modified(etag, request.headers.get('If-None-Match')):
+            return Response(status=304, headers=validators)
+        return Response(body, headers=headers)
+
+    return wrapper
+
+def source_path(language, category):
+    """Vrátí soubor, ze kterého se vtipy pro daný jazyk a kategorii načítají"""
+    if CORPUS_DB:
+        return CORPUS_DB
+    if CORPUS_FILE and os.path.exists(CORPUS_FILE):
+        return CORPUS_FILE
+    return f"jokes/{language}_{category}.txt"
+
+def open_mapped_corpus(signature):
+    """Namapuje zkompilovaný korpus (znovu jen pokud se soubor změnil)"""
+    global mapped_corpus
+    if mapped_corpus is None or mapped_corpus.signature != signature:
+        # Starý mmap se neuzavírá - drží ho snímky, které ještě obsluhují požadavky
+        mapped_corpus = MappedCorpus(CORPUS_FILE)
+        logger.info(f"Namapován korpus {CORPUS_FILE} ({mapped_corpus.blob_size} B textu)")
+    return mapped_corpus
+
+def open_joke_store():
+    """Vrátí úložiště CORPUS_DB (spojení si každý proces otevírá sám)"""
+    global joke_store
+    if joke_store is None or joke_store.path != CORPUS_DB:
+        joke_store = JokeStore(CORPUS_DB)
+    return joke_store
+
+def source_signature(language, category, filename, versions):
+    """Podpis zdroje záznamu - u SQLite (cesta, verze, počet, rewritten) z tabulky entries,
+    jinak podpis souboru"""
+    if filename == CORPUS_DB:
+        return (filename,) + versions.get((language, category), (0, 0, 0))
+    return file_signature(filename)
+
+def appended_only(previous, signature):
+    """Záznam SQLite od minulého načtení jen přibyl na konci (add, /admin/jokes) - stejná
+    databáze, stejné rewritten a víc vtipů; smazání nebo import znamená nové načtení"""
+    return (bool(previous) and previous[0] == signature[0] == CORPUS_DB
+            and previous[3] == signature[3] and previous[2] < signature[2])
+
+def read_jokes(language, category, filename, signature, view=None):
+    """Načte vtipy a předrenderovaná těla pro jeden záznam, vrátí (vtipy, těla)"""
+    # SQLite úložiště - vtip je vyhledání podle klíče ve čtecím snímku view
+    if filename == CORPUS_DB:
+        jokes = view.get(language, category)
+        if jokes is None:
+            return [], []
+        return jokes, RenderedView(jokes, partial(render_joke_body,
+                                                  language=language,
+                                                  category=category))
+
+    # Zkompilovaný korpus - vtipy se čtou přímo z mmap, těla se renderují až při výběru
+    if filename == CORPUS_FILE:
+        jokes = open_mapped_corpus(signature).get(language, category)
+        if jokes is None:
+            return [], []
+        return jokes, RenderedView(jokes, partial(render_joke_body,
+                                                  language=language,
+                                                  category=category))
+
+    if signature is None:
+        logger.warning(f"Soubor s vtipy nenalezen: {filename}")
+        return [], []
+
+    with open(filename, 'r', encoding='utf-8') as f:
+        # Čtení celého obsahu a rozdělení podle dvojitého odřádkování
+        # To umožňuje víceřádkové vtipy oddělené prázdným řádkem
+        jokes = parse_jokes(f.read())
+    # Vtipy přidané přes /admin/jokes od poslední kompaktace logu
+    jokes += ingested.get(f"{language}_{category}", [])
+
+    logger.info(f"Načteno {len(jokes)} vtipů z {filename}")
+    return jokes, [render_joke_body(joke, language, category) for joke in jokes]
+
+def encoded_jokes(jokes):
+    """UTF-8 texty vtipů pro format=text - z mmap nebo SQLite přímo, jinak jeden blob s offsety"""
+    if isinstance(jokes, (MappedJokes, StoredJokes)):
+        return jokes.encoded()
+    return WrappedJokes(jokes, None)
+
+def wrapped_jokes(jokes, width):
+    """Zalomené texty záznamu - nad mmap a SQLite zalamované až při přístupu (LRU cache)"""
+    if isinstance(jokes, (MappedJokes, StoredJokes)):
+        return WrappedView(jokes, width, wrapped_cache)
+    return WrappedJokes(jokes, width)
+
+def length_index(jokes):
+    """Index délek záznamu - nad SQLite se sestaví až prvním výběrem podle délky"""
+    if isinstance(jokes, StoredJokes):
+        return LazyIndex(LengthIndex, jokes)
+    return LengthIndex(jokes)
+
+def search_index(jokes, language):
+    """Fulltextový index záznamu - nad mmap a SQLite se sestaví až prvním /search"""
+    if isinstance(jokes, (MappedJokes, StoredJokes)):
+        return LazyIndex(partial(SearchIndex, language=language), jokes)
+    return SearchIndex(jokes, language)
+
+def ingest_target():
+    """Kam /admin/jokes zapisuje - 'db' (CORPUS_DB), 'log' (TXT soubory), None pro zkompilovaný korpus"""
+    if CORPUS_DB:
+        return 'db'
+    if CORPUS_FILE and os.path.exists(CORPUS_FILE):
+        return None
+    return 'log'
+
+def read_ingest_log():
+    """Dočte log /admin/jokes od poslední pozice, vrátí (nové vtipy {(jazyk, kategorie): [vtipy]},
+    klíče k přenačtení) - volá se pod reload_lock
+
+    Nový inode znamená, že log mezitím zkompaktoval jiný proces a vtipy z něj jsou už v TXT
+    souborech - záznamy s přidanými vtipy se pak načtou znovu ze souborů.
+    """
+    global ingest_position
+    records, position = ingest_log.read(ingest_position)
+    stale = set()
+    if ingest_position is not None and (position is None or position[0] != ingest_position[0]):
+        stale = set(ingested)
+        ingested.clear()
+    ingest_position = position
+
+    added = {}
+    for language, category, joke in records:
+        added.setdefault((language, category), []).append(joke)
+        ingested.setdefault(f"{language}_{category}", []).append(joke)
+    return added, stale
+
+def reload_jokes():
+    """Přenačte jen změněné záznamy a atomicky vymění snímek korpusu, vrátí změněné klíče"""
+    global corpus_snapshot
+
+    with reload_lock:
+        current = corpus_snapshot
+        jokes = dict(current.jokes)
+        bodies = dict(current.bodies)
+        signatures = dict(current.signatures)
+        search = dict(current.search)
+        lengths = dict(current.lengths)
+        texts = dict(current.texts)
+        changed = []
+        view = None
+
+        try:
+            versions = open_joke_store().versions() if CORPUS_DB else {}
+        except Exception as e:
+            logger.error(f"Chyba při čtení verzí z {CORPUS_DB}: {str(e)}")
+            return changed
+        added, stale = read_ingest_log() if ingest_target() == 'log' else ({}, set())
+
+        for lang in SUPPORTED_LANGUAGES:
+            for cat in SUPPORTED_CATEGORIES:
+                cache_key = f"{lang}_{cat}"
+                filename = source_path(lang, cat)
+                signature = source_signature(lang, cat, filename, versions)
+                previous = current.signatures.get(cache_key, False)
+                if cache_key not in stale and previous == signature:
+                    continue
+
+                try:
+                    if filename == CORPUS_DB:
+                        if view is None:
+                            # Verze ze stejného snímku, ze kterého se budou číst vtipy
+                            view = open_joke_store().view()
+                            versions = view.versions()
+                        signature = source_signature(lang, cat, filename, versions)
+                    jokes[cache_key], bodies[cache_key] = read_jokes(lang, cat, filename, signature, view)
+                    if appended_only(previous, signature):
+                        # Vtipy jen přibyly na konec - odvozené indexy zpracují jen nové
+                        start = len(current.jokes[cache_key])
+                        lengths[cache_key] = lengths[cache_key].extended(jokes[cache_key], start)
+                        texts[cache_key] = {width: wrapped.extended(jokes[cache_key], start) if width
+                                            else encoded_jokes(jokes[cache_key])
+                                            for width, wrapped in texts[cache_key].items()}
+                        if cache_key in search:
+                            search[cache_key] = search[cache_key].extended(jokes[cache_key], start)
+                    else:
+                        lengths[cache_key] = length_index(jokes[cache_key])
+                        texts[cache_key] = {width: wrapped_jokes(jokes[cache_key], width) for width in PRINT_WIDTHS}
+                        texts[cache_key][None] = encoded_jokes(jokes[cache_key])
+                        if SEARCH_ENABLED:
+                            search[cache_key] = search_index(jokes[cache_key], lang)
+                except Exception as e:
+                    # Ponecháme poslední funkční verzi, zkusí se znovu při další kontrole
+                    reload_errors[cache_key] = f"{filename}: {str(e)}"
+                    logger.error(f"Chyba při načítání vtipů z {filename}: {str(e)}")
+                    continue
+
+                signatures[cache_key] = signature
+                reload_errors.pop(cache_key, None)
+                changed.append(cache_key)
+
+        # Vtipy z logu /admin/jokes se připojí k záznamům, které se nenačítaly ze souboru -
+        # odvozené indexy zpracují jen nové vtipy, ostatní záznamy zůstávají beze změny
+        for (lang, cat), new_jokes in added.items():
+            cache_key = f"{lang}_{cat}"
+            if cache_key in changed or cache_key not in signatures:
+                continue
+            start = len(jokes[cache_key])
+            jokes[cache_key] = jokes[cache_key] + new_jokes
+            bodies[cache_key] = bodies[cache_key] + [render_joke_body(joke, lang, cat) for joke in new_jokes]
+            lengths[cache_key] = lengths[cache_key].extended(jokes[cache_key], start)
+            texts[cache_key] = {width: wrapped.extended(jokes[cache_key], start)
+                                for width, wrapped in texts[cache_key].items()}
+            if SEARCH_ENABLED:
+                search[cache_key] = search[cache_key].extended(jokes[cache_key], start)
+            changed.append(cache_key)
+
+        # Nezměněné záznamy z SQLite přejdou na nový čtecí snímek, nesestavené indexy s nimi
+        if view is not None:
+            for lang in SUPPORTED_LANGUAGES:
+                for cat in SUPPORTED_CATEGORIES:
+                    cache_key = f"{lang}_{cat}"
+                    if cache_key not in changed and signatures.get(cache_key, ('',))[0] == CORPUS_DB:
+                        jokes[cache_key], bodies[cache_key] = read_jokes(lang, cat, CORPUS_DB, None, view)
+                        texts[cache_key] = {width: wrapped.rebound(jokes[cache_key]) if width else encoded_jokes(jokes[cache_key])
+                                            for width, wrapped in texts[cache_key].items()}
+                        if isinstance(lengths[cache_key], LazyIndex):
+                            lengths[cache_key] = lengths[cache_key].rebound(jokes[cache_key])
+                        if isinstance(search.get(cache_key), LazyIndex):
+                            search[cache_key] = search[cache_key].rebound(jokes[cache_key])
+
+        if changed:
+            corpus_snapshot = CorpusSnapshot(current.generation + 1, jokes, bodies, signatures,
+                                             search, lengths, texts)
+            logger.info(f"Korpus generace {corpus_snapshot.generation}, změněno: {', '.join(changed)}")
+        # Staré čtecí snímky SQLite se zavřou hned - read transakce by do uvolnění blokovala
+        # checkpoint WAL; požadavek, který je ještě čte, se zopakuje nad novým snímkem (StaleView)
+        opened = store_views(current) | ({view} if view is not None else set())
+        for old_view in opened - store_views(corpus_snapshot):
+            old_view.close()
+    # Readiness hned odráží nový snímek i chyby načtení, nečeká na další kontrolu
+    monitor = get_health_monitor()
+    if monitor is not None and (changed or reload_errors):
+        monitor.refresh()
+    return changed
+
+def store_views(snapshot):
+    """Čtecí snímky SQLite, které snímek korpusu drží"""
+    return {jokes.view for jokes in snapshot.jokes.values() if isinstance(jokes, StoredJokes)}
+
+def release_store_views():
+    """Ukončí read transakce SQLite snímku korpusu v tomto procesu (master po preloadu -
+    sám z nich nečte, workery si po forku otevřou vlastní spojení)"""
+    for view in store_views(corpus_snapshot):
+        view.release()
+
+def retry_stale(view):
+    """Obalí view - požadavek, který narazil na zastaralý čtecí snímek SQLite (smazaný vtip,
+    zavřený pohled), se po reloadu zopakuje nad novým snímkem korpusu"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            return view(*args, **kwargs)
+        except StaleView as e:
+            logger.info(f"Zastaralý čtecí snímek ({e}), opakuji nad novým snímkem korpusu")
+            reload_jokes()
+            return view(*args, **kwargs)
+    return wrapper
+
+def load_jokes(language, category):
+    """Vrátí vtipy pro daný jazyk a kategorii z aktuálního snímku"""
+    return corpus_snapshot.jokes.get(f"{language}_{category}", [])
+
+def load_joke_bodies(language, category):
+    """Vrátí předrenderovaná JSON těla pro daný jazyk a kategorii"""
+    return corpus_snapshot.bodies.get(f"{language}_{category}", [])
 
 def preload_jokes():
     """Předčasné načtení všech vtipů do cache při startu"""
-    app.logger.info("Předčasné načítání vtipů do cache...")
-    for lang in SUPPORTED_LANGUAGES:
-        for cat in SUPPORTED_CATEGORIES:
-            load_jokes(lang, cat)
-    app.logger.info(f"Cache naplněna, celkem klíčů: {len(jokes_cache)}")
+    # Vtipy přidané přes /admin/jokes se zapíšou do TXT souborů a log začne prázdný
+    try:
+        compacted = ingest_log.compact(Config.JOKES_DIR)
+        if compacted:
+            logger.info(f"Log {ingest_log.path} zkompaktován do TXT: "
+                        f"{', '.join(f'{lang}_{cat} +{count}' for (lang, cat), count in sorted(compacted.items()))}")
+    except Exception as e:
+        # Log zůstává - vtipy z něj workery připojí při načtení
+        logger.error(f"Chyba při kompaktaci {ingest_log.path}: {str(e)}")
+    logger.info("Předčasné načítání vtipů do cache...")
+    reload_jokes()
+    logger.info(f"Cache naplněna, celkem klíčů: {len(corpus_snapshot.jokes)}")
+
+# Metriky ve sdílené paměti - slot si zabírá každý proces ve start_worker_services
+metrics = None
 
-# Předčasné načtení při importu modulu (pro gunicorn)
-preload_jokes()
+# Routy aplikace (pravidlo, view, volby) - registruje je create_app, endpoint je jméno funkce
+ROUTES = []
 
-# Inicializace auto-update při importu (pro gunicorn)
-init_auto_updater(app)
+def route(rule, **options):
+    """Dekorátor - zapíše view do ROUTES (options pro add_url_rule, např. methods)"""
+    def decorator(view):
+        ROUTES.append((rule, view, options))
+        return view
+    return decorator
+
+def start_timer():
+    """Začátek měření latence požadavku"""
+    if metrics is not None:
+        g.request_start = time.perf_counter()
 
 # Security headers middleware
-@app.after_request
 def add_security_headers(response):
     """Přidá bezpečnostní hlavičky do všech odpovědí"""
-    response.headers['X-Content-Type-Options'] = 'nosniff'
-    response.headers['X-Frame-Options'] = 'DENY'
-    response.headers['X-XSS-Protection'] = '1; mode=block'
-    response.headers['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains'
-    response.headers['Content-Security-Policy'] = "default-src 'self'"
+    if PHASE_TIMING:
+        mark_phase('render')
+    # Předrenderované odpovědi už hlavičky nesou, nemusíme je nastavovat znovu
+    if 'X-Content-Type-Options' not in response.headers:
+        response.headers.extend(SECURITY_HEADERS)
+    if metrics is not None and 'request_start' in g:
+        metrics.record_request(request.endpoint, response.status_code, time.perf_counter() - g.request_start)
+    if PHASE_TIMING:
+        mark_phase('headers')
     return response
 
-@app.route('/')
-@limiter.limit("50 per minute")
+@route('/')
+@limiter.limit(INFO_RATE_LIMIT)
+@cached_per_generation
 def home():
     """Hlavní stránka s informacemi o API"""
-    return jsonify({
+    return {
         'name': 'Joker API',
         'version': '2.1.0',
         'description': 'Production-ready API pro náhodné vtipy - služba pro PrintMaster',
@@ -130,27 +552,242 @@ def home():
         'endpoints': {
             '/': 'Informace o API',
             '/joke': 'Získat náhodný vtip',
+            '/jokes': f'Získat dávku různých vtipů (count, max {BATCH_MAX_COUNT})',
+            '/joke/<interval>': f"Vtip intervalu, stejný pro všechny ({', '.join(JOKE_PERIODS)})",
+            '/stream': 'Stream vtipů v intervalu (NDJSON nebo Server-Sent Events)',
+            '/search': 'Vyhledat vtipy podle slov (bez ohledu na diakritiku)',
             '/languages': 'Seznam podporovaných jazyků',
             '/categories': 'Seznam podporovaných kategorií',
             '/health': 'Health check endpoint',
+            '/health/live': 'Liveness sonda (proces odpovídá)',
+            '/health/ready': 'Readiness sonda (všechny záznamy korpusu načtené)',
             '/stats': 'Statistiky vtipů',
-            '/update-status': 'Status auto-update služby'
+            '/update-status': 'Status auto-update služby',
+            '/admin/jokes': 'POST - přidání vtipů (JSON nebo NDJSON, Authorization: Bearer ADMIN_API_KEY)'
         },
         'parameters': {
             'lang': f"Jazyk vtipu ({', '.join(SUPPORTED_LANGUAGES)}), výchozí: cz",
-            'category': f"Kategorie vtipu ({', '.join(SUPPORTED_CATEGORIES)}), výchozí: normal"
+            'category': f"Kategorie vtipu ({', '.join(SUPPORTED_CATEGORIES)}), výchozí: normal",
+            'timestamp': 'Přidá do odpovědi pole timestamp (true/false), výchozí: false',
+            'max_length': 'Nejvýše N znaků vtipu pro /joke (také min_length)',
+            'max_lines': 'Nejvýše N řádků vtipu pro /joke (také min_lines)',
+            'count': f"Počet vtipů pro /jokes (1-{BATCH_MAX_COUNT}), výchozí: {BATCH_DEFAULT_COUNT}",
+            'cursor': 'Procházení bez opakování - cursor=new, dále hodnota cursor z předchozí odpovědi',
+            'interval': f"Interval mezi vtipy pro /stream v sekundách, výchozí: {STREAM_DEFAULT_INTERVAL:g}",
+            'format': 'Formát odpovědi - /joke: json, compact, text; /stream: ndjson, sse (výchozí podle Accept)',
+            'width': f"Zalomení /joke na šířku tiskárny ({', '.join(map(str, PRINT_WIDTHS))} sloupců)",
+            'q': 'Dotaz pro /search - všechna slova musí být ve vtipu, slovo* hledá začátek slova',
+            'page': f"Stránka výsledků /search (po per_page, max {BATCH_MAX_COUNT}), bez page náhodný výsledek"
         },
         'examples': {
             'czech_normal': '/joke?lang=cz&category=normal',
             'czech_explicit': '/joke?lang=cz&category=explicit',
             'slovak': '/joke?lang=sk&category=normal',
-            'english_uk': '/joke?lang=en-gb&category=normal'
+            'english_uk': '/joke?lang=en-gb&category=normal',
+            'batch': '/jokes?lang=cz&category=normal&count=10',
+            'printer': '/joke?lang=cz&max_length=120&max_lines=3',
+            'plain_text': '/joke?lang=cz&format=text',
+            'daily': '/joke/daily?lang=cz',
+            'search': '/search?q=blondyna&lang=cz'
         },
         'rate_limit': os.getenv('RATE_LIMIT', '100 per minute')
-    })
+    }
+
+def validate_joke_params(language, category):
+    """Ověří jazyk a kategorii, vrátí chybovou odpověď nebo None"""
+    # Validace jazyka
+    if language not in SUPPORTED_LANGUAGES:
+        logger.warning("Neplatný jazyk požadavek: %s z IP: %s", language, get_remote_address())
+        return jsonify({
+            'error': 'Nepodporovaný jazyk',
+            'message': f'Podporované jazyky: {", ".join(SUPPORTED_LANGUAGES)}',
+            'requested': language
+        }), 400
+
+    # Validace kategorie
+    if category not in SUPPORTED_CATEGORIES:
+        logger.warning("Neplatná kategorie požadavek: %s z IP: %s", category, get_remote_address())
+        return jsonify({
+            'error': 'Nepodporovaná kategorie',
+            'message': f'Podporované kategorie: {", ".join(SUPPORTED_CATEGORIES)}',
+            'requested': category
+        }), 400
+
+    return None
+
+def no_jokes_error(language, category):
+    """Chybová odpověď pro prázdný záznam (jazyk, kategorie)"""
+    logger.error(f'Žádné vtipy pro jazyk "{language}" a kategorii "{category}"')
+    return jsonify({
+        'error': 'Žádné vtipy k dispozici',
+        'message': f'Pro jazyk "{language}" a kategorii "{category}" nejsou dostupné žádné vtipy.',
+        'language': language,
+        'category': category
+    }), 404
+
+def parse_length_params():
+    """Načte omezení délky /joke (max_length, max_lines, ...), vrátí (omezení, chyba)"""
+    try:
+        return parse_length_limits(request.args), None
+    except ValueError:
+        return None, (jsonify({
+            'error': 'Neplatné omezení délky',
+            'message': f'Parametry {", ".join(LENGTH_PARAMS)} musí být nezáporná celá čísla',
+            'requested': {name: request.args[name] for name in LENGTH_PARAMS if name in request.args}
+        }), 400)
+
+def negotiate_format(requested, accept):
+    """Formát odpovědi /joke - parametr format má přednost, jinak Accept; None = neznámý formát"""
+    if requested is not None:
+        requested = requested.lower()
+        return requested if requested in JOKE_FORMATS else None
+    # Hlavičku stačí parsovat, jen když může vyhrát text (*/* a chybějící Accept dávají JSON)
+    if not accept or 'text/' not in accept:
+        return 'json'
+    return ACCEPT_FORMATS.get(parse_accept_header(accept, MIMEAccept).best_match(ACCEPT_FORMATS), 'json')
+
+def parse_width(width):
+    """Šířka tiskárny z parametru width, None pokud není nastavená (ValueError)"""
+    if width is None:
+        return None
+    if not width.isdigit() or int(width) not in PRINT_WIDTHS:
+        raise ValueError(width)
+    return int(width)
+
+def joke_response(snapshot, cache_key, index, language, category, response_format, width, cursor):
+    """Tělo a hlavičky odpovědi /joke ve zvoleném formátu z dat připravených při načtení korpusu"""
+    # Prostý text - jen vtip v UTF-8 (případně zalomený), kurzor v hlavičce
+    if response_format == 'text':
+        headers = TEXT_RESPONSE_HEADERS + [('X-Cursor', cursor.encode())] if cursor else TEXT_RESPONSE_HEADERS
+        return snapshot.texts[cache_key][width][index], headers
+
+    if width:
+        joke = snapshot.texts[cache_key][width][index].decode('utf-8')
+        body = render_compact_body(joke) if response_format == 'compact' else render_joke_body(joke, language, category)
+    else:
+        body = snapshot.bodies[cache_key][index]
+        if response_format == 'compact':
+            body = compact_body(body, language, category)
+    if cursor:
+        body = append_json_field(body, 'cursor', cursor.encode())
+    return body, JSON_RESPONSE_HEADERS
+
+def parse_output_params():
+    """Načte formát a šířku zalomení /joke, vrátí (formát, šířka, chyba)"""
+    response_format = negotiate_format(request.args.get('format'), request.headers.get('Accept'))
+    if response_format is None:
+        return None, None, (jsonify({
+            'error': 'Nepodporovaný formát',
+            'message': f'Podporované formáty: {", ".join(JOKE_FORMATS)}',
+            'requested': request.args['format']
+        }), 400)
+    width = request.args.get('width')
+    try:
+        return response_format, parse_width(width), None
+    except ValueError:
+        return None, None, (jsonify({
+            'error': 'Nepodporovaná šířka',
+            'message': f'Podporované šířky tiskárny: {", ".join(map(str, PRINT_WIDTHS))}',
+            'requested': width
+        }), 400)
+
+def fitting_jokes(snapshot, cache_key, limits, width=None):
+    """Indexy vtipů, které splňují omezení délky (None = bez omezení, celý záznam)
+
+    Se šířkou se délka a počet řádků měří na zalomeném textu, tedy na tom, co se vytiskne.
+    """
+    if not limits:
+        return None
+    index = snapshot.texts[cache_key][width].lengths if width else snapshot.lengths[cache_key]
+    return index.select(**limits)
+
+def no_fitting_joke_error(language, category, limits):
+    """Chybová odpověď, když omezení délky nesplňuje žádný vtip"""
+    return jsonify({
+        'error': 'Žádný vhodný vtip',
+        'message': f'Žádný vtip pro jazyk "{language}" a kategorii "{category}" nesplňuje omezení délky.',
+        'language': language,
+        'category': category,
+        'limits': limits
+    }), 404
+
+def render_batch(jokes, count, cursor, language, category):
+    """Vybere dávku vtipů bez opakování a vrátí JSON tělo odpovědi /jokes"""
+    # Výběr bez opakování přes indexy - nekopíruje seznam vtipů
+    # (s kurzorem pokračuje dávka v permutaci, kde skončila předchozí)
+    count = min(count, len(jokes))
+    if cursor:
+        indices = [cursor.next_index(len(jokes)) for _ in range(count)]
+    else:
+        indices = random.sample(range(len(jokes)), count)
 
-@app.route('/joke')
-@limiter.limit("200 per minute")
+    payload = {
+        'success': True,
+        'jokes': [jokes[i] for i in indices],
+        'count': len(indices),
+        'language': language,
+        'category': category,
+        'service': 'Joker'
+    }
+    if cursor:
+        payload['cursor'] = cursor.encode()
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+def load_cursor(token, total):
+    """Kurzor z tokenu klienta (prázdný nebo 'new' = nový) pro seznam o délce total
+
+    Token musí nést podpis CURSOR_KEY (CursorError). Kurzor, jehož rozsah přesahuje seznam
+    (korpus se zmenšil), začne nový cyklus - průchod tak nepřeskakuje indexy za koncem.
+    """
+    if token in ('', 'new'):
+        return ShuffleCursor.new(total, CURSOR_KEY)
+    cursor = ShuffleCursor.decode(token, CURSOR_KEY)
+    return cursor if cursor.fits(total) else ShuffleCursor.new(total, CURSOR_KEY)
+
+def cursor_error(token):
+    """Odpověď 400 pro neplatný cursor"""
+    logger.warning("Neplatný cursor z IP: %s", get_remote_address())
+    return jsonify({
+        'error': 'Neplatný cursor',
+        'message': 'Použijte cursor z předchozí odpovědi nebo cursor=new pro nový.',
+        'requested': token
+    }), 400
+
+def parse_cursor(total):
+    """Načte kurzor z parametru ?cursor=, vrátí (kurzor, chyba)"""
+    token = request.args.get('cursor')
+    if token is None:
+        return None, None
+    try:
+        return load_cursor(token, total), None
+    except CursorError:
+        return None, cursor_error(token)
+
+def parse_batch_count(value):
+    """Převede parametr count pro /jokes (omezený BATCH_MAX_COUNT), None pokud je neplatný"""
+    try:
+        count = int(value if value is not None else BATCH_DEFAULT_COUNT)
+    except ValueError:
+        return None
+    if count < 1:
+        return None
+    return min(count, BATCH_MAX_COUNT)
+
+def batch_count():
+    """Počet vtipů požadovaný v /jokes aktuálního požadavku"""
+    return parse_batch_count(request.args.get('count'))
+
+def joke_cost():
+    """Cena požadavku ve sdíleném limitu vtipů - dávka stojí tolik vtipů, kolik vrací"""
+    if request.endpoint == 'get_jokes':
+        return batch_count() or 1
+    return 1
+
+# Sdílený limit pro /joke a /jokes - dávka N vtipů se počítá jako N požadavků na /joke
+joke_limit = limiter.shared_limit(JOKE_RATE_LIMIT, scope='joke', cost=joke_cost)
+
+@route('/joke')
+@joke_limit
 def get_joke():
     """Vrátí náhodný vtip podle parametrů"""
     try:
@@ -158,78 +795,352 @@ def get_joke():
         language = request.args.get('lang', 'cz').lower()
         category = request.args.get('category', 'normal').lower()
 
-        # Validace jazyka
-        if language not in SUPPORTED_LANGUAGES:
-            app.logger.warning(f"Neplatný jazyk požadavek: {language} z IP: {get_remote_address()}")
-            return jsonify({
-                'error': 'Nepodporovaný jazyk',
-                'message': f'Podporované jazyky: {", ".join(SUPPORTED_LANGUAGES)}',
-                'requested': language
-            }), 400
+        # Validace jazyka a kategorie
+        error = validate_joke_params(language, category)
+        if error:
+            return error
+        limits, error = parse_length_params()
+        if error:
+            return error
+        response_format, width, error = parse_output_params()
+        if error:
+            return error
+        if PHASE_TIMING:
+            mark_phase('params')
+
+        # Načtení předrenderovaných odpovědí (jeden snímek pro celý požadavek)
+        snapshot = corpus_snapshot
+        bodies = snapshot.bodies.get(f"{language}_{category}", [])
+        if PHASE_TIMING:
+            mark_phase('load')
+
+        if not bodies:
+            return no_jokes_error(language, category)
+
+        # Omezení délky pro tiskárny - výběr jen z vtipů, které se vejdou (index délek)
+        candidates = fitting_jokes(snapshot, f"{language}_{category}", limits, width)
+        if candidates is not None and not candidates:
+            return no_fitting_joke_error(language, category, limits)
+        total = len(candidates) if candidates is not None else len(bodies)
+
+        # Výběr vtipu - s kurzorem bez opakování, jinak náhodně
+        cursor, error = parse_cursor(total)
+        if error:
+            return error
+        try:
+            index = cursor.next_index(total) if cursor else random.randrange(total)
+        except CursorError:
+            return cursor_error(request.args.get('cursor'))
+        if candidates is not None:
+            index = candidates[index]
+
+        # Rychlá cesta - hotové bytes bez JSON serializace (text, compact a JSON bez timestamp)
+        cache_key = f"{language}_{category}"
+        if response_format != 'json' or request.args.get('timestamp', '').lower() not in ('1', 'true'):
+            body, headers = joke_response(snapshot, cache_key, index, language, category,
+                                          response_format, width, cursor)
+            if metrics is not None:
+                metrics.record_jokes(language, category)
+            return Response(body, headers=headers)
+
+        # Timestamp je volitelné pole (?timestamp=true), odpověď se sestaví dynamicky
+        joke = snapshot.jokes[cache_key][index] if not width else snapshot.texts[cache_key][width][index].decode('utf-8')
+        payload = {
+            'success': True,
+            'joke': joke,
+            'language': language,
+            'category': category,
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'service': 'Joker'
+        }
+        if cursor:
+            payload['cursor'] = cursor.encode()
+        return jsonify(payload)
+    except StaleView:
+        raise  # zopakuje retry_stale nad novým snímkem
+    except Exception as e:
+        logger.error(f"Neočekávaná chyba v get_joke: {str(e)}")
+        return jsonify({
+            'error': 'Interní chyba serveru',
+            'message': 'Něco se pokazilo. Kontaktujte administrátora.'
+        }), 500
+
+def period_bucket(period, now):
+    """Číslo intervalu a unixový čas jeho konce"""
+    length = JOKE_PERIODS[period]
+    bucket = int(now // length)
+    return bucket, (bucket + 1) * length
+
+def period_index(bucket, language, category, count):
+    """Deterministický výběr vtipu intervalu - stejný ve všech workerech i na všech serverech
+
+    Místo generace korpusu (čítač v procesu, po restartu workeru jiný) vstupuje do hashe
+    počet vtipů záznamu, takže výběr se změní, až se korpus změní.
+    """
+    digest = hashlib.sha256(f"{bucket}:{language}:{category}:{count}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count
+
+def period_joke(snapshot, period, language, category, response_format, width, now):
+    """(tělo, ETag, hlavičky, konec intervalu) vtipu intervalu - worker ho sestaví jednou za interval"""
+    bucket, expires = period_bucket(period, now)
+    cache_key = f"{language}_{category}"
+    name = ('period', period, cache_key, response_format, width)
+    cached = snapshot.cache.get(name)
+    if cached is None or cached[0] != bucket:
+        index = period_index(bucket, language, category, len(snapshot.bodies[cache_key]))
+        body, headers = joke_response(snapshot, cache_key, index, language, category, response_format, width, None)
+        if response_format == 'json':
+            valid_until = datetime.fromtimestamp(expires, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+            body = append_json_field(body, 'valid_until', valid_until)
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        # Vary: Accept - formát se vyjednává stejně jako u /joke
+        headers = headers + [('ETag', etag), ('Expires', http_date(expires)), ('Vary', 'Accept')]
+        cached = snapshot.cache[name] = (bucket, body, etag, headers, expires)
+    return cached[1:]
+
+def period_cache_control(expires, now):
+    """Cache-Control do konce intervalu (max-age se zkracuje, Expires je pevný)"""
+    return ('Cache-Control', f'public, max-age={max(0, int(expires - now))}')
+
+@route('/joke/<period>')
+@limiter.limit(JOKE_RATE_LIMIT)
+def get_period_joke(period):
+    """Vtip intervalu (/joke/daily, /joke/hourly) - stejný pro všechny, cachovatelný CDN"""
+    if period not in JOKE_PERIODS:
+        return jsonify({
+            'error': 'Nepodporovaný interval',
+            'message': f'Podporované intervaly: {", ".join(JOKE_PERIODS)}',
+            'requested': period
+        }), 404
+    language = request.args.get('lang', 'cz').lower()
+    category = request.args.get('category', 'normal').lower()
+    error = validate_joke_params(language, category)
+    if error:
+        return error
+    response_format, width, error = parse_output_params()
+    if error:
+        return error
+
+    snapshot = corpus_snapshot
+    if not snapshot.bodies.get(f"{language}_{category}"):
+        return no_jokes_error(language, category)
+
+    now = time.time()
+    body, etag, headers, expires = period_joke(snapshot, period, language, category, response_format, width, now)
+    headers = headers + [period_cache_control(expires, now)]
+    if is_not_modified(etag, request.headers.get('If-None-Match')):
+        return Response(status=304, headers=[header for header in headers if header[0] != 'Content-Type'])
+    if metrics is not None:
+        metrics.record_jokes(language, category)
+    return Response(body, headers=headers)
+
+@route('/jokes')
+@joke_limit
+def get_jokes():
+    """Vrátí dávku navzájem různých náhodných vtipů (výběr bez opakování)"""
+    try:
+        language = request.args.get('lang', 'cz').lower()
+        category = request.args.get('category', 'normal').lower()
 
-        # Validace kategorie
-        if category not in SUPPORTED_CATEGORIES:
-            app.logger.warning(f"Neplatná kategorie požadavek: {category} z IP: {get_remote_address()}")
+        error = validate_joke_params(language, category)
+        if error:
+            return error
+
+        count = batch_count()
+        if count is None:
             return jsonify({
-                'error': 'Nepodporovaná kategorie',
-                'message': f'Podporované kategorie: {", ".join(SUPPORTED_CATEGORIES)}',
-                'requested': category
+                'error': 'Neplatný počet vtipů',
+                'message': f'Parametr count musí být celé číslo 1-{BATCH_MAX_COUNT}',
+                'requested': request.args.get('count')
             }), 400
+        if PHASE_TIMING:
+            mark_phase('params')
 
-        # Načtení vtipů
-        jokes = load_jokes(language, category)
-
+        jokes = corpus_snapshot.jokes.get(f"{language}_{category}", [])
+        if PHASE_TIMING:
+            mark_phase('load')
         if not jokes:
-            app.logger.error(f'Žádné vtipy pro jazyk "{language}" a kategorii "{category}"')
+            return no_jokes_error(language, category)
+
+        cursor, error = parse_cursor(len(jokes))
+        if error:
+            return error
+
+        try:
+            body = render_batch(jokes, count, cursor, language, category)
+        except CursorError:
+            return cursor_error(request.args.get('cursor'))
+        if metrics is not None:
+            metrics.record_jokes(language, category, min(count, len(jokes)))
+        return Response(body, headers=JSON_RESPONSE_HEADERS)
+    except StaleView:
+        raise  # zopakuje retry_stale nad novým snímkem
+    except Exception as e:
+        logger.error(f"Neočekávaná chyba v get_jokes: {str(e)}")
+        return jsonify({
+            'error': 'Interní chyba serveru',
+            'message': 'Něco se pokazilo. Kontaktujte administrátora.'
+        }), 500
+
+@route('/stream')
+@limiter.limit(STREAM_RATE_LIMIT)
+def stream_jokes():
+    """Stream vtipů v intervalu (NDJSON nebo Server-Sent Events) přes jedno spojení"""
+    language = request.args.get('lang', 'cz').lower()
+    category = request.args.get('category', 'normal').lower()
+
+    error = validate_joke_params(language, category)
+    if error:
+        return error
+
+    try:
+        interval = float(request.args.get('interval', STREAM_DEFAULT_INTERVAL))
+    except ValueError:
+        interval = None
+    if interval is None or not STREAM_MIN_INTERVAL <= interval <= STREAM_MAX_DURATION:
+        return jsonify({
+            'error': 'Neplatný interval',
+            'message': f'Parametr interval musí být v rozsahu {STREAM_MIN_INTERVAL:g}-{STREAM_MAX_DURATION:g} sekund',
+            'requested': request.args.get('interval')
+        }), 400
+
+    stream_format = request.args.get('format', '').lower()
+    if stream_format not in ('sse', 'ndjson'):
+        stream_format = 'sse' if SSE_MIMETYPE in request.headers.get('Accept', '') else 'ndjson'
+
+    # Každý stream drží vlákno workeru - počet souběžných streamů je omezený
+    if not stream_slots.acquire(blocking=False):
+        logger.warning("Vyčerpány sloty pro stream, odmítnuto IP: %s", get_remote_address())
+        response = jsonify({
+            'error': 'Příliš mnoho streamů',
+            'message': 'Všechna spojení pro stream jsou obsazena. Zkuste to později.'
+        })
+        response.headers['Retry-After'] = '30'
+        return response, 503
+
+    cache_key = f"{language}_{category}"
+    events = joke_stream(lambda: corpus_snapshot.bodies.get(cache_key, []), stream_format,
+                         interval, STREAM_HEARTBEAT, STREAM_MAX_DURATION)
+    response = Response(events, mimetype=SSE_MIMETYPE if stream_format == 'sse' else NDJSON_MIMETYPE,
+                        headers=SECURITY_HEADERS + [('Cache-Control', 'no-cache'),
+                                                    ('X-Accel-Buffering', 'no')])
+    # Slot se uvolní při zavření odpovědi serverem (i když klient odpadne před prvním vtipem)
+    response.call_on_close(stream_slots.release)
+    return response
+
+def parse_page():
+    """Načte stránkování /search (page, per_page), vrátí (page, per_page, chyba)"""
+    try:
+        page = int(request.args.get('page'))
+        per_page = int(request.args.get('per_page', BATCH_DEFAULT_COUNT))
+    except ValueError:
+        page = per_page = 0
+    if page < 1 or not 1 <= per_page <= BATCH_MAX_COUNT:
+        return None, None, (jsonify({
+            'error': 'Neplatné stránkování',
+            'message': f'Parametr page musí být celé číslo od 1, per_page 1-{BATCH_MAX_COUNT}',
+            'requested': {'page': request.args.get('page'), 'per_page': request.args.get('per_page')}
+        }), 400)
+    return page, per_page, None
+
+@route('/search')
+@limiter.limit(SEARCH_RATE_LIMIT)
+def search_jokes():
+    """Vyhledá vtipy podle slov - náhodný výsledek nebo stránka výsledků (?page=)"""
+    try:
+        language = request.args.get('lang', 'cz').lower()
+        category = request.args.get('category', 'normal').lower()
+
+        error = validate_joke_params(language, category)
+        if error:
+            return error
+
+        query = request.args.get('q', '')
+        snapshot = corpus_snapshot
+        cache_key = f"{language}_{category}"
+        index = snapshot.search.get(cache_key)
+        if index is None:
             return jsonify({
-                'error': 'Žádné vtipy k dispozici',
-                'message': f'Pro jazyk "{language}" a kategorii "{category}" nejsou dostupné žádné vtipy.',
-                'language': language,
-                'category': category
+                'error': 'Vyhledávání není dostupné',
+                'message': 'Fulltextový index není sestavený (SEARCH_ENABLED=false nebo chybí vtipy).'
             }), 404
+        try:
+            matches = index.search(query)
+        except SearchError as e:
+            return jsonify({
+                'error': 'Neplatný dotaz',
+                'message': str(e),
+                'requested': query
+            }), 400
 
-        # Výběr náhodného vtipu
-        joke = random.choice(jokes)
+        # Bez stránkování náhodný výsledek - předrenderované tělo doplněné o počet shod
+        if 'page' not in request.args:
+            if not matches:
+                return jsonify({
+                    'error': 'Nic nenalezeno',
+                    'message': f'Žádný vtip neobsahuje všechna slova dotazu "{query}".',
+                    'matches': 0
+                }), 404
+            body = snapshot.bodies[cache_key][matches[random.randrange(len(matches))]]
+            if metrics is not None:
+                metrics.record_jokes(language, category)
+            return Response(append_json_field(body, 'matches', len(matches)), headers=JSON_RESPONSE_HEADERS)
 
-        return jsonify({
+        page, per_page, error = parse_page()
+        if error:
+            return error
+        jokes = snapshot.jokes[cache_key]
+        found = [jokes[i] for i in matches[(page - 1) * per_page:page * per_page]]
+        if metrics is not None and found:
+            metrics.record_jokes(language, category, len(found))
+        return Response(json.dumps({
             'success': True,
-            'joke': joke,
+            'jokes': found,
+            'count': len(found),
+            'matches': len(matches),
+            'page': page,
+            'pages': -(-len(matches) // per_page),
             'language': language,
             'category': category,
-            'timestamp': datetime.utcnow().isoformat() + 'Z',
             'service': 'Joker'
-        })
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n', headers=JSON_RESPONSE_HEADERS)
+    except StaleView:
+        raise  # zopakuje retry_stale nad novým snímkem
     except Exception as e:
-        app.logger.error(f"Neočekávaná chyba v get_joke: {str(e)}")
+        logger.error(f"Neočekávaná chyba v search_jokes: {str(e)}")
         return jsonify({
             'error': 'Interní chyba serveru',
             'message': 'Něco se pokazilo. Kontaktujte administrátora.'
         }), 500
 
-@app.route('/languages')
-@limiter.limit("50 per minute")
+@route('/languages')
+@limiter.limit(INFO_RATE_LIMIT)
+@cached_per_generation
 def get_languages():
     """Vrátí seznam podporovaných jazyků"""
-    return jsonify({
+    return {
         'success': True,
         'languages': SUPPORTED_LANGUAGES,
         'count': len(SUPPORTED_LANGUAGES)
-    })
+    }
 
-@app.route('/categories')
-@limiter.limit("50 per minute")
+@route('/categories')
+@limiter.limit(INFO_RATE_LIMIT)
+@cached_per_generation
 def get_categories():
     """Vrátí seznam podporovaných kategorií"""
-    return jsonify({
+    return {
         'success': True,
         'categories': SUPPORTED_CATEGORIES,
         'count': len(SUPPORTED_CATEGORIES)
-    })
+    }
 
-@app.route('/stats')
-@limiter.limit("30 per minute")
+@route('/stats')
+@limiter.limit(STATS_RATE_LIMIT)
+@cached_per_generation
 def get_stats():
     """Vrátí statistiky o dostupných vtipech"""
+    snapshot = corpus_snapshot
     stats = {
         'success': True,
         'total_languages': len(SUPPORTED_LANGUAGES),
@@ -241,46 +1152,98 @@ def get_stats():
     for lang in SUPPORTED_LANGUAGES:
         stats['jokes_per_language'][lang] = {}
         for cat in SUPPORTED_CATEGORIES:
-            jokes = load_jokes(lang, cat)
-            count = len(jokes)
+            count = len(snapshot.jokes.get(f"{lang}_{cat}", []))
             stats['jokes_per_language'][lang][cat] = count
             stats['total_jokes'] += count
 
-    return jsonify(stats)
+    # Paměť zalomených textů pro tiskárny (připravené při načtení, sdílené workery copy-on-write)
+    stats['print_cache'] = {
+        'widths': PRINT_WIDTHS,
+        'memory_bytes': sum(jokes.memory() for widths in snapshot.texts.values()
+                            for width, jokes in widths.items() if width)
+    }
+    return stats
 
-@app.route('/health')
+@route('/health')
 @limiter.exempt
 def health():
-    """Health check endpoint - bez rate limitu pro monitoring"""
-    try:
-        # Kontrola dostupnosti vtipů
-        test_jokes = load_jokes('cz', 'normal')
-        healthy = len(test_jokes) > 0
+    """Health check endpoint - bez rate limitu pro monitoring
 
-        if healthy:
-            return jsonify({
-                'status': 'healthy',
-                'service': 'Joker',
-                'timestamp': datetime.utcnow().isoformat() + 'Z',
-                'version': '2.1.0',
-                'cache_size': len(jokes_cache)
-            }), 200
-        else:
-            return jsonify({
-                'status': 'unhealthy',
-                'service': 'Joker',
-                'error': 'Žádné vtipy k dispozici'
-            }), 503
-    except Exception as e:
-        app.logger.error(f"Health check selhala: {str(e)}")
+    Stav korpusu se bere z poslední kontroly na pozadí (jako /health/ready), sonda na korpus nesahá.
+    """
+    result = health_monitor().current()
+    if result is None:
+        return jsonify({'status': 'unhealthy', 'service': 'Joker', 'error': STALE_ERROR}), 503
+    status = result[1]
+    if not status.get('entries', {}).get('cz_normal'):
         return jsonify({
             'status': 'unhealthy',
             'service': 'Joker',
-            'error': str(e)
+            'error': status.get('error', 'Žádné vtipy k dispozici')
         }), 503
+    return jsonify({
+        'status': 'healthy',
+        'service': 'Joker',
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'version': '2.1.0',
+        'cache_size': len(corpus_snapshot.jokes),
+        'generation': status['generation'],
+        'ready': status['ready'],
+        'checked_at': status['checked_at'],
+        'logging': get_log_pipeline().get_status() if get_log_pipeline() else {'mode': 'sync'},
+        'profiler': get_profiler().get_status()
+    }), 200
+
+def health_check():
+    """Stav pro /health/ready - všechny záznamy korpusu, generace, chyby reloadu a auto-update"""
+    snapshot = corpus_snapshot
+    entries = {}
+    for lang in SUPPORTED_LANGUAGES:
+        for cat in SUPPORTED_CATEGORIES:
+            entries[f"{lang}_{cat}"] = len(snapshot.jokes.get(f"{lang}_{cat}", ()))
+    empty = [key for key, count in entries.items() if not count]
+    updater = get_auto_updater()
+    updater_status = updater.get_status() if updater else None
+    return {
+        # Chyba reloadu záznam neshodí - obsluhuje se poslední funkční verze
+        'ready': snapshot.generation > 0 and not empty,
+        'service': 'Joker',
+        'generation': snapshot.generation,
+        'entries': entries,
+        'empty_entries': empty,
+        'reload_errors': dict(reload_errors),
+        'auto_update': {key: updater_status[key] for key in ('running', 'role', 'last_update')}
+                       if updater_status else None,
+        'checked_at': datetime.utcnow().isoformat() + 'Z'
+    }
+
+def health_monitor():
+    """Kontrola stavu workeru"""
+    monitor = get_health_monitor()
+    if monitor is None:
+        # Proces bez služeb workeru (např. create_app bez start_services) - kontrola při sondě
+        monitor = HealthMonitor(health_check)
+    return monitor
 
-@app.route('/update-status')
-@limiter.limit("10 per minute")
+def readiness():
+    """(HTTP status, tělo) readiness z poslední kontroly na pozadí"""
+    return health_monitor().readiness()
+
+@route('/health/live')
+@limiter.exempt
+def health_live():
+    """Liveness - proces obsluhuje požadavky, nezávisí na korpusu"""
+    return Response(LIVE_BODY, headers=HEALTH_RESPONSE_HEADERS)
+
+@route('/health/ready')
+@limiter.exempt
+def health_ready():
+    """Readiness - hotová odpověď poslední kontroly (sonda je jen načtení atributu)"""
+    status, body = readiness()
+    return Response(body, status=status, headers=HEALTH_RESPONSE_HEADERS)
+
+@route('/update-status')
+@limiter.limit(UPDATE_STATUS_RATE_LIMIT)
 def update_status():
     """Vrátí status auto-update služby"""
     try:
@@ -299,14 +1262,105 @@ def update_status():
                 'timestamp': datetime.utcnow().isoformat() + 'Z'
             }), 200
     except Exception as e:
-        app.logger.error(f"Chyba při zjišťování update status: {str(e)}")
+        logger.error(f"Chyba při zjišťování update status: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+def admin_error():
+    """Ověří klíč administrace (Authorization: Bearer), vrátí chybovou odpověď nebo None"""
+    if not ADMIN_API_KEY:
+        return jsonify({
+            'error': 'Administrace je vypnutá',
+            'message': 'Přidávání vtipů zapnete nastavením ADMIN_API_KEY.'
+        }), 403
+
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not secrets.compare_digest(token.strip().encode('utf-8'),
+                                                                 ADMIN_API_KEY.encode('utf-8')):
+        logger.warning("Neplatný klíč administrace z IP: %s", get_remote_address())
+        return jsonify({
+            'error': 'Neplatný klíč',
+            'message': 'Použijte hlavičku Authorization: Bearer <ADMIN_API_KEY>.'
+        }), 401, {'WWW-Authenticate': 'Bearer'}
+
+    return None
+
+@route('/admin/jokes', methods=['POST'])
+@limiter.limit(ADMIN_RATE_LIMIT)
+def add_jokes():
+    """Přidá vtipy - JSON objekt nebo dávka NDJSON (application/x-ndjson, vtip na řádek)"""
+    error = admin_error()
+    if error:
+        return error
+
+    target = ingest_target()
+    if target is None:
+        return jsonify({
+            'error': 'Korpus je jen pro čtení',
+            'message': 'Zkompilovaný korpus (CORPUS_FILE) nelze měnit, přidejte vtipy do TXT souborů '
+                       'a zkompilujte ho znovu.'
+        }), 409
+
+    # Celá dávka se ověří před zápisem - projde celá, nebo nic
+    try:
+        if request.mimetype == NDJSON_MIMETYPE:
+            records = parse_ndjson(read_lines(request.stream), SUPPORTED_LANGUAGES, SUPPORTED_CATEGORIES, INGEST_MAX_BATCH)
+        else:
+            records = [parse_record(request.get_json(silent=True), SUPPORTED_LANGUAGES, SUPPORTED_CATEGORIES)]
+    except IngestError as e:
+        return jsonify({
+            'error': 'Neplatné vtipy',
+            'message': str(e)
+        }), 413 if isinstance(e, BatchTooLarge) else 400
+
+    try:
+        if target == 'db':
+            grouped = {}
+            for language, category, joke in records:
+                grouped.setdefault((language, category), []).append(joke)
+            store = open_joke_store()
+            for (language, category), jokes in grouped.items():
+                store.extend(language, category, jokes)
+        else:
+            ingest_log.append(records)
+    except Exception as e:
+        logger.error(f"Chyba při zápisu vtipů: {str(e)}")
+        return jsonify({
+            'error': 'Interní chyba serveru',
+            'message': 'Vtipy se nepodařilo uložit.'
+        }), 500
+
+    # Zápis je trvalý - tento worker vtipy převezme hned, ostatní při další kontrole hot reloadu
+    reload_jokes()
+    keys = sorted({f"{language}_{category}" for language, category, _ in records})
+    logger.info(f"Přidáno {len(records)} vtipů přes /admin/jokes ({', '.join(keys)})")
+    snapshot = corpus_snapshot
+    return jsonify({
+        'success': True,
+        'added': len(records),
+        'entries': {key: len(snapshot.jokes.get(key, [])) for key in keys},
+        'generation': snapshot.generation
+    }), 201
+
+@route('/metrics')
+@limiter.exempt
+def get_metrics_text():
+    """Metriky v Prometheus text formátu (součet všech workerů)"""
+    if metrics is None:
+        return jsonify({
+            'error': 'Metriky jsou vypnuté',
+            'message': 'Nastavte METRICS_ENABLED=true'
+        }), 404
+    snapshot = corpus_snapshot
+    gauges = [
+        ('joker_corpus_generation', 'Generace snímku korpusu v tomto workeru', snapshot.generation),
+        ('joker_corpus_jokes', 'Počet vtipů v korpusu', sum(len(jokes) for jokes in snapshot.jokes.values()))
+    ]
+    return Response(metrics.render(gauges), content_type=METRICS_CONTENT_TYPE)
+
 # Error handlers
-@app.errorhandler(404)
 def not_found(error):
     """Handler pro 404 chyby"""
     return jsonify({
@@ -314,28 +1368,198 @@ def not_found(error):
         'message': 'Požadovaný endpoint neexistuje. Použijte GET / pro seznam dostupných endpointů.'
     }), 404
 
-@app.errorhandler(429)
 def ratelimit_handler(error):
     """Handler pro rate limit překročení"""
-    app.logger.warning(f"Rate limit překročen z IP: {get_remote_address()}")
+    logger.warning("Rate limit překročen z IP: %s", get_remote_address())
+    if metrics is not None:
+        metrics.record_rate_limited(request.endpoint)
     return jsonify({
         'error': 'Příliš mnoho požadavků',
         'message': 'Překročili jste limit požadavků. Zkuste to později.'
     }), 429
 
-@app.errorhandler(500)
 def internal_error(error):
     """Handler pro 500 chyby"""
-    app.logger.error(f"Interní chyba serveru: {str(error)}")
+    logger.error(f"Interní chyba serveru: {str(error)}")
     return jsonify({
         'error': 'Interní chyba serveru',
         'message': 'Něco se pokazilo. Kontaktujte administrátora.'
     }), 500
 
+# Služby procesu spouští post_fork hook gunicornu (gunicorn.conf.py), ne create_app
+services_deferred = False
+services_pid = None
+
+def configure(config):
+    """Převezme nastavení procesu z konfigurace - zdroj korpusu, šířky, vyhledávání, endpointy
+
+    Modulové hodnoty (výchozí z Config při importu) sdílí všechny aplikace v procesu, stejně
+    jako korpus. Vrátí True, pokud se změnilo, z čeho a jak se korpus staví - načtený snímek
+    je pak neplatný.
+    """
+    global CORPUS_FILE, CORPUS_DB, ADMIN_API_KEY, INGEST_MAX_BATCH, ingest_log, ingest_position
+    global BATCH_DEFAULT_COUNT, BATCH_MAX_COUNT, STREAM_DEFAULT_INTERVAL, STREAM_MIN_INTERVAL
+    global STREAM_HEARTBEAT, STREAM_MAX_DURATION, STREAM_MAX_CONNECTIONS, stream_slots
+    global PRINT_WIDTHS, JOKE_PERIODS, SEARCH_ENABLED, METADATA_MAX_AGE, METADATA_CACHE_CONTROL
+    global COMPRESS_MIN_SIZE, WRAP_CACHE_SIZE, wrapped_cache, PHASE_TIMING
+
+    corpus_settings = (CORPUS_FILE, CORPUS_DB, PRINT_WIDTHS, SEARCH_ENABLED, WRAP_CACHE_SIZE, ingest_log.path)
+    CORPUS_FILE = config.CORPUS_FILE
+    CORPUS_DB = config.CORPUS_DB
+    PRINT_WIDTHS = config.PRINT_WIDTHS
+    SEARCH_ENABLED = config.SEARCH_ENABLED
+    if WRAP_CACHE_SIZE != config.WRAP_CACHE_SIZE:
+        # Záznamy nad starou cache ji drží dál, nové texty vzniknou při přestavbě korpusu
+        WRAP_CACHE_SIZE = config.WRAP_CACHE_SIZE
+        wrapped_cache = wrap_cache(WRAP_CACHE_SIZE)
+    if ingest_log.path != config.INGEST_LOG:
+        ingest_log = IngestLog(config.INGEST_LOG)
+        ingest_position = None
+        ingested.clear()
+    ADMIN_API_KEY = config.ADMIN_API_KEY
+    INGEST_MAX_BATCH = config.INGEST_MAX_BATCH
+
+    BATCH_DEFAULT_COUNT = config.BATCH_DEFAULT_COUNT
+    BATCH_MAX_COUNT = config.BATCH_MAX_COUNT
+    STREAM_DEFAULT_INTERVAL = config.STREAM_DEFAULT_INTERVAL
+    STREAM_MIN_INTERVAL = config.STREAM_MIN_INTERVAL
+    STREAM_HEARTBEAT = config.STREAM_HEARTBEAT
+    STREAM_MAX_DURATION = config.STREAM_MAX_DURATION
+    if STREAM_MAX_CONNECTIONS != config.STREAM_MAX_CONNECTIONS:
+        STREAM_MAX_CONNECTIONS = config.STREAM_MAX_CONNECTIONS
+        stream_slots = threading.BoundedSemaphore(STREAM_MAX_CONNECTIONS)
+    JOKE_PERIODS = config.JOKE_PERIODS
+
+    METADATA_MAX_AGE = config.METADATA_MAX_AGE
+    METADATA_CACHE_CONTROL = f'public, max-age={METADATA_MAX_AGE}'
+    COMPRESS_MIN_SIZE = config.COMPRESS_MIN_SIZE
+    PHASE_TIMING = config.PHASE_TIMING
+    return corpus_settings != (CORPUS_FILE, CORPUS_DB, PRINT_WIDTHS, SEARCH_ENABLED, WRAP_CACHE_SIZE,
+                               ingest_log.path)
+
+def create_app(config=None, start_services=None):
+    """Vytvoří Flask aplikaci z konfigurace (výchozí podle FLASK_ENV, viz config.get_config)
+
+    Korpus je stav procesu - načte se jednou a pod gunicorn --preload ho workery zdědí
+    copy-on-write z masteru. Nastavení procesu převezme configure(config); konfigurace s jiným
+    zdrojem korpusu ho sestaví znovu. Vlákna a log handlery (start_worker_services) se spustí
+    hned, pokud je nespouští až post_fork hook (services_deferred).
+    """
+    global corpus_snapshot, CURSOR_KEY
+    config = config or get_config()
+    if start_services is None:
+        start_services = not services_deferred
+    rebuild = configure(config) and corpus_snapshot.generation > 0
+
+    app = Flask(__name__)
+    app.config.from_object(config)
+    app.config['SECRET_KEY'] = config.SECRET_KEY or secrets.token_hex(24)
+    # Bez SECRET_KEY má každý proces vlastní náhodný klíč - kurzor platí jen v procesu,
+    # který ho vydal (s preload_app sdílí klíč všechny workery z masteru)
+    CURSOR_KEY = app.config['SECRET_KEY'].encode('utf-8')
+    app.config['RATELIMIT_DEFAULT'] = config.RATE_LIMIT
+    app.config['RATELIMIT_STORAGE_URI'] = config.RATELIMIT_STORAGE_URI or config.REDIS_URL
+
+    # CORS konfigurace - plně otevřená služba pro PrintMastery z celého světa
+    # Joker je veřejná služba bez omezení původu požadavků
+    CORS(app, resources={
+        r"/*": {
+            "origins": "*",
+            "methods": ["GET", "OPTIONS"],
+            "allow_headers": ["Content-Type"],
+            "expose_headers": ["Content-Type"],
+            "supports_credentials": False,
+            "max_age": 3600
+        }
+    })
+    limiter.init_app(app)
+    app.before_request(enforce_native_rate_limit)
+
+    # Pořadí hooků: Limiter a CORS první, měření fází je obalí (profiling.py)
+    app.before_request(start_timer)
+    init_request_timing(app, logger, enabled=config.PHASE_TIMING, slow_ms=config.SLOW_REQUEST_MS)
+    init_profiler(app, every=config.PROFILE_SAMPLE_EVERY, interval=config.PROFILE_INTERVAL_MS / 1000,
+                  output_dir=config.PROFILE_DIR, control_path=config.PROFILE_CONTROL)
+    app.after_request(add_security_headers)
+
+    for rule, view, options in ROUTES:
+        app.add_url_rule(rule, view_func=retry_stale(view), **options)
+    app.register_error_handler(404, not_found)
+    app.register_error_handler(429, ratelimit_handler)
+    app.register_error_handler(500, internal_error)
+
+    if not app.debug:
+        app.logger.setLevel(config.LOG_LEVEL.upper())
+    if start_services:
+        start_worker_services(app)
+
+    # Předčasné načtení korpusu - jednou na proces (další aplikace sdílí stejný snímek)
+    if rebuild:
+        with reload_lock:
+            corpus_snapshot = CorpusSnapshot(corpus_snapshot.generation, {}, {}, {})
+    if corpus_snapshot.generation == 0 or rebuild:
+        preload_jokes()
+    return app
+
+def start_worker_services(app):
+    """Spustí služby procesu - log pipeline, hot reload, auto-update, profiler a slot metrik
+
+    Volá se jednou v každém procesu, který obsluhuje požadavky (ve workeru po forku).
+    Nastavení služeb bere z konfigurace aplikace (app.config).
+    """
+    global metrics, services_pid
+    if services_pid == os.getpid():
+        return
+    services_pid = os.getpid()
+    config = app.config
+
+    # Logging - request vlákna jen plní frontu, zápis dělá vlákno log_pipeline.py
+    if not app.debug:
+        os.makedirs(config['LOG_DIR'], exist_ok=True)
+        init_log_pipeline(logger, os.path.join(config['LOG_DIR'], 'joker.log'), mode=config['LOG_MODE'],
+                          max_bytes=config['LOG_MAX_BYTES'], backup_count=config['LOG_BACKUP_COUNT'],
+                          queue_size=config['LOG_QUEUE_SIZE'], dedupe_window=config['LOG_DEDUPE_WINDOW'],
+                          rate_limit=config['LOG_RATE_LIMIT'])
+        logger.info('Joker API startup')
+
+    # Hot reload - sledování změn v jokes/ bez restartu workerů
+    watcher = init_corpus_watcher(reload_jokes, config['JOKES_RELOAD_INTERVAL'])
+    # Auto-update běží jen v jednom procesu; změny vtipů ostatní workery převezmou hot reloadem
+    init_auto_updater(app, reload_jokes if watcher.running else None)
+
+    # Readiness - stav všech záznamů korpusu vyhodnocuje vlákno, sondy čtou hotovou odpověď
+    init_health_monitor(health_check, config['HEALTH_CHECK_INTERVAL'])
+
+    profiler = get_profiler()
+    profiler.start()
+    atexit.register(profiler.stop)
+
+    # Soubor čítačů sdílí workery jednoho masteru, ten ho při ukončení smaže (on_exit)
+    metrics = init_metrics(sorted(app.view_functions), SUPPORTED_LANGUAGES, SUPPORTED_CATEGORIES,
+                           instance=os.getppid() if services_deferred else None,
+                           enabled=config['METRICS_ENABLED'], directory=config['METRICS_DIR'],
+                           max_workers=config['METRICS_MAX_WORKERS'], name=config['METRICS_INSTANCE'])
+
+# Modulová aplikace pro "gunicorn app:app", ASGI vstup a testy - vzniká při prvním přístupu
+_app = None
+
+def get_app():
+    """Vrátí modulovou aplikaci (při prvním volání ji vytvoří)"""
+    global _app
+    if _app is None:
+        _app = create_app()
+    return _app
+
+def __getattr__(name):
+    if name == 'app':
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__ == '__main__':
     # Konfigurace serveru
     port = int(os.getenv('PORT', 8000))
     host = os.getenv('HOST', '0.0.0.0')
 
-    app.logger.info(f"Spouštím Joker API na {host}:{port}")
+    app = get_app()
+    logger.info(f"Spouštím Joker API na {host}:{port}")
     app.run(host=host, port=port, debug=app.config['DEBUG'])
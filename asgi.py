@@ -0,0 +1,469 @@
+"""
+ASGI vstup pro Joker API (asyncio)
+Horké endpointy (/joke, /jokes, /stream a metadata) obsluhuje přímo event loop nad stejnou
+cache korpusu jako Flask aplikace. Ostatní požadavky (chybové odpovědi, /health,
+/update-status, CORS preflight) předá Flask aplikaci ve vlákně, takže výstup zůstává shodný.
+Spusť: uvicorn asgi:app --host 0.0.0.0 --port 8000 --workers 4
+"""
+import io
+import sys
+import json
+import time
+import asyncio
+from functools import partial
+from urllib.parse import parse_qsl
+from concurrent.futures import ThreadPoolExecutor
+
+from limits import parse as parse_limit
+from limits.storage import MemoryStorage
+
+import app as joker
+from jokestore import StaleView
+from length_index import parse_length_limits
+from ratelimit import SharedMemoryStorage
+from shuffle import CursorError
+from streaming import NDJSON_MIMETYPE, SSE_MIMETYPE, joke_stream_async
+
+# Flask aplikace (korpus, limiter, služby workeru) vzniká při importu ASGI vstupu
+flask_config = joker.get_app().config
+
+# Konfigurace
+ASGI_WSGI_THREADS = flask_config['ASGI_WSGI_THREADS']  # vlákna pro požadavky předané Flasku
+ASGI_STREAM_MAX_CONNECTIONS = flask_config['ASGI_STREAM_MAX_CONNECTIONS']  # streamy na worker
+
+executor = ThreadPoolExecutor(max_workers=ASGI_WSGI_THREADS, thread_name_prefix='asgi-wsgi')
+active_streams = 0
+
+
+def encode_headers(headers):
+    """Převede hlavičky na ASGI formát (bytes)"""
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+
+# Předkódované hlavičky pro nativní odpovědi
+JSON_HEADERS = encode_headers(joker.JSON_RESPONSE_HEADERS)
+TEXT_HEADERS = encode_headers(joker.TEXT_RESPONSE_HEADERS)
+HEALTH_HEADERS = encode_headers(joker.HEALTH_RESPONSE_HEADERS)
+
+
+def response_headers(headers):
+    """Pevné sady hlaviček z app.py vrátí předkódované, ostatní (např. s X-Cursor) zakóduje"""
+    if headers is joker.JSON_RESPONSE_HEADERS:
+        return JSON_HEADERS
+    if headers is joker.TEXT_RESPONSE_HEADERS:
+        return TEXT_HEADERS
+    return encode_headers(headers)
+
+
+CORS_EXPOSE = (b'access-control-expose-headers', b'Content-Type')
+CORS_ANY_ORIGIN = [(b'access-control-allow-origin', b'*'), CORS_EXPOSE]
+
+
+class RateLimit:
+    """Limit endpointu - sdílí úložiště, strategii i klíče s Flask-Limiterem v app.py"""
+
+    def __init__(self, value, scope):
+        self.item = parse_limit(value)
+        self.scope = scope
+
+    async def hit(self, request, cost=1):
+        """Započítá požadavek, vrátí False při překročení limitu
+
+        Výsledek si požadavek pamatuje - když ho pak obslouží Flask, limit už znovu nepočítá.
+        """
+        limiter = joker.limiter
+        if not limiter.enabled:
+            return True
+        hit = partial(limiter.limiter.hit, self.item, request.remote, self.scope, cost=cost)
+        # Lokální úložiště (memory, shm) je rychlé, síťové (Redis) nesmí blokovat event loop
+        if isinstance(limiter.storage, (MemoryStorage, SharedMemoryStorage)):
+            request.rate_limit = hit()
+        else:
+            request.rate_limit = await asyncio.get_running_loop().run_in_executor(executor, hit)
+        return request.rate_limit
+
+
+# Scope odpovídá Flask-Limiteru: sdílený limit 'joke', jinak jméno endpointu
+JOKE_LIMIT = RateLimit(joker.JOKE_RATE_LIMIT, 'joke')
+STREAM_LIMIT = RateLimit(joker.STREAM_RATE_LIMIT, 'stream_jokes')
+PERIOD_LIMIT = RateLimit(joker.JOKE_RATE_LIMIT, 'get_period_joke')
+METADATA_ROUTES = {
+    '/': ('home', RateLimit(joker.INFO_RATE_LIMIT, 'home')),
+    '/languages': ('get_languages', RateLimit(joker.INFO_RATE_LIMIT, 'get_languages')),
+    '/categories': ('get_categories', RateLimit(joker.INFO_RATE_LIMIT, 'get_categories')),
+    '/stats': ('get_stats', RateLimit(joker.STATS_RATE_LIMIT, 'get_stats')),
+}
+
+
+class Request:
+    """Minimální pohled na ASGI požadavek"""
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.headers = dict(scope['headers'])
+        client = scope.get('client')
+        self.remote = client[0] if client else '127.0.0.1'
+        self.rate_limit = None  # výsledek RateLimit.hit, None = nezapočítáno
+        self.args = {}
+        for name, value in parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True):
+            self.args.setdefault(name, value)
+
+    def header(self, name):
+        """Vrátí hodnotu hlavičky jako str nebo None"""
+        value = self.headers.get(name)
+        return value.decode('latin-1') if value is not None else None
+
+    def cors_headers(self):
+        """CORS hlavičky shodné s flask-cors (origins='*')"""
+        origin = self.headers.get(b'origin')
+        if origin is None:
+            return CORS_ANY_ORIGIN
+        return [(b'access-control-allow-origin', origin), CORS_EXPOSE, (b'vary', b'Origin')]
+
+
+async def send_response(send, request, status, headers, body=b''):
+    """Odešle kompletní odpověď"""
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': headers + request.cors_headers() + [(b'content-length', str(len(body)).encode('ascii'))]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def handle_joke(request, send, receive):
+    """/joke - rychlá cesta z předrenderovaných těl a textů"""
+    args = request.args
+    language = args.get('lang', 'cz').lower()
+    category = args.get('category', 'normal').lower()
+    # Neznámý formát či šířku a JSON s timestamp sestaví Flask view
+    response_format = joker.negotiate_format(args.get('format'), request.header(b'accept'))
+    if response_format is None:
+        return False
+    if response_format == 'json' and args.get('timestamp', '').lower() in ('1', 'true'):
+        return False
+    try:
+        width = joker.parse_width(args.get('width'))
+    except ValueError:
+        return False
+
+    snapshot = joker.corpus_snapshot
+    bodies = snapshot.bodies.get(f"{language}_{category}")
+    if not bodies:
+        return False
+
+    # Omezení délky - neplatné hodnoty a prázdný výběr vrací chybu Flask view
+    try:
+        limits = parse_length_limits(args)
+    except ValueError:
+        return False
+    candidates = joker.fitting_jokes(snapshot, f"{language}_{category}", limits, width)
+    if candidates is not None and not candidates:
+        return False
+    total = len(candidates) if candidates is not None else len(bodies)
+
+    cursor = None
+    token = args.get('cursor')
+    if token is not None:
+        try:
+            cursor = joker.load_cursor(token, total)
+        except CursorError:
+            return False
+
+    if not await JOKE_LIMIT.hit(request):
+        return False
+
+    index = cursor.next_index(total) if cursor else joker.random.randrange(total)
+    if candidates is not None:
+        index = candidates[index]
+    body, headers = joker.joke_response(snapshot, f"{language}_{category}", index, language, category,
+                                        response_format, width, cursor)
+    if joker.metrics is not None:
+        joker.metrics.record_jokes(language, category)
+    await send_response(send, request, 200, response_headers(headers), body)
+    return True
+
+
+async def handle_jokes(request, send, receive):
+    """/jokes - dávka vtipů bez opakování"""
+    args = request.args
+    language = args.get('lang', 'cz').lower()
+    category = args.get('category', 'normal').lower()
+    count = joker.parse_batch_count(args.get('count'))
+
+    jokes = joker.corpus_snapshot.jokes.get(f"{language}_{category}")
+    if not jokes or count is None:
+        return False
+
+    cursor = None
+    token = args.get('cursor')
+    if token is not None:
+        try:
+            cursor = joker.load_cursor(token, len(jokes))
+        except CursorError:
+            return False
+
+    if not await JOKE_LIMIT.hit(request, cost=count):
+        return False
+
+    body = joker.render_batch(jokes, count, cursor, language, category)
+    if joker.metrics is not None:
+        joker.metrics.record_jokes(language, category, min(count, len(jokes)))
+    await send_response(send, request, 200, JSON_HEADERS, body)
+    return True
+
+
+async def handle_period_joke(request, send, receive):
+    """/joke/<interval> - vtip intervalu z cache workeru, 304 podle ETagu"""
+    period = request.scope['path'].rsplit('/', 1)[1]
+    args = request.args
+    language = args.get('lang', 'cz').lower()
+    category = args.get('category', 'normal').lower()
+    response_format = joker.negotiate_format(args.get('format'), request.header(b'accept'))
+    if response_format is None:
+        return False
+    try:
+        width = joker.parse_width(args.get('width'))
+    except ValueError:
+        return False
+    snapshot = joker.corpus_snapshot
+    if not snapshot.bodies.get(f"{language}_{category}"):
+        return False
+
+    if not await PERIOD_LIMIT.hit(request):
+        return False
+
+    now = time.time()
+    body, etag, headers, expires = joker.period_joke(snapshot, period, language, category,
+                                                     response_format, width, now)
+    headers = headers + [joker.period_cache_control(expires, now)]
+    if joker.is_not_modified(etag, request.header(b'if-none-match')):
+        await send_response(send, request, 304, encode_headers([header for header in headers
+                                                                if header[0] != 'Content-Type']))
+        return True
+    if joker.metrics is not None:
+        joker.metrics.record_jokes(language, category)
+    await send_response(send, request, 200, encode_headers(headers), body)
+    return True
+
+
+async def handle_health(request, send, receive):
+    """/health/live a /health/ready - hotové odpovědi bez rate limitu"""
+    if request.scope['path'] == '/health/live':
+        status, body = 200, joker.LIVE_BODY
+    else:
+        status, body = joker.readiness()
+    await send_response(send, request, status, HEALTH_HEADERS, body)
+    return True
+
+
+async def handle_metadata(request, send, receive):
+    """/, /languages, /categories, /stats - cache generace korpusu sdílená s Flask view"""
+    name, limit = METADATA_ROUTES[request.scope['path']]
+    if not await limit.hit(request):
+        return False
+
+    body, etag, validators, headers = joker.cached_json(name, request.header(b'accept-encoding'))
+    if joker.is_not_modified(etag, request.header(b'if-none-match')):
+        await send_response(send, request, 304, encode_headers(validators))
+    else:
+        await send_response(send, request, 200, encode_headers(headers), body)
+    return True
+
+
+async def handle_stream(request, send, receive):
+    """/stream - stream na event loopu, čekání mezi vtipy nedrží vlákno"""
+    global active_streams
+
+    args = request.args
+    language = args.get('lang', 'cz').lower()
+    category = args.get('category', 'normal').lower()
+    if language not in joker.SUPPORTED_LANGUAGES or category not in joker.SUPPORTED_CATEGORIES:
+        return False
+    try:
+        interval = float(args.get('interval', joker.STREAM_DEFAULT_INTERVAL))
+    except ValueError:
+        return False
+    if not joker.STREAM_MIN_INTERVAL <= interval <= joker.STREAM_MAX_DURATION:
+        return False
+
+    if not await STREAM_LIMIT.hit(request):
+        return False
+
+    if active_streams >= ASGI_STREAM_MAX_CONNECTIONS:
+        joker.app.logger.warning("Vyčerpány sloty pro stream, odmítnuto IP: %s", request.remote)
+        body = json.dumps({
+            'error': 'Příliš mnoho streamů',
+            'message': 'Všechna spojení pro stream jsou obsazena. Zkuste to později.'
+        }, ensure_ascii=False).encode('utf-8')
+        await send_response(send, request, 503, JSON_HEADERS + [(b'retry-after', b'30')], body)
+        return True
+
+    stream_format = args.get('format', '').lower()
+    if stream_format not in ('sse', 'ndjson'):
+        accept = request.header(b'accept') or ''
+        stream_format = 'sse' if SSE_MIMETYPE in accept else 'ndjson'
+
+    # Stejný Content-Type jako Flask (text/* dostává charset)
+    mimetype = f'{SSE_MIMETYPE}; charset=utf-8' if stream_format == 'sse' else NDJSON_MIMETYPE
+    headers = encode_headers([('Content-Type', mimetype), ('Cache-Control', 'no-cache'),
+                              ('X-Accel-Buffering', 'no')] + joker.SECURITY_HEADERS)
+
+    cache_key = f"{language}_{category}"
+    events = joke_stream_async(lambda: joker.corpus_snapshot.bodies.get(cache_key, []), stream_format,
+                               interval, joker.STREAM_HEARTBEAT, joker.STREAM_MAX_DURATION)
+
+    async def wait_for_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    active_streams += 1
+    disconnect = asyncio.ensure_future(wait_for_disconnect())
+    try:
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': headers + request.cors_headers()})
+        while True:
+            # Čekání na další událost souběžně se sledováním odpojení klienta
+            chunk = asyncio.ensure_future(events.__anext__())
+            await asyncio.wait({chunk, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnect.done():
+                chunk.cancel()
+                return True
+            try:
+                data = chunk.result()
+            except StopAsyncIteration:
+                break
+            await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        active_streams -= 1
+        disconnect.cancel()
+        await events.aclose()
+    return True
+
+
+# Nativně obsluhované cesty: (jméno endpointu ve Flasku pro metriky, handler)
+NATIVE_ROUTES = {
+    '/joke': ('get_joke', handle_joke),
+    '/jokes': ('get_jokes', handle_jokes),
+    '/stream': ('stream_jokes', handle_stream),
+    '/health/live': ('health_live', handle_health),
+    '/health/ready': ('health_ready', handle_health),
+}
+NATIVE_ROUTES.update({path: (name, handle_metadata) for path, (name, _) in METADATA_ROUTES.items()})
+NATIVE_ROUTES.update({f'/joke/{period}': ('get_period_joke', handle_period_joke) for period in joker.JOKE_PERIODS})
+
+
+def run_wsgi(environ):
+    """Zavolá Flask aplikaci (ve vlákně executoru), vrátí (status, hlavičky, tělo)"""
+    result = {}
+    chunks = []
+
+    def start_response(status, headers, exc_info=None):
+        result['status'] = int(status.split(' ', 1)[0])
+        result['headers'] = headers
+        return chunks.append
+
+    iterable = joker.app(environ, start_response)
+    try:
+        for chunk in iterable:
+            chunks.append(chunk)
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+    return result['status'], result['headers'], b''.join(chunks)
+
+
+async def call_flask(scope, receive, send, rate_limit=None):
+    """Předá požadavek Flask aplikaci (WSGI) ve vlákně executoru
+
+    rate_limit je výsledek limitu, do kterého požadavek už započítala nativní cesta.
+    """
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('127.0.0.1', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if rate_limit is not None:
+        environ[joker.NATIVE_RATE_LIMIT] = rate_limit
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+    status, headers, response_body = await asyncio.get_running_loop().run_in_executor(
+        executor, run_wsgi, environ)
+    await send({'type': 'http.response.start', 'status': status, 'headers': encode_headers(headers)})
+    await send({'type': 'http.response.body', 'body': response_body})
+
+
+async def lifespan(receive, send):
+    """ASGI lifespan - korpus je načtený už při importu app.py"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI aplikace Joker API"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    rate_limit = None
+    route = NATIVE_ROUTES.get(scope['path']) if scope['method'] == 'GET' else None
+    if route is not None:
+        endpoint, handler = route
+        metrics = joker.metrics
+        if metrics is not None:
+            start = time.perf_counter()
+            send_response_start = send
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    metrics.record_request(endpoint, message['status'], time.perf_counter() - start)
+                await send_response_start(message)
+
+        request = Request(scope)
+        try:
+            if await handler(request, send, receive):
+                return
+        except StaleView:
+            # Zastaralý čtecí snímek SQLite - Flask view požadavek po reloadu zopakuje
+            pass
+        rate_limit = request.rate_limit
+
+    # Chyby, překročené limity a ostatní endpointy zpracuje Flask beze změny chování
+    await call_flask(scope, receive, send, rate_limit)
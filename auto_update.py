@@ -1,11 +1,13 @@
 """
 Auto-update služba pro Joker API
-Pravidelně kontroluje GitHub pro nové verze a automaticky aktualizuje aplikaci
+Pravidelně kontroluje GitHub pro nové verze a automaticky aktualizuje aplikaci.
+Cyklus běží v jediném procesu na stroji (zámek flock) a podle změněných souborů jen přenačte
+vtipy, doinstaluje závislosti nebo provede graceful restart.
 """
 import os
 import sys
+import fcntl
 import subprocess
-import time
 import threading
 import logging
 from datetime import datetime, timedelta
@@ -17,30 +19,103 @@ load_dotenv()
 UPDATE_CHECK_INTERVAL = int(os.getenv('UPDATE_CHECK_INTERVAL', 48 * 3600))  # 48 hodin v sekundách
 AUTO_UPDATE_ENABLED = os.getenv('AUTO_UPDATE_ENABLED', 'true').lower() == 'true'
 GIT_BRANCH = os.getenv('GIT_BRANCH', 'main')  # Branch pro kontrolu aktualizací
+# Zámek volby lídra - aktualizace spouští jen proces, který ho drží (výchozí .git/joker-auto-update.lock)
+AUTO_UPDATE_LOCK = os.getenv('AUTO_UPDATE_LOCK', '')
+
+# Jak často se ostatní procesy pokouší převzít zámek po skončení lídra (sekundy)
+LEADER_RETRY_INTERVAL = 60
+RESTART_DELAY = 5
+CONTENT_DIR = 'jokes/'
+REQUIREMENTS_FILE = 'requirements.txt'
+CODE_SUFFIXES = ('.py',)
+
+# Git nesmí nikdy čekat na zadání hesla z terminálu
+GIT_ENV = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+
+
+def classify_changes(paths):
+    """Určí kroky aktualizace podle změněných souborů - {'reload', 'install', 'restart'}
+
+    Vtipy v jokes/ stačí přenačíst, nové requirements.txt vyžaduje instalaci a restart
+    (balíčky se načtou až v novém procesu), změna kódu restart; ostatní soubory (dokumentace)
+    běh neovlivní.
+    """
+    actions = set()
+    for path in paths:
+        if path.startswith(CONTENT_DIR):
+            actions.add('reload')
+        elif path == REQUIREMENTS_FILE:
+            actions.update(('install', 'restart'))
+        elif path.endswith(CODE_SUFFIXES):
+            actions.add('restart')
+    return actions
 
 
 class AutoUpdater:
-    """Auto-update služba pro Joker API"""
+    """Auto-update služba pro Joker API
 
-    def __init__(self, app=None):
+    Vlákno běží v každém workeru, ale kontrolu a aktualizaci provádí jen lídr - proces, který
+    drží flock na AUTO_UPDATE_LOCK. Ostatní se jednou za minutu pokusí zámek převzít, takže
+    po skončení lídra převezme cyklus jiný worker. Příkazy běží jen ve vlákně služby, bez
+    vstupu z terminálu a s timeoutem, po kterém se podproces zabije.
+    """
+
+    def __init__(self, app=None, reload=None, repo_dir='.', lock_path=AUTO_UPDATE_LOCK):
         self.app = app
+        # Přenačtení korpusu pro změny jen v jokes/ (None = i ty řeší restart)
+        self.reload = reload
+        self.repo_dir = repo_dir
+        self.lock_path = lock_path or os.path.join(repo_dir, '.git', 'joker-auto-update.lock')
         self.logger = logging.getLogger('auto_updater')
         self.running = False
         self.thread = None
+        self.leader = False
+        self.lock_file = None
         self.last_check = None
-        self.current_commit = self._get_current_commit()
+        self.last_update = None
+        # Commit se zjistí až ve vlákně lídra, start workeru na git nečeká
+        self.current_commit = None
+        self._stop_event = threading.Event()
+
+    def _run(self, args, timeout):
+        """Spustí příkaz v repozitáři a vrátí stdout (CalledProcessError / TimeoutExpired)"""
+        result = subprocess.run(
+            args,
+            cwd=self.repo_dir,
+            env=GIT_ENV,
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=timeout
+        )
+        return result.stdout
+
+    def _acquire_leadership(self):
+        """Pokusí se získat zámek lídra (neblokující flock, drží ho proces do ukončení)"""
+        if self.leader:
+            return True
+        try:
+            if self.lock_file is None:
+                self.lock_file = open(self.lock_path, 'a')
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        self.leader = True
+        self.logger.info(f"Proces {os.getpid()} řídí auto-update (zámek {self.lock_path})")
+        return True
+
+    def _release_leadership(self):
+        """Uvolní zámek lídra"""
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+        self.leader = False
 
     def _get_current_commit(self):
         """Získá aktuální commit hash"""
         try:
-            result = subprocess.run(
-                ['git', 'rev-parse', 'HEAD'],
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=10
-            )
-            commit = result.stdout.strip()
+            commit = self._run(['git', 'rev-parse', 'HEAD'], timeout=10).strip()
             self.logger.info(f"Aktuální commit: {commit[:8]}")
             return commit
         except Exception as e:
@@ -51,14 +126,8 @@ class AutoUpdater:
         """Stáhne informace o aktualizacích z GitHubu"""
         try:
             self.logger.info(f"Kontroluji aktualizace z branch '{GIT_BRANCH}'...")
-            result = subprocess.run(
-                ['git', 'fetch', 'origin', GIT_BRANCH],
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=30
-            )
-            self.logger.debug(f"Git fetch výstup: {result.stdout}")
+            output = self._run(['git', 'fetch', 'origin', GIT_BRANCH], timeout=30)
+            self.logger.debug(f"Git fetch výstup: {output}")
             return True
         except subprocess.TimeoutExpired:
             self.logger.error("Git fetch timeout (30s)")
@@ -70,14 +139,7 @@ class AutoUpdater:
     def _get_remote_commit(self):
         """Získá commit hash z remote branch"""
         try:
-            result = subprocess.run(
-                ['git', 'rev-parse', f'origin/{GIT_BRANCH}'],
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=10
-            )
-            commit = result.stdout.strip()
+            commit = self._run(['git', 'rev-parse', f'origin/{GIT_BRANCH}'], timeout=10).strip()
             self.logger.info(f"Remote commit: {commit[:8]}")
             return commit
         except Exception as e:
@@ -101,52 +163,67 @@ class AutoUpdater:
             self.logger.info("Aplikace je aktuální")
             return False
 
+    def _install_requirements(self):
+        """Aktualizace Python závislostí (jen při změně requirements.txt)"""
+        self.logger.info("Instaluji Python závislosti...")
+        self._run([sys.executable, '-m', 'pip', 'install', '-q', '-r', REQUIREMENTS_FILE], timeout=120)
+        self.logger.info("Závislosti aktualizovány")
+
     def _apply_update(self):
-        """Aplikuje aktualizaci (git pull)"""
+        """Aplikuje aktualizaci (git pull) a vrátí seznam změněných souborů, None při chybě"""
         try:
             self.logger.info("Stahuji aktualizace...")
+            previous = self.current_commit
 
-            # Git pull
-            result = subprocess.run(
-                ['git', 'pull', 'origin', GIT_BRANCH],
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=60
-            )
-            self.logger.info(f"Git pull úspěšný: {result.stdout}")
-
-            # Aktualizace Python závislostí (pro případ nových balíčků)
-            self.logger.info("Kontroluji Python závislosti...")
-            subprocess.run(
-                ['pip', 'install', '-q', '-r', 'requirements.txt'],
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=120
-            )
-            self.logger.info("Závislosti aktualizovány")
+            output = self._run(['git', 'pull', 'origin', GIT_BRANCH], timeout=60)
+            self.logger.info(f"Git pull úspěšný: {output}")
 
-            return True
+            self.current_commit = self._run(['git', 'rev-parse', 'HEAD'], timeout=10).strip()
+            changed = self._run(['git', 'diff', '--name-only', previous, self.current_commit],
+                                timeout=10).split()
+            if REQUIREMENTS_FILE in changed:
+                self._install_requirements()
+            return changed
         except subprocess.TimeoutExpired:
             self.logger.error("Aktualizace timeout")
-            return False
+            return None
         except Exception as e:
             self.logger.error(f"Chyba při aplikaci aktualizace: {str(e)}")
-            return False
+            return None
+
+    def _reload_content(self):
+        """Změna jen ve vtipech - přenačte korpus bez restartu
+
+        Lídr přenačte svůj snímek hned, ostatní workery změnu zachytí vlastním hot reloadem
+        (reloader.py). Bez hot reloadu (reload=None) zbývá restart.
+        """
+        if self.reload is None:
+            self.logger.info("Hot reload korpusu neběží, změny vtipů vyžadují restart")
+            self._restart_application()
+            return
+        changed = self.reload()
+        self.logger.info(f"✅ Vtipy přenačteny bez restartu: {', '.join(changed) or 'beze změny korpusu'}")
 
     def _restart_application(self):
-        """Restartuje aplikaci"""
+        """Restartuje aplikaci
+
+        Pod gunicornem podle preload_app, který worker dostane od gunicorn.conf.py v proměnné
+        GUNICORN_RESTART: bez preloadu workery načtou nový kód po SIGHUP (graceful reload),
+        s preloadem drží starý kód master a načte ho až binární upgrade (SIGUSR2).
+        """
         self.logger.info("Restartuji aplikaci...")
 
-        # Pokud běžíme pod gunicorn, posíláme signal pro restart
-        # Gunicorn zachytí SIGHUP a provede graceful restart
         if 'gunicorn' in sys.argv[0] or os.getenv('GUNICORN_PROCESS'):
+            mode = os.getenv('GUNICORN_RESTART')
+            if mode not in ('reload', 'upgrade'):
+                self.logger.warning("Nelze zjistit, zda gunicorn běží s preload_app (spusť ho "
+                                    "s -c gunicorn.conf.py) - nový kód se načte až po ručním restartu")
+                return
             try:
-                # Graceful reload gunicorn workers
                 import signal
-                os.kill(os.getppid(), signal.SIGHUP)
-                self.logger.info("Poslán SIGHUP signal gunicorn master procesu")
+                sig = signal.SIGUSR2 if mode == 'upgrade' else signal.SIGHUP
+                os.kill(os.getppid(), sig)
+                self.logger.info(f"Poslán {sig.name} signal gunicorn master procesu")
             except Exception as e:
                 self.logger.error(f"Chyba při restartování gunicorn: {str(e)}")
         else:
@@ -157,48 +234,63 @@ class AutoUpdater:
             except Exception as e:
                 self.logger.error(f"Chyba při restartování procesu: {str(e)}")
 
+    def _run_check(self):
+        """Jedna kontrola aktualizací (jen v lídrovi)"""
+        self.last_check = datetime.now()
+        self.logger.info(f"Kontrola aktualizací: {self.last_check.strftime('%Y-%m-%d %H:%M:%S')}")
+        if self.current_commit is None:
+            self.current_commit = self._get_current_commit()
+
+        if not self._check_for_updates():
+            self.logger.info("✅ Žádné nové aktualizace")
+            return
+
+        self.logger.info("🔄 Zahajuji automatickou aktualizaci...")
+        changed = self._apply_update()
+        if changed is None:
+            self.logger.error("❌ Aktualizace selhala")
+            return
+
+        actions = classify_changes(changed)
+        self.last_update = {
+            'time': self.last_check.isoformat(),
+            'commit': self.current_commit[:8],
+            'changed_files': len(changed),
+            'actions': sorted(actions)
+        }
+        self.logger.info(f"✅ Aktualizace úspěšně stažena ({len(changed)} souborů, "
+                         f"kroky: {', '.join(sorted(actions)) or 'žádné'})")
+
+        if 'restart' in actions:
+            # Krátké čekání před restartem
+            if not self._stop_event.wait(RESTART_DELAY):
+                self._restart_application()
+        elif 'reload' in actions:
+            self._reload_content()
+        else:
+            self.logger.info("Změny neovlivňují běh aplikace, restart není potřeba")
+
     def _update_cycle(self):
-        """Hlavní cyklus pro kontrolu aktualizací"""
+        """Hlavní cyklus - lídr kontroluje aktualizace, ostatní čekají na uvolnění zámku"""
         self.logger.info(f"Auto-update služba spuštěna (kontrola každých {UPDATE_CHECK_INTERVAL/3600:.1f} hodin)")
 
         while self.running:
             try:
-                self.last_check = datetime.now()
-                self.logger.info(f"Kontrola aktualizací: {self.last_check.strftime('%Y-%m-%d %H:%M:%S')}")
-
-                # Kontrola aktualizací
-                if self._check_for_updates():
-                    self.logger.info("🔄 Zahajuji automatickou aktualizaci...")
+                if not self._acquire_leadership():
+                    self._stop_event.wait(LEADER_RETRY_INTERVAL)
+                    continue
 
-                    # Aplikace aktualizace
-                    if self._apply_update():
-                        self.logger.info("✅ Aktualizace úspěšně stažena")
+                self._run_check()
 
-                        # Krátké čekání před restartem
-                        time.sleep(5)
-
-                        # Restart aplikace
-                        self._restart_application()
-                    else:
-                        self.logger.error("❌ Aktualizace selhala")
-                else:
-                    self.logger.info("✅ Žádné nové aktualizace")
-
-                # Čekání do další kontroly
+                # Čekání do další kontroly (stop() čekání přeruší)
                 next_check = self.last_check + timedelta(seconds=UPDATE_CHECK_INTERVAL)
                 self.logger.info(f"Příští kontrola: {next_check.strftime('%Y-%m-%d %H:%M:%S')}")
-
-                # Spíme po částech, abychom mohli rychle ukončit
-                sleep_interval = 60  # Kontrola zastavení každou minutu
-                total_slept = 0
-                while total_slept < UPDATE_CHECK_INTERVAL and self.running:
-                    time.sleep(min(sleep_interval, UPDATE_CHECK_INTERVAL - total_slept))
-                    total_slept += sleep_interval
+                self._stop_event.wait(UPDATE_CHECK_INTERVAL)
 
             except Exception as e:
                 self.logger.error(f"Chyba v update cyklu: {str(e)}")
                 # Počkáme minutu a zkusíme znovu
-                time.sleep(60)
+                self._stop_event.wait(60)
 
     def start(self):
         """Spustí auto-update službu v samostatném vlákně"""
@@ -211,11 +303,12 @@ class AutoUpdater:
             return
 
         # Kontrola git repository
-        if not os.path.exists('.git'):
+        if not os.path.exists(os.path.join(self.repo_dir, '.git')):
             self.logger.warning("Nejsem v git repository - auto-update zakázán")
             return
 
         self.running = True
+        self._stop_event.clear()
         self.thread = threading.Thread(target=self._update_cycle, daemon=True, name="AutoUpdater")
         self.thread.start()
         self.logger.info("Auto-update služba úspěšně spuštěna")
@@ -227,8 +320,10 @@ class AutoUpdater:
 
         self.logger.info("Zastavuji auto-update službu...")
         self.running = False
+        self._stop_event.set()
         if self.thread:
             self.thread.join(timeout=5)
+        self._release_leadership()
         self.logger.info("Auto-update služba zastavena")
 
     def get_status(self):
@@ -236,8 +331,10 @@ class AutoUpdater:
         return {
             'enabled': AUTO_UPDATE_ENABLED,
             'running': self.running,
+            'role': 'leader' if self.leader else 'follower',
             'current_commit': self.current_commit[:8] if self.current_commit else None,
             'last_check': self.last_check.isoformat() if self.last_check else None,
+            'last_update': self.last_update,
             'check_interval_hours': UPDATE_CHECK_INTERVAL / 3600,
             'branch': GIT_BRANCH
         }
@@ -247,11 +344,11 @@ class AutoUpdater:
 _auto_updater = None
 
 
-def init_auto_updater(app=None):
-    """Inicializuje a spustí auto-updater"""
+def init_auto_updater(app=None, reload=None):
+    """Inicializuje a spustí auto-updater (reload = přenačtení korpusu pro změny jen ve vtipech)"""
     global _auto_updater
     if _auto_updater is None:
-        _auto_updater = AutoUpdater(app)
+        _auto_updater = AutoUpdater(app, reload)
         _auto_updater.start()
     return _auto_updater
 
@@ -0,0 +1,823 @@
+#!/usr/bin/env python3
+"""
+Benchmark skript pro Joker API
+Měří propustnost endpointů in-process přes Flask test client (bez sítě)
+Spusť: python benchmark.py [scénář] [--requests N]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+from loadtest import child_pids, free_port, generate_corpus, http_load, read_rss, wait_for_port
+from redis_standin import RedisStandin
+
+# Benchmark nesmí spouštět auto-update ani narážet na rate limit
+os.environ.setdefault('AUTO_UPDATE_ENABLED', 'false')
+
+from app import app, limiter
+
+limiter.enabled = False
+
+
+# Počet opakování měření - bere se nejlepší běh (potlačí šum z GC a plánovače)
+REPEAT = 3
+
+
+def measure(client, url, requests_count, **kwargs):
+    """Změří počet požadavků za sekundu pro daný URL"""
+    # Zahřátí (cache, lazy importy)
+    for _ in range(min(200, requests_count)):
+        client.get(url, **kwargs)
+
+    elapsed = float('inf')
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        for _ in range(requests_count):
+            response = client.get(url, **kwargs)
+        elapsed = min(elapsed, time.perf_counter() - start)
+
+    return {
+        'url': url,
+        'requests': requests_count,
+        'seconds': elapsed,
+        'rps': requests_count / elapsed,
+        'status': response.status_code,
+        'bytes': len(response.get_data())
+    }
+
+
+def print_result(name, result):
+    """Vytiskne výsledek měření"""
+    print(f"  {name:<40} {result['rps']:>10.0f} req/s  "
+          f"({result['bytes']} B, HTTP {result['status']})")
+
+
+def wire_bytes(response):
+    """Velikost odpovědi na drátě - stavový řádek, hlavičky a tělo (HTTP/1.1 bez komprese)"""
+    return (len('HTTP/1.1 200 OK\r\n') + sum(len(f"{name}: {value}\r\n") for name, value in response.headers.items())
+            + 2 + len(response.get_data()))
+
+
+def bench_joke(client, requests_count):
+    """/joke - předrenderovaná odpověď vs. dynamický jsonify (?timestamp=true)"""
+    print_result('/joke (předrenderovaná těla)',
+                 measure(client, '/joke?lang=cz&category=normal', requests_count))
+    print_result('/joke?timestamp=true (jsonify)',
+                 measure(client, '/joke?lang=cz&category=normal&timestamp=true', requests_count))
+
+
+def bench_metadata(client, requests_count):
+    """Metadata endpointy - plná odpověď z cache generace vs. podmíněný GET (304)"""
+    for url in ('/', '/stats'):
+        etag = client.get(url).headers['ETag']
+        print_result(f'{url} (200)', measure(client, url, requests_count))
+        print_result(f'{url} If-None-Match (304)',
+                     measure(client, url, requests_count, headers={'If-None-Match': etag}))
+
+
+def bench_batch(client, requests_count):
+    """10 vtipů - 10x /joke vs. 1x /jokes?count=10"""
+    single = measure(client, '/joke?lang=cz&category=normal', requests_count)
+    batch = measure(client, '/jokes?lang=cz&category=normal&count=10', requests_count // 10 or 1)
+    print_result('/joke (10 požadavků na 10 vtipů)', dict(single, rps=single['rps'] / 10))
+    print_result('/jokes?count=10 (1 požadavek)', batch)
+
+
+def bench_stream(client, requests_count):
+    """Stejný počet vtipů - polling /joke vs. jeden stream (NDJSON/SSE), CPU a bytes na vtip"""
+    from app import load_joke_bodies
+    from streaming import joke_stream
+
+    polling = measure(client, '/joke?lang=cz&category=normal', requests_count)
+    # Polling platí za každý vtip i stavový řádek a hlavičky odpovědi
+    print(f"  {'polling /joke':<40} {1e6 / polling['rps']:>8.1f} µs/vtip  "
+          f"{wire_bytes(client.get('/joke?lang=cz&category=normal')):>6} B/vtip")
+
+    bodies = load_joke_bodies('cz', 'normal')
+    for stream_format in ('ndjson', 'sse'):
+        events = joke_stream(lambda: bodies, stream_format, interval=0, heartbeat=3600,
+                             max_duration=3600, sleep=lambda seconds: None)
+        if stream_format == 'sse':
+            next(events)  # úvodní "retry:" se nepočítá
+        size = 0
+        start = time.perf_counter()
+        for _ in range(requests_count):
+            size += len(next(events))
+        elapsed = time.perf_counter() - start
+        print(f"  {'stream ' + stream_format:<40} {elapsed * 1e6 / requests_count:>8.1f} µs/vtip  "
+              f"{size // requests_count:>6} B/vtip")
+
+
+# Kód spuštěný v čistém procesu - změří start (načtení korpusu) a RSS workeru
+BOOT_PROBE = """
+import os, time, random
+start = time.perf_counter()
+import app
+app.get_app()  # korpus se načítá až s aplikací
+elapsed = time.perf_counter() - start
+for _ in range(1000):
+    lang = random.choice(app.SUPPORTED_LANGUAGES)
+    cat = random.choice(app.SUPPORTED_CATEGORIES)
+    bodies = app.load_joke_bodies(lang, cat)
+    bodies[random.randrange(len(bodies))]
+rss = [int(line.split()[1]) for line in open('/proc/self/status') if line.startswith('VmRSS')][0]
+print(f"{elapsed:.4f} {rss}")
+"""
+
+
+def probe_boot(workdir, env):
+    """Spustí BOOT_PROBE v podprocesu a vrátí (sekundy, RSS v kB)"""
+    output = subprocess.run([sys.executable, '-c', BOOT_PROBE], cwd=workdir, env=env,
+                            capture_output=True, text=True, check=True).stdout.split()
+    return float(output[0]), int(output[1])
+
+
+def bench_corpus(client, requests_count, size_mb=64):
+    """Start workeru a RSS - TXT soubory vs. zkompilovaný korpus (mmap)"""
+    from corpus import compile_corpus
+    from config import Config
+
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as workdir:
+        jokes_dir = os.path.join(workdir, 'jokes')
+        os.mkdir(jokes_dir)
+        generate_corpus(jokes_dir, size_mb)
+        corpus_file = os.path.join(workdir, 'jokes.corpus')
+        compile_corpus(jokes_dir, corpus_file, Config.SUPPORTED_LANGUAGES, Config.SUPPORTED_CATEGORIES)
+
+        env = dict(os.environ, PYTHONPATH=app_dir, AUTO_UPDATE_ENABLED='false', FLASK_DEBUG='true')
+        txt_boot, txt_rss = probe_boot(workdir, dict(env, CORPUS_FILE=''))
+        mmap_boot, mmap_rss = probe_boot(workdir, dict(env, CORPUS_FILE=corpus_file))
+
+    print(f"  Korpus: {size_mb} MB textu")
+    print(f"  {'TXT soubory':<40} start {txt_boot * 1000:>8.1f} ms   RSS {txt_rss / 1024:>8.1f} MB")
+    print(f"  {'zkompilovaný korpus (mmap)':<40} start {mmap_boot * 1000:>8.1f} ms   RSS {mmap_rss / 1024:>8.1f} MB")
+
+
+def bench_servers(client, requests_count, workers=2, connections=(16, 256)):
+    """Reálné servery přes síť - gunicorn sync / gthread (WSGI) vs. uvicorn (ASGI)"""
+    import asyncio
+
+    servers = {
+        'gunicorn sync': ['gunicorn', '--worker-class', 'sync', '-w', str(workers), 'app:app'],
+        'gunicorn gthread': ['gunicorn', '--worker-class', 'gthread', '--threads', '16',
+                             '-w', str(workers), 'app:app'],
+        # UvicornWorker místo "uvicorn --workers" - sockety předané spawnem ztrácí TCP_NODELAY
+        'gunicorn + uvicorn (asgi.py)': ['gunicorn', '--worker-class', 'uvicorn.workers.UvicornWorker',
+                                         '-w', str(workers), 'asgi:app'],
+    }
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, AUTO_UPDATE_ENABLED='false', RATELIMIT_ENABLED='false')
+
+    for port, (name, command) in enumerate(servers.items(), start=18700):
+        process = subprocess.Popen(command + ['-b', f'127.0.0.1:{port}'], cwd=app_dir, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port(port, process)
+            # Zahřátí - u uvicornu naslouchá socket dřív, než workery doimportují aplikaci
+            asyncio.run(http_load(port, '/joke', min(2000, requests_count), 16))
+            for concurrency in connections:
+                elapsed, latencies, statuses = asyncio.run(
+                    http_load(port, '/joke?lang=cz&category=normal', requests_count, concurrency))
+                errors = requests_count - statuses[200]
+                p50 = latencies[len(latencies) // 2] * 1000
+                p99 = latencies[int(len(latencies) * 0.99)] * 1000
+                print(f"  {name + f' c={concurrency}':<40} {requests_count / elapsed:>10.0f} req/s  "
+                      f"p50 {p50:>7.1f} ms  p99 {p99:>7.1f} ms  chyby {errors}")
+        except (RuntimeError, OSError) as e:
+            print(f"  {name:<40} ❌ {e}")
+        finally:
+            process.terminate()
+            process.wait()
+
+
+def read_pss(pid):
+    """PSS procesu v kB - sdílené stránky se dělí mezi procesy, které je mapují"""
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('Pss:'))
+
+
+def first_response(port, process, timeout=60):
+    """Počká na první úspěšně obsloužený požadavek /joke"""
+    import asyncio
+
+    deadline = time.monotonic() + timeout
+    wait_for_port(port, process, timeout)
+    while time.monotonic() < deadline:
+        try:
+            _, _, statuses = asyncio.run(http_load(port, '/joke', 1, 1))
+            if statuses[200]:
+                return
+        except (OSError, IndexError):
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"Server na portu {port} neobsloužil požadavek")
+
+
+def settled_memory(master, workers, timeout=60):
+    """Počká, až naběhnou všechny workery a jejich PSS se ustálí, vrátí (RSS, PSS) workerů v kB"""
+    deadline = time.monotonic() + timeout
+    previous = None
+    while time.monotonic() < deadline:
+        pids = child_pids(master)
+        if len(pids) == workers:
+            memory = [(read_rss(pid), read_pss(pid)) for pid in pids]
+            if memory == previous:
+                return memory
+            previous = memory
+        time.sleep(0.5)
+    return previous or []
+
+
+def bench_startup(client, requests_count, worker_counts=(1, 2, 4, 8), size_mb=16):
+    """Start gunicornu - čas do prvního obslouženého požadavku a paměť na worker, s preload_app a bez"""
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as workdir:
+        os.mkdir(os.path.join(workdir, 'jokes'))
+        generate_corpus(os.path.join(workdir, 'jokes'), size_mb)
+        print(f"  Korpus: {size_mb} MB textu, gunicorn.conf.py (gthread)")
+        for workers in worker_counts:
+            for preload in ('true', 'false'):
+                port = free_port()
+                env = dict(os.environ, PYTHONPATH=app_dir, AUTO_UPDATE_ENABLED='false', METRICS_DIR=workdir,
+                           GUNICORN_PRELOAD=preload, WEB_CONCURRENCY=str(workers), PORT=str(port),
+                           HOST='127.0.0.1')
+                start = time.perf_counter()
+                process = subprocess.Popen(['gunicorn', '-c', os.path.join(app_dir, 'gunicorn.conf.py')],
+                                           cwd=workdir, env=env,
+                                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                try:
+                    first_response(port, process)
+                    first = time.perf_counter() - start
+                    memory = settled_memory(process.pid, workers)
+                    master_pss = read_pss(process.pid)
+                except (RuntimeError, OSError) as e:
+                    print(f"  {workers} workery, preload={preload:<5} ❌ {e}")
+                    continue
+                finally:
+                    process.terminate()
+                    process.wait()
+                rss = sum(m[0] for m in memory) / len(memory) / 1024
+                pss = sum(m[1] for m in memory) / len(memory) / 1024
+                total = (sum(m[1] for m in memory) + master_pss) / 1024
+                name = f"{workers} workery, preload={preload}"
+                print(f"  {name:<28} první odpověď {first * 1000:>7.0f} ms  RSS/worker {rss:>6.1f} MB  "
+                      f"PSS/worker {pss:>6.1f} MB  PSS celkem {total:>7.1f} MB")
+
+
+# Kód spuštěný v podprocesu - jeden "worker" zasahuje do sdíleného limitu
+LIMIT_PROBE = """
+import sys, ratelimit
+from limits import parse, strategies
+from limits.storage import storage_from_string
+storage = storage_from_string(sys.argv[1])
+limiter = strategies.FixedWindowRateLimiter(storage)
+item = parse('200 per minute')
+print(sum(limiter.hit(item, '127.0.0.1', 'joke') for _ in range(int(sys.argv[2]))))
+"""
+
+
+def bench_ratelimit(client, requests_count, workers=4):
+    """Rate limit úložiště - latence zásahu (memory, shm, Redis zástupce, Redis s lease) a přesnost mezi workery"""
+    from limits import parse, strategies
+    from limits.storage import storage_from_string
+
+    item = parse('1000000 per minute')
+    standin = RedisStandin()
+    redis_uri = standin.start()
+    with tempfile.TemporaryDirectory() as workdir:
+        shm_uri = f"shm://{os.path.join(workdir, 'ratelimit')}"
+        lease_uri = redis_uri.replace('redis://', 'redis+lease://') + '/0?lease=10'
+        backends = [('memory://', 'fixed-window'), (shm_uri, 'fixed-window'),
+                    (shm_uri, 'gcra'), (redis_uri, 'fixed-window'),
+                    (lease_uri, 'fixed-window')]
+        for uri, strategy in backends:
+            try:
+                storage = storage_from_string(uri)
+            except Exception as e:  # redis klient nemusí být nainstalovaný
+                print(f"  {uri.split(':')[0] + ' ' + strategy:<40} ❌ {e}")
+                continue
+            limiter = strategies.STRATEGIES[strategy](storage)
+            keys = [f'10.0.{i // 256}.{i % 256}' for i in range(1000)]
+            latencies = []
+            for i in range(requests_count):
+                start = time.perf_counter()
+                limiter.hit(item, keys[i % len(keys)], 'joke')
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            name = 'shm (gcra)' if strategy == 'gcra' else uri.split(':')[0]
+            print(f"  {name:<40} {sum(latencies) * 1e6 / requests_count:>8.2f} µs/zásah  "
+                  f"p50 {latencies[len(latencies) // 2] * 1e6:>7.1f} µs  "
+                  f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:>7.1f} µs")
+
+        # Přesnost: workers procesů, každý 200 zásahů do limitu 200/min pro stejnou IP
+        app_dir = os.path.dirname(os.path.abspath(__file__))
+        env = dict(os.environ, PYTHONPATH=app_dir)
+        lease_accuracy_uri = redis_uri.replace('redis://', 'redis+lease://') + '?lease=10'
+        for uri in ('memory://', shm_uri + '-accuracy', redis_uri, lease_accuracy_uri):
+            standin.data.clear()  # zástupce nerozlišuje databáze
+            processes = [subprocess.Popen([sys.executable, '-c', LIMIT_PROBE, uri, '200'], env=env,
+                                          stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+                         for _ in range(workers)]
+            allowed = sum(int(process.communicate()[0] or 0) for process in processes)
+            print(f"  {uri.split(':')[0] + f' - {workers} workery, limit 200':<40} povoleno {allowed:>5}")
+    standin.stop()
+
+
+def bench_logging(client, requests_count):
+    """Flood neplatných požadavků - latence s přímým zápisem logu vs. fronta s deduplikací"""
+    import logging
+    from log_pipeline import LogPipeline, create_file_handler
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'joker.log')
+        original = app.logger.handlers[:]
+        sync_handler = create_file_handler(path, shared=False)
+        pipeline = LogPipeline([create_file_handler(path)])
+        modes = [('přímý zápis (RotatingFileHandler)', sync_handler, None),
+                 ('fronta + deduplikace (log_pipeline)', pipeline.handler, pipeline)]
+        try:
+            for name, handler, running in modes:
+                app.logger.handlers = [handler]
+                app.logger.setLevel(logging.INFO)
+                if running:
+                    running.start()
+                latencies = []
+                for i in range(requests_count):
+                    # Flood z několika IP - stejná zpráva se opakuje
+                    start = time.perf_counter()
+                    client.get('/joke?lang=xx', environ_base={'REMOTE_ADDR': f'10.0.0.{i % 8}'})
+                    latencies.append(time.perf_counter() - start)
+                if running:
+                    running.stop()
+                latencies.sort()
+                size = sum(os.path.getsize(os.path.join(workdir, f)) for f in os.listdir(workdir)
+                           if f.startswith('joker.log') and not f.endswith('.lock'))
+                print(f"  {name:<40} p50 {latencies[len(latencies) // 2] * 1e6:>7.1f} µs  "
+                      f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:>7.1f} µs  log {size // 1024:>6} kB")
+                for f in os.listdir(workdir):
+                    os.remove(os.path.join(workdir, f))
+        finally:
+            app.logger.handlers = original
+            sync_handler.close()
+
+
+def bench_metrics(client, requests_count):
+    """Režie metrik na /joke - bez metrik vs. čítače ve sdílené paměti (rozpočet 5 µs/požadavek)"""
+    import app as joker
+    from metrics import Metrics
+
+    url = '/joke?lang=cz&category=normal'
+    original = joker.metrics
+    with tempfile.TemporaryDirectory() as workdir:
+        enabled = Metrics(sorted(app.view_functions), joker.SUPPORTED_LANGUAGES,
+                          joker.SUPPORTED_CATEGORIES, directory=workdir)
+        results = {}
+        try:
+            # Režimy se střídají, aby drift stroje nepadl jen na jeden z nich
+            for _ in range(2):
+                for name, instance in [('bez metrik', None), ('s metrikami', enabled)]:
+                    joker.metrics = instance
+                    result = measure(client, url, requests_count)
+                    if name not in results or result['rps'] > results[name]['rps']:
+                        results[name] = result
+        finally:
+            joker.metrics = original
+        for name, result in results.items():
+            print_result(f'/joke {name}', result)
+
+        overhead = 1e6 / results['s metrikami']['rps'] - 1e6 / results['bez metrik']['rps']
+        start = time.perf_counter()
+        for _ in range(requests_count):
+            enabled.record_request('get_joke', 200, 0.0004)
+            enabled.record_jokes('cz', 'normal')
+        record = (time.perf_counter() - start) / requests_count * 1e6
+        # Rozdíl end-to-end je pod šumem test clientu, rozpočet se hlídá na samotném zápisu
+        print(f"  {'rozdíl end-to-end (v šumu)':<40} {overhead:>10.2f} µs")
+        print(f"  {'record_request + record_jokes':<40} {record:>10.2f} µs")
+        start = time.perf_counter()
+        enabled.render()
+        print(f"  {'render /metrics':<40} {(time.perf_counter() - start) * 1e3:>10.2f} ms")
+
+
+def bench_profiling(client, requests_count):
+    """Režie měření fází a profileru - vypnutý profiler, Server-Timing, profilovaný požadavek"""
+    from profiling import PhaseTimer, SamplingProfiler
+
+    with tempfile.TemporaryDirectory() as workdir:
+        profiler = SamplingProfiler(every=0, output_dir=workdir, control_path=os.path.join(workdir, 'control'))
+        start = time.perf_counter()
+        for _ in range(requests_count):
+            profiler.begin_request()
+        print(f"  {'vypnutý profiler (hook na požadavek)':<40} "
+              f"{(time.perf_counter() - start) / requests_count * 1e6:>8.3f} µs")
+
+        start = time.perf_counter()
+        for _ in range(requests_count):
+            timer = PhaseTimer()
+            for phase in ('limiter', 'params', 'load', 'render', 'headers', 'cors'):
+                timer.mark(phase)
+            timer.header()
+        print(f"  {'PhaseTimer + Server-Timing':<40} "
+              f"{(time.perf_counter() - start) / requests_count * 1e6:>8.3f} µs")
+
+    # Profilovaný požadavek - globální profiler aplikace, profiluje se každý požadavek
+    from app import get_profiler
+
+    url = '/joke?lang=cz&category=normal'
+    profiler = get_profiler()
+    print_result('/joke bez profilování', measure(client, url, requests_count))
+    try:
+        profiler.configure(every=1)
+        print_result('/joke profilovaný (1 z 1)', measure(client, url, requests_count))
+    finally:
+        profiler.configure(every=profiler.default_every, seconds=0)
+
+
+def synthetic_jokes(count, seed=42):
+    """Vtipy z umělého slovníku se Zipfovým rozdělením slov (slova s diakritikou)"""
+    import random
+
+    rng = random.Random(seed)
+    syllables = ['ka', 'lo', 'mí', 'ře', 'šu', 'tá', 'no', 'vě', 'zu', 'čí', 'dů', 'ny']
+    words = ['blondýna', 'pepíček', 'doktor', 'tchyně', 'policajt']
+    words += [a + b for a in syllables for b in syllables] + [a + b + c for a in syllables
+                                                           for b in syllables for c in syllables]
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    rng.shuffle(words)
+    return [' '.join(rng.choices(words, weights, k=rng.randint(6, 16))).capitalize() + '.'
+            for _ in range(count)]
+
+
+def bench_search(client, requests_count, size=1_000_000):
+    """/search - stavba indexu pro 1M vtipů a latence dotazů bez cache (slovo, AND, prefix)"""
+    from search import SearchIndex, parse_query
+
+    jokes = synthetic_jokes(size)
+    start = time.perf_counter()
+    index = SearchIndex(jokes, 'cz')
+    build = time.perf_counter() - start
+    print(f"  Index {size} vtipů: stavba {build:.1f} s, {len(index.terms)} slov, "
+          f"{index.memory() / 2 ** 20:.0f} MB")
+
+    by_frequency = sorted(index.terms, key=lambda word: len(index.postings[word]))
+    rare, medium, common = by_frequency[10], by_frequency[len(by_frequency) // 2], by_frequency[-3]
+    queries = [
+        ('vzácné slovo', rare),
+        ('střední slovo', medium),
+        ('časté slovo', common),
+        ('bez diakritiky (blondyna)', 'blondyna'),
+        ('AND vzácné + časté', f'{rare} {common}'),
+        ('AND 2 střední', f'{medium} {by_frequency[len(by_frequency) // 2 + 1]}'),
+        ('prefix (3 znaky)', f'{medium[:3]}*'),
+    ]
+    runs = max(20, requests_count // 50)
+    for name, query in queries:
+        terms = parse_query(query, 'cz')
+        latencies = []
+        for _ in range(runs):
+            # _match_terms obchází cache dotazů - měří se průnik a sjednocení posting listů
+            start = time.perf_counter()
+            matches = index._match_terms(terms)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(f"  {name:<28} {len(matches):>8} shod  p50 {latencies[len(latencies) // 2] * 1e3:>7.3f} ms"
+              f"  p99 {latencies[int(len(latencies) * 0.99)] * 1e3:>7.3f} ms")
+
+    start = time.perf_counter()
+    for _ in range(requests_count):
+        index.search(f'{medium} {common}')
+    print(f"  {'opakovaný dotaz (cache)':<28} {(time.perf_counter() - start) / requests_count * 1e6:>8.1f} µs")
+    print_result('/search (korpus aplikace)', measure(client, '/search?q=pes*&lang=cz&page=1', requests_count))
+
+
+def bench_lengths(client, requests_count, size=500_000):
+    """Výběr vtipu pro tiskárnu (max_length/max_lines) - opakování /joke, filtrování, index délek"""
+    import random
+    from length_index import LengthIndex
+
+    # Zešikmené rozdělení délek: většina vtipů kolem 250 znaků, krátkých je málo
+    rng = random.Random(42)
+    text = 'Přijde chlap do hospody a povídá hostinskému, že chce pivo. ' * 40
+    jokes = []
+    for _ in range(size):
+        length = max(10, min(2000, int(rng.lognormvariate(5.5, 0.6))))
+        joke = text[:length]
+        jokes.append('\n'.join(joke[i:i + 60] for i in range(0, len(joke), 60)))
+
+    start = time.perf_counter()
+    index = LengthIndex(jokes)
+    print(f"  Index {size} vtipů: stavba {time.perf_counter() - start:.2f} s")
+
+    for limits in ({'max_length': 48}, {'max_length': 120, 'max_lines': 2}, {'max_length': 400}):
+        label = ', '.join(f'{name}={value}' for name, value in limits.items())
+        max_length, max_lines = limits['max_length'], limits.get('max_lines', 10 ** 9)
+
+        start = time.perf_counter()
+        matching = [i for i, joke in enumerate(jokes) if len(joke) <= max_length and joke.count('\n') < max_lines]
+        scan = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(requests_count):
+            fitting = index.select(**limits)
+            fitting[random.randrange(len(fitting))]
+        indexed = (time.perf_counter() - start) / requests_count
+
+        share = len(matching) / size
+        print(f"  {label:<28} vyhovuje {share:>6.2%}  opakování /joke ~{1 / share:>6.0f}×  "
+              f"filtrování {scan * 1e3:>7.1f} ms  index {indexed * 1e6:>6.1f} µs")
+
+    print_result('/joke', measure(client, '/joke?lang=cz&category=normal', requests_count))
+    print_result('/joke?max_length=2000&max_lines=40',
+                 measure(client, '/joke?lang=cz&category=normal&max_length=2000&max_lines=40', requests_count))
+
+
+def bench_wrapping(client, requests_count, size=100_000):
+    """Zalomení pro tiskárny - wrap při každém požadavku vs. texty připravené při načtení"""
+    from wrapping import WrappedJokes, wrap_joke
+
+    jokes = synthetic_jokes(size)
+    for width in (32, 42, 48):
+        start = time.perf_counter()
+        wrapped = WrappedJokes(jokes, width)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(requests_count):
+            wrap_joke(jokes[i % size], width).encode('utf-8')
+        per_request = (time.perf_counter() - start) / requests_count
+        start = time.perf_counter()
+        for i in range(requests_count):
+            wrapped[i % size]
+        lookup = (time.perf_counter() - start) / requests_count
+        print(f"  šířka {width}: wrap na požadavek {per_request * 1e6:>6.1f} µs, připravený text "
+              f"{lookup * 1e6:>5.2f} µs; příprava {size} vtipů {build:.1f} s, {wrapped.memory() / 2 ** 20:.1f} MB")
+
+    print_result('/joke', measure(client, '/joke?lang=cz&category=normal', requests_count))
+    print_result('/joke?width=32&format=text', measure(client, '/joke?lang=cz&width=32&format=text', requests_count))
+
+
+def bench_formats(client, requests_count):
+    """Formáty /joke - JSON, compact a text/plain: req/s, tělo a bytes na drátě"""
+    for name, url, headers in (
+            ('json', '/joke?lang=cz', {}),
+            ('json + timestamp (jsonify)', '/joke?lang=cz&timestamp=true', {}),
+            ('compact', '/joke?lang=cz&format=compact', {}),
+            ('text (format=text)', '/joke?lang=cz&format=text', {}),
+            ('text (Accept: text/plain)', '/joke?lang=cz', {'Accept': 'text/plain'}),
+            ('text width=32', '/joke?lang=cz&format=text&width=32', {})):
+        result = measure(client, url, requests_count, headers=headers)
+        wire = sum(wire_bytes(client.get(url, headers=headers)) for _ in range(100)) / 100
+        print(f"  {name:<40} {result['rps']:>10.0f} req/s  {wire:>6.0f} B na drátě")
+
+
+def bench_compression(client, requests_count):
+    """Komprese - identity vs. předkomprimovaný gzip vs. gzip při každém požadavku (CPU a bytes)"""
+    import gzip
+
+    for url in ('/', '/stats'):
+        print_result(f'{url} (identity)', measure(client, url, requests_count))
+        headers = {'Accept-Encoding': 'gzip, deflate, br'}
+        result = measure(client, url, requests_count, headers=headers)
+        print(f"  {url + ' (předkomprimovaný)':<40} {result['rps']:>10.0f} req/s  "
+              f"{wire_bytes(client.get(url, headers=headers))} B na drátě "
+              f"({result['bytes']} B tělo, {client.get(url, headers=headers).headers.get('Content-Encoding', 'identity')})")
+
+    # Komprese v request path (middleware) - cena za požadavek u metadat a dávky
+    for url in ('/', '/jokes?lang=cz&count=50'):
+        body = client.get(url).get_data()
+        start = time.perf_counter()
+        for _ in range(requests_count):
+            compressed = gzip.compress(body, 6)
+        per_request = (time.perf_counter() - start) / requests_count
+        print(f"  {'gzip za běhu ' + url:<40} {per_request * 1e6:>8.1f} µs/požadavek  "
+              f"{len(body)} B -> {len(compressed)} B")
+
+
+def bench_period(client, requests_count):
+    """Vtip intervalu - náhodný /joke vs. /joke/daily z cache workeru vs. revalidace (304)"""
+    from app import JOKE_PERIODS
+
+    print_result('/joke (náhodný, necachovatelný)', measure(client, '/joke?lang=cz', requests_count))
+    print_result('/joke/daily (200)', measure(client, '/joke/daily?lang=cz', requests_count))
+    etag = client.get('/joke/daily?lang=cz').headers['ETag']
+    print_result('/joke/daily If-None-Match (304)',
+                 measure(client, '/joke/daily?lang=cz', requests_count, headers={'If-None-Match': etag}))
+    # Za CDN dojde na origin jeden požadavek na interval a POP bez ohledu na počet displejů
+    for period, length in JOKE_PERIODS.items():
+        print(f"  {period:<40} {86400 / length:>10.0f} požadavků/den na POP (místo 1440 na display při pollingu 1/min)")
+
+
+def bench_jokestore(client, requests_count, size=10_000_000):
+    """SQLite úložiště - náhodný vtip podle klíče vs. ORDER BY random() na 10M řádků, zápisy,
+    start aplikace a hot reload s CORPUS_DB"""
+    import random
+    import app as joker
+    from config import Config
+    from jokestore import JokeStore, import_dir
+
+    jokes = synthetic_jokes(100_000)
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'jokes.db')
+        store = JokeStore(path)
+        # Ostatní záznamy z jokes/, velký je cz_normal
+        import_dir(store, Config.JOKES_DIR, Config.SUPPORTED_LANGUAGES, Config.SUPPORTED_CATEGORIES)
+        start = time.perf_counter()
+        store.replace('cz', 'normal', (jokes[i % len(jokes)] for i in range(size)))
+        print(f"  import {size} vtipů: {time.perf_counter() - start:.1f} s, "
+              f"{os.path.getsize(path) / 2 ** 20:.0f} MB")
+
+        stored = store.view().get('cz', 'normal')
+        start = time.perf_counter()
+        for _ in range(requests_count):
+            stored[random.randrange(len(stored))]
+        lookup = (time.perf_counter() - start) / requests_count
+        print(f"  {'náhodný vtip (id = randrange)':<40} {lookup * 1e6:>10.1f} µs")
+
+        conn = store._connection()
+        start = time.perf_counter()
+        for _ in range(3):
+            conn.execute("SELECT text FROM jokes WHERE language = 'cz' AND category = 'normal' "
+                         "ORDER BY random() LIMIT 1").fetchone()
+        print(f"  {'ORDER BY random() LIMIT 1':<40} {(time.perf_counter() - start) / 3 * 1e6:>10.1f} µs")
+
+        for name, change in (('add', lambda: store.add('cz', 'normal', 'Nový vtip.')),
+                             ('delete', lambda: store.delete('cz', 'normal', random.randrange(size // 2)))):
+            start = time.perf_counter()
+            for _ in range(100):
+                change()
+            print(f"  {name:<40} {(time.perf_counter() - start) / 100 * 1e6:>10.1f} µs (commit ve WAL)")
+
+        # Start workeru - korpus z CORPUS_DB (bez průchodu záznamy)
+        app_dir = os.path.dirname(os.path.abspath(__file__))
+        env = dict(os.environ, PYTHONPATH=app_dir, AUTO_UPDATE_ENABLED='false', FLASK_DEBUG='true',
+                   CORPUS_DB=path, CORPUS_FILE='')
+        boot, rss = probe_boot(workdir, env)
+        print(f"  {'start aplikace s CORPUS_DB':<40} {boot * 1000:>10.1f} ms   RSS {rss / 1024:>6.1f} MB")
+
+        # Hot reload v aplikaci po změně záznamu (každý worker ho dělá sám)
+        saved = {name: getattr(joker, name) for name in ('CORPUS_DB', 'ADMIN_API_KEY', 'corpus_snapshot')}
+        joker.CORPUS_DB, joker.ADMIN_API_KEY = path, 'bench'
+        try:
+            start = time.perf_counter()
+            joker.reload_jokes()
+            print(f"  {'reload: načtení všech záznamů':<40} {(time.perf_counter() - start) * 1000:>10.1f} ms")
+            start = time.perf_counter()
+            client.get('/joke?lang=cz&min_length=1')
+            print(f"  {'první /joke s délkou (stavba indexu)':<40} {(time.perf_counter() - start) * 1000:>10.1f} ms")
+            for name, change in (('add', lambda: store.add('cz', 'normal', 'Nový vtip.')),
+                                 ('delete', lambda: store.delete('cz', 'normal', random.randrange(size // 2)))):
+                change()
+                start = time.perf_counter()
+                joker.reload_jokes()
+                print(f"  {f'reload po {name}':<40} {(time.perf_counter() - start) * 1000:>10.1f} ms")
+            start = time.perf_counter()
+            for _ in range(requests_count):
+                client.get('/joke?lang=cz')
+            print(f"  {'/joke po reloadu':<40} {(time.perf_counter() - start) / requests_count * 1e6:>10.1f} µs")
+
+            # /admin/jokes - zápis a reload, který sestavené indexy jen rozšíří o nový vtip
+            client.get('/joke?lang=cz&min_length=1')
+            start = time.perf_counter()
+            for i in range(100):
+                client.post('/admin/jokes', json={'joke': f'Přidaný vtip {i}.'}, headers={'Authorization': 'Bearer bench'})
+            print(f"  {'POST /admin/jokes (zápis + reload)':<40} {(time.perf_counter() - start) / 100 * 1000:>10.1f} ms")
+        finally:
+            for name, value in saved.items():
+                setattr(joker, name, value)
+
+
+def bench_ingest(client, requests_count, batch=1000, batches=20):
+    """/admin/jokes - propustnost dávek NDJSON, skupinový fsync a latence /joke během příjmu"""
+    import json
+    import threading
+    import app as joker
+    from ingest import IngestLog
+
+    jokes = synthetic_jokes(batch * batches)
+    headers = {'Authorization': 'Bearer bench', 'Content-Type': 'application/x-ndjson'}
+    payloads = ['\n'.join(json.dumps({'language': 'cz', 'joke': joke}, ensure_ascii=False)
+                          for joke in jokes[i:i + batch]) for i in range(0, len(jokes), batch)]
+    saved = {name: getattr(joker, name) for name in
+             ('ADMIN_API_KEY', 'ingest_log', 'ingest_position', 'ingested', 'corpus_snapshot')}
+    fsync = os.fsync
+    syncs = []
+
+    def joke_latencies(count):
+        latencies = []
+        for _ in range(count):
+            start = time.perf_counter()
+            client.get('/joke?lang=cz&category=normal')
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        return (f"p50 {latencies[len(latencies) // 2] * 1e6:>7.1f} µs  "
+                f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:>7.1f} µs")
+
+    def post_singles(part):
+        single_client = app.test_client()
+        for joke in part:
+            single_client.post('/admin/jokes', json={'language': 'sk', 'joke': joke},
+                               headers={'Authorization': 'Bearer bench'})
+
+    with tempfile.TemporaryDirectory() as workdir:
+        joker.ADMIN_API_KEY = 'bench'
+        joker.ingest_log = IngestLog(os.path.join(workdir, 'ingest.log'))
+        joker.ingest_position, joker.ingested = None, {}
+        os.fsync = lambda fd: (syncs.append(fd), fsync(fd))[1]
+        try:
+            print(f"  {'/joke bez příjmu':<40} {joke_latencies(requests_count)}")
+
+            start = time.perf_counter()
+            for payload in payloads:
+                client.post('/admin/jokes', data=payload, headers=headers)
+            elapsed = time.perf_counter() - start
+            print(f"  {f'NDJSON dávky po {batch}':<40} {len(jokes) / elapsed:>10.0f} vtipů/s  ({len(syncs)} fsync)")
+
+            # Jednotlivé vtipy z 8 vláken - souběžné zápisy sdílejí fsync
+            syncs.clear()
+            threads = [threading.Thread(target=post_singles, args=(jokes[i:800:8],)) for i in range(8)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            print(f"  {'jednotlivě z 8 vláken':<40} {800 / elapsed:>10.0f} vtipů/s  ({len(syncs)} fsync na 800 zápisů)")
+
+            # /joke z jiného záznamu, zatímco vlákno nepřetržitě posílá dávky
+            stop = threading.Event()
+
+            def ingest_loop():
+                ingest_client = app.test_client()
+                for i in range(10 ** 9):
+                    if stop.is_set():
+                        break
+                    ingest_client.post('/admin/jokes', data=payloads[i % len(payloads)], headers=headers)
+
+            thread = threading.Thread(target=ingest_loop)
+            thread.start()
+            try:
+                print(f"  {'/joke během příjmu dávek':<40} {joke_latencies(requests_count)}")
+            finally:
+                stop.set()
+                thread.join()
+            print(f"  {'vtipů v cz_normal po příjmu':<40} {len(joker.load_jokes('cz', 'normal')):>10}")
+        finally:
+            os.fsync = fsync
+            for name, value in saved.items():
+                setattr(joker, name, value)
+
+
+SCENARIOS = {
+    'joke': bench_joke,
+    'metadata': bench_metadata,
+    'batch': bench_batch,
+    'stream': bench_stream,
+    'corpus': bench_corpus,
+    'servers': bench_servers,
+    'ratelimit': bench_ratelimit,
+    'logging': bench_logging,
+    'metrics': bench_metrics,
+    'profiling': bench_profiling,
+    'startup': bench_startup,
+    'search': bench_search,
+    'lengths': bench_lengths,
+    'wrapping': bench_wrapping,
+    'formats': bench_formats,
+    'compression': bench_compression,
+    'period': bench_period,
+    'jokestore': bench_jokestore,
+    'ingest': bench_ingest,
+}
+
+
+def main():
+    global REPEAT
+
+    parser = argparse.ArgumentParser(description='Benchmark Joker API')
+    parser.add_argument('scenarios', nargs='*', default=list(SCENARIOS),
+                        help=f"Scénáře k měření ({', '.join(SCENARIOS)})")
+    parser.add_argument('--requests', type=int, default=5000,
+                        help='Počet požadavků na jedno měření')
+    parser.add_argument('--repeat', type=int, default=REPEAT,
+                        help='Počet opakování měření (bere se nejlepší)')
+    args = parser.parse_args()
+    REPEAT = max(1, args.repeat)
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        print(f"❌ Neznámé scénáře: {', '.join(unknown)}")
+        return 1
+
+    client = app.test_client()
+    print(f"🏁 Benchmark Joker API ({args.requests} požadavků na měření)")
+    for name in args.scenarios:
+        print(f"\n📊 {name}: {SCENARIOS[name].__doc__}")
+        SCENARIOS[name](client, args.requests)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -12,8 +12,8 @@ class Config:
     """Základní konfigurace"""
 
     # Flask
-    SECRET_KEY = os.getenv('SECRET_KEY', os.urandom(24).hex())
-    DEBUG = False
+    SECRET_KEY = os.getenv('SECRET_KEY', '')  # prázdný = náhodný klíč z create_app
+    DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     TESTING = False
 
     # Server
@@ -23,20 +23,81 @@ class Config:
     # CORS (již není používáno - hardcoded v app.py jako plně otevřený)
     # CORS_ORIGINS = os.getenv('CORS_ORIGINS', '*').split(',')
 
-    # Rate Limiting
+    # Rate Limiting (RATELIMIT_ENABLED=false jen pro benchmarky)
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true'
     RATE_LIMIT = os.getenv('RATE_LIMIT', '100 per minute')
     REDIS_URL = os.getenv('REDIS_URL', 'memory://')
+    # Má přednost před REDIS_URL, např. shm:///dev/shm/joker-ratelimit (sdílená paměť, ratelimit.py)
+    RATELIMIT_STORAGE_URI = os.getenv('RATELIMIT_STORAGE_URI', '')
+    RATELIMIT_STRATEGY = os.getenv('RATELIMIT_STRATEGY', 'fixed-window')
 
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_DIR = 'logs'
     LOG_MAX_BYTES = 10 * 1024 * 1024  # 10 MB
     LOG_BACKUP_COUNT = 10
+    # Neblokující logování (log_pipeline.py)
+    LOG_MODE = os.getenv('LOG_MODE', 'queue')
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    LOG_DEDUPE_WINDOW = float(os.getenv('LOG_DEDUPE_WINDOW', 10))
+    LOG_RATE_LIMIT = float(os.getenv('LOG_RATE_LIMIT', 100))
+
+    # Měření fází (Server-Timing, log pomalých požadavků) a vzorkovací profiler (profiling.py)
+    PHASE_TIMING = os.getenv('PHASE_TIMING', 'false').lower() == 'true'
+    SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 200))
+    PROFILE_SAMPLE_EVERY = int(os.getenv('PROFILE_SAMPLE_EVERY', 0))
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 1))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'logs')
+    PROFILE_CONTROL = os.getenv('PROFILE_CONTROL', os.path.join(PROFILE_DIR, 'profile.control'))
+
+    # Metriky /metrics (metrics.py) - čítače ve sdílené paměti, slot na worker
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_DIR = os.getenv('METRICS_DIR', '/dev/shm' if os.path.isdir('/dev/shm') else 'logs')
+    METRICS_MAX_WORKERS = int(os.getenv('METRICS_MAX_WORKERS', 64))
+    METRICS_INSTANCE = os.getenv('METRICS_INSTANCE', '')  # výchozí PID gunicorn masteru
+
+    # HTTP cache metadata endpointů (/, /languages, /categories, /stats)
+    METADATA_MAX_AGE = int(os.getenv('METADATA_MAX_AGE', 60))
+    # Předkomprimované varianty cachovaných odpovědí (precompressed.py), 0 = bez komprese
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+
+    # Dávkový endpoint /jokes
+    BATCH_DEFAULT_COUNT = int(os.getenv('BATCH_DEFAULT_COUNT', 10))
+    BATCH_MAX_COUNT = int(os.getenv('BATCH_MAX_COUNT', 50))
+
+    # Streamování /stream (sekundy, STREAM_MAX_CONNECTIONS je limit na worker - držet pod --threads)
+    STREAM_DEFAULT_INTERVAL = float(os.getenv('STREAM_DEFAULT_INTERVAL', 10))
+    STREAM_MIN_INTERVAL = float(os.getenv('STREAM_MIN_INTERVAL', 1))
+    STREAM_HEARTBEAT = float(os.getenv('STREAM_HEARTBEAT', 15))
+    STREAM_MAX_DURATION = float(os.getenv('STREAM_MAX_DURATION', 300))
+    STREAM_MAX_CONNECTIONS = int(os.getenv('STREAM_MAX_CONNECTIONS', 8))
+
+    # ASGI režim (asgi.py) - streamy na event loopu nedrží vlákno, limit může být vysoký
+    ASGI_STREAM_MAX_CONNECTIONS = int(os.getenv('ASGI_STREAM_MAX_CONNECTIONS', 1000))
+    ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', 8))
 
     # Jokes
     JOKES_DIR = 'jokes'
+    CORPUS_FILE = os.getenv('CORPUS_FILE', '')  # Zkompilovaný korpus (python corpus.py compile)
+    CORPUS_DB = os.getenv('CORPUS_DB', '')  # SQLite úložiště (python jokestore.py import), přednost před CORPUS_FILE
+    # Přidávání vtipů přes POST /admin/jokes (ingest.py) - prázdný klíč = vypnuto
+    ADMIN_API_KEY = os.getenv('ADMIN_API_KEY', '')
+    INGEST_LOG = os.getenv('INGEST_LOG', 'jokes/ingest.log')  # Append-only log, při startu se zapíše do TXT
+    INGEST_MAX_BATCH = int(os.getenv('INGEST_MAX_BATCH', 10000))  # Vtipů v jednom NDJSON požadavku
+    JOKES_RELOAD_INTERVAL = float(os.getenv('JOKES_RELOAD_INTERVAL', 5))  # Hot reload, 0 = vypnuto
+    HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', 5))  # Kontrola pro /health/ready
     SUPPORTED_LANGUAGES = ['cz', 'sk', 'en-gb', 'en-us']
     SUPPORTED_CATEGORIES = ['normal', 'explicit']
+    # Šířky tiskáren (sloupce), pro které se vtipy zalomí při načtení korpusu (/joke?width=)
+    PRINT_WIDTHS = [int(width) for width in os.getenv('PRINT_WIDTHS', '32,42,48').split(',') if width.strip()]
+    # Zalomené texty vtipů z CORPUS_FILE/CORPUS_DB (zalamují se při přístupu) - počet v LRU cache
+    WRAP_CACHE_SIZE = int(os.getenv('WRAP_CACHE_SIZE', 10000))
+    # Fulltextový index pro /search (search.py) - staví se při načtení korpusu
+    SEARCH_ENABLED = os.getenv('SEARCH_ENABLED', 'true').lower() == 'true'
+    # Vtip intervalu /joke/<interval> (jméno=sekundy) - intervaly zarovnané na UTC
+    JOKE_PERIODS = {name.strip(): int(seconds) for name, _, seconds in
+                    (item.partition('=') for item in os.getenv('JOKE_PERIODS', 'hourly=3600,daily=86400').split(','))
+                    if name.strip()}
 
     # Auto-Update
     AUTO_UPDATE_ENABLED = os.getenv('AUTO_UPDATE_ENABLED', 'true').lower() == 'true'
@@ -52,7 +113,6 @@ class DevelopmentConfig(Config):
 
 class ProductionConfig(Config):
     """Konfigurace pro produkci"""
-    DEBUG = False
     # V produkci je dobré mít nižší limity
     RATE_LIMIT = os.getenv('RATE_LIMIT', '100 per minute')
 
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Kompilovaný korpus vtipů pro Joker API
+Převede adresář jokes/ do jednoho binárního souboru, který všechny workery sdílí přes mmap
+Spusť: python corpus.py compile [jokes_dir] [výstup] | python corpus.py verify [soubor]
+
+Formát souboru (little-endian):
+    hlavička   magic, verze, počet záznamů, offset blobu, velikost blobu, CRC32
+    adresář    pro každý (jazyk, kategorie): počet vtipů a offset tabulky offsetů
+    blob       UTF-8 texty všech vtipů za sebou
+    tabulky    pro každý záznam počet+1 offsetů do blobu (konec vtipu i = začátek i+1)
+"""
+import os
+import sys
+import mmap
+import zlib
+import struct
+import argparse
+import threading
+from collections.abc import Sequence
+
+MAGIC = b'JOKERCP1'
+VERSION = 1
+
+HEADER = struct.Struct('<8sIIQQI')
+ENTRY = struct.Struct('<16s16sIQ')
+OFFSET = struct.Struct('<Q')
+OFFSET_PAIR = struct.Struct('<QQ')
+
+
+class CorpusError(Exception):
+    """Poškozený nebo nekompatibilní soubor korpusu"""
+
+
+def parse_jokes(content):
+    """Rozdělí obsah TXT souboru na vtipy (oddělené prázdným řádkem, viz JOKE_FORMAT.md)"""
+    return [joke.strip() for joke in content.split('\n\n') if joke.strip()]
+
+
+def file_signature(path, stat=None):
+    """Vrátí podpis souboru (cesta, mtime, velikost, inode) nebo None, pokud neexistuje"""
+    try:
+        stat = stat or os.stat(path)
+    except OSError:
+        return None
+    return (path, stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class CorpusSnapshot:
+    """Neměnný snímek načteného korpusu - při reloadu se nahrazuje celý jedním přiřazením"""
+
+    def __init__(self, generation, jokes, bodies, signatures, search=None, lengths=None, texts=None):
+        self.generation = generation
+        self.jokes = jokes              # {klíč: sekvence textů vtipů}
+        self.bodies = bodies            # {klíč: sekvence předrenderovaných JSON těl}
+        self.signatures = signatures    # {klíč: podpis zdrojového souboru}
+        self.search = search or {}      # {klíč: fulltextový index (search.py)}
+        self.lengths = lengths or {}    # {klíč: index délky a počtu řádků (length_index.py)}
+        self.texts = texts or {}        # {klíč: {šířka nebo None: UTF-8 texty vtipů (wrapping.py)}}
+        self.cache = {}                 # odvozená data pro tuto generaci (hotové odpovědi apod.)
+
+
+def _encode_name(name):
+    """Zakóduje jazyk/kategorii do pevného 16bajtového pole"""
+    raw = name.encode('utf-8')
+    if len(raw) > 16:
+        raise CorpusError(f"Název je delší než 16 bajtů: {name}")
+    return raw
+
+
+def compile_corpus(jokes_dir, output, languages, categories):
+    """Zkompiluje TXT soubory z jokes_dir do binárního korpusu, vrátí počty vtipů"""
+    entries = [(lang, cat) for lang in languages for cat in categories]
+    blob_offset = HEADER.size + ENTRY.size * len(entries)
+    tmp_path = f"{output}.tmp"
+
+    counts = {}
+    tables = []
+    checksum = 0
+    blob_size = 0
+
+    with open(tmp_path, 'wb') as out:
+        # Blob se zapisuje průběžně, v paměti drží jen offsety
+        out.seek(blob_offset)
+        for lang, cat in entries:
+            filename = os.path.join(jokes_dir, f"{lang}_{cat}.txt")
+            jokes = []
+            if os.path.exists(filename):
+                with open(filename, 'r', encoding='utf-8') as f:
+                    jokes = parse_jokes(f.read())
+
+            offsets = [blob_size]
+            for joke in jokes:
+                data = joke.encode('utf-8')
+                out.write(data)
+                checksum = zlib.crc32(data, checksum)
+                blob_size += len(data)
+                offsets.append(blob_size)
+            tables.append(offsets)
+            counts[(lang, cat)] = len(jokes)
+
+        # Tabulky offsetů za blobem
+        directory = []
+        table_offset = blob_offset + blob_size
+        for (lang, cat), offsets in zip(entries, tables):
+            data = struct.pack(f'<{len(offsets)}Q', *offsets)
+            out.write(data)
+            checksum = zlib.crc32(data, checksum)
+            directory.append(ENTRY.pack(_encode_name(lang), _encode_name(cat),
+                                        len(offsets) - 1, table_offset))
+            table_offset += len(data)
+
+        # Hlavička a adresář na začátek souboru
+        directory = b''.join(directory)
+        checksum = zlib.crc32(directory, checksum)
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, VERSION, len(entries), blob_offset, blob_size, checksum))
+        out.write(directory)
+        out.flush()
+        os.fsync(out.fileno())
+
+    # Atomická výměna - workery s namapovaným starým souborem dál čtou starý inode
+    os.replace(tmp_path, output)
+    return counts
+
+
+class MappedJokes(Sequence):
+    """Read-only pohled na vtipy jednoho (jazyk, kategorie) přímo z mmap"""
+
+    def __init__(self, buffer, table_offset, count, blob_offset, decode=True):
+        self._buffer = buffer
+        self._table_offset = table_offset
+        self._count = count
+        self._blob_offset = blob_offset
+        self._decode = decode
+
+    def encoded(self):
+        """Stejný pohled, prvky jsou UTF-8 bytes přímo z mmap (bez dekódování)"""
+        return MappedJokes(self._buffer, self._table_offset, self._count, self._blob_offset, decode=False)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('index vtipu mimo rozsah')
+        start, end = OFFSET_PAIR.unpack_from(self._buffer, self._table_offset + index * OFFSET.size)
+        data = self._buffer[self._blob_offset + start:self._blob_offset + end]
+        return data.decode('utf-8') if self._decode else data
+
+
+class RenderedView(Sequence):
+    """Líný pohled, který každý prvek sekvence převede funkcí render až při přístupu"""
+
+    def __init__(self, items, render):
+        self._items = items
+        self._render = render
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._render(item) for item in self._items[index]]
+        return self._render(self._items[index])
+
+    def __iter__(self):
+        # Průchod podkladové sekvence (u SQLite jeden dotaz místo vyhledání po prvcích)
+        return map(self._render, self._items)
+
+
+class LazyIndex:
+    """Odvozený index sestavený až při prvním použití - build(jokes) se zavolá jednou
+
+    Pro záznamy z mmap a SQLite, kde by stavba při načtení znamenala projít celý korpus
+    v každém workeru a při každém reloadu, i když index nikdo nepoužije. Atributy (search,
+    select, ...) deleguje na sestavený index.
+    """
+
+    def __init__(self, build, jokes):
+        self._build = build
+        self._jokes = jokes
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def built(self):
+        return self._index is not None
+
+    def get(self):
+        """Vrátí index (při prvním volání ho sestaví)"""
+        index = self._index
+        if index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._build(self._jokes)
+                    self._jokes = None  # sestavený index sekvenci (a čtecí snímek) nedrží
+                index = self._index
+        return index
+
+    def rebound(self, jokes):
+        """Stejný index nad jinou sekvencí se stejnými vtipy (nový čtecí snímek)"""
+        if self._index is not None:
+            return self
+        return LazyIndex(self._build, jokes)
+
+    def extended(self, jokes, start):
+        """Index pro jokes, které jsou původní vtipy + nové od start - nesestavený zůstane líný"""
+        if self._index is not None:
+            return self._index.extended(jokes, start)
+        return LazyIndex(self._build, jokes)
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+class MappedCorpus:
+    """Binární korpus namapovaný do paměti (stránky sdílí všechny procesy přes page cache)"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.signature = file_signature(path, os.fstat(f.fileno()))
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < HEADER.size:
+            raise CorpusError(f"Soubor korpusu je příliš krátký: {path}")
+        magic, version, count, blob_offset, blob_size, checksum = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise CorpusError(f"Neplatný soubor korpusu: {path}")
+        if version != VERSION:
+            raise CorpusError(f"Nepodporovaná verze korpusu {version}: {path}")
+
+        self.blob_size = blob_size
+        self.checksum = checksum
+        self.entries = {}
+        for i in range(count):
+            lang, cat, jokes, table_offset = ENTRY.unpack_from(self._mmap, HEADER.size + i * ENTRY.size)
+            key = (lang.rstrip(b'\0').decode('utf-8'), cat.rstrip(b'\0').decode('utf-8'))
+            self.entries[key] = MappedJokes(self._mmap, table_offset, jokes, blob_offset)
+
+    def get(self, language, category):
+        """Vrátí MappedJokes pro daný jazyk a kategorii nebo None"""
+        return self.entries.get((language, category))
+
+    def counts(self):
+        """Vrátí počty vtipů pro všechny záznamy"""
+        return {key: len(jokes) for key, jokes in self.entries.items()}
+
+    def verify(self):
+        """Ověří CRC32 (projde celý soubor - není určeno pro start workeru)"""
+        _, _, count, blob_offset, _, _ = HEADER.unpack_from(self._mmap, 0)
+        directory_end = HEADER.size + ENTRY.size * count
+        with memoryview(self._mmap) as view:
+            checksum = zlib.crc32(view[blob_offset:])
+            checksum = zlib.crc32(view[HEADER.size:directory_end], checksum)
+        return checksum == self.checksum
+
+    def close(self):
+        """Uvolní mmap"""
+        self._mmap.close()
+
+
+def main():
+    from config import Config
+
+    parser = argparse.ArgumentParser(description='Kompilace korpusu vtipů Joker API')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    compile_parser = subparsers.add_parser('compile', help='Zkompiluje jokes/ do binárního korpusu')
+    compile_parser.add_argument('jokes_dir', nargs='?', default=Config.JOKES_DIR)
+    compile_parser.add_argument('output', nargs='?', default=Config.CORPUS_FILE or 'jokes.corpus')
+
+    verify_parser = subparsers.add_parser('verify', help='Ověří kontrolní součet korpusu')
+    verify_parser.add_argument('path', nargs='?', default=Config.CORPUS_FILE or 'jokes.corpus')
+
+    args = parser.parse_args()
+
+    if args.command == 'compile':
+        counts = compile_corpus(args.jokes_dir, args.output,
+                                Config.SUPPORTED_LANGUAGES, Config.SUPPORTED_CATEGORIES)
+        for (lang, cat), count in counts.items():
+            print(f"  {lang}_{cat}: {count} vtipů")
+        print(f"✅ Korpus zkompilován: {args.output} ({os.path.getsize(args.output)} B)")
+        return 0
+
+    corpus = MappedCorpus(args.path)
+    if corpus.verify():
+        print(f"✅ Korpus je v pořádku: {args.path} (CRC32 {corpus.checksum:08x})")
+        return 0
+    print(f"❌ Kontrolní součet nesouhlasí: {args.path}")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+Konfigurace gunicornu pro Joker API (gunicorn ji načte z pracovního adresáře automaticky)
+Aplikace a korpus vzniknou jednou v masteru (preload_app) a workery je zdědí copy-on-write;
+vlákna, log handlery a slot metrik si každý worker spustí až po forku (post_fork).
+S preload_app SIGHUP jen znovu forkne workery z masteru se starým kódem - nový kód načte
+binární upgrade (SIGUSR2): nový master po startu ukončí starý i s jeho workery (when_ready).
+Spusť: gunicorn -c gunicorn.conf.py
+"""
+import os
+import gc
+import signal
+
+import app as joker
+from config import get_config
+from metrics import remove_metrics_files
+
+wsgi_app = 'app:app'
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 8000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 4))
+# gthread workery - dlouhé spojení (/stream) drží jedno vlákno, ne celý proces
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 16))
+timeout = 120
+accesslog = '-'
+errorlog = '-'
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Master jen načte korpus, služby s vlákny by se do workerů stejně nezdědily
+joker.services_deferred = True
+
+
+def when_ready(server):
+    """Po načtení aplikace - objekty korpusu vyjmout z GC, sběr by jinak zapisoval do sdílených stránek
+
+    Read transakci SQLite (CORPUS_DB), kterou master otevřel při načtení korpusu, ukončí -
+    jinak by po celou dobu běhu masteru blokovala checkpoint WAL.
+
+    Master spuštěný binárním upgradem (SIGUSR2) má nový kód načtený a posluchače převzaté,
+    starý master se ukončí gracefully (SIGTERM) - rozpracované požadavky jeho workery dokončí.
+    Když nový kód nenaběhne, master skončí dřív a starý obsluhuje dál.
+    """
+    joker.release_store_views()
+    gc.freeze()
+    if server.master_pid:
+        server.log.info(f"Binární upgrade - ukončuji předchozí master {server.master_pid}")
+        os.kill(server.master_pid, signal.SIGTERM)
+
+
+def post_fork(server, worker):
+    """Ve workeru po forku - spustí služby procesu"""
+    # Auto-update podle toho pozná, jak master přimět načíst nový kód (auto_update.py)
+    os.environ['GUNICORN_RESTART'] = 'upgrade' if server.cfg.preload_app else 'reload'
+    joker.start_worker_services(joker.get_app())
+
+
+def on_exit(server):
+    """Při ukončení masteru - smaže soubor čítačů metrik jeho workerů"""
+    config = get_config()
+    remove_metrics_files(config.METRICS_INSTANCE or server.pid, config.METRICS_DIR)
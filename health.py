@@ -0,0 +1,125 @@
+"""
+Liveness a readiness pro Joker API
+Stav (záznamy korpusu, generace, chyby reloadu, auto-update) sestavuje vlákno na pozadí
+a ukládá ho jako hotovou odpověď - sonda /health/ready je jen načtení atributu.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Konfigurace
+HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', 5))  # sekundy, 0 = kontrola při sondě
+# Stav starší než STALE_CHECKS intervalů znamená, že kontrola neběží - worker není ready
+STALE_CHECKS = 3
+STALE_ERROR = 'Kontrola stavu neběží'
+
+# /health/live nezávisí na stavu - odpovídá, dokud proces obsluhuje požadavky
+LIVE_BODY = b'{"status":"alive","service":"Joker"}\n'
+
+
+def render_status(status):
+    """JSON tělo stavu do UTF-8 bytes"""
+    return json.dumps(status, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class HealthMonitor:
+    """Pravidelně vyhodnocuje připravenost workeru a drží poslední výsledek
+
+    check je funkce vracející dict stavu s klíčem 'ready'. Výsledek se uloží jako
+    n-tice (čas, stav, HTTP status, tělo) a vymění jedním přiřazením.
+    """
+
+    def __init__(self, check, interval=HEALTH_CHECK_INTERVAL):
+        self.check = check
+        self.interval = interval
+        self.logger = logging.getLogger('health')
+        self.running = False
+        self.thread = None
+        self.result = None
+        self._stop_event = threading.Event()
+
+    def refresh(self):
+        """Vyhodnotí stav a uloží hotovou odpověď"""
+        try:
+            status = self.check()
+        except Exception as e:
+            self.logger.error(f"Kontrola stavu selhala: {str(e)}")
+            status = {'ready': False, 'error': str(e)}
+        status['status'] = 'ready' if status['ready'] else 'not_ready'
+        self.result = (time.monotonic(), status, 200 if status['ready'] else 503, render_status(status))
+        return self.result
+
+    def current(self):
+        """Poslední výsledek (čas, stav, HTTP status, tělo); bez běžícího vlákna kontroluje hned
+
+        Když kontrola přestala běžet (výsledek je starší než STALE_CHECKS intervalů), vrátí None.
+        """
+        result = self.result
+        if result is None or not self.running:
+            return self.refresh()
+        if time.monotonic() - result[0] > self.interval * STALE_CHECKS:
+            return None
+        return result
+
+    def readiness(self):
+        """Vrátí (HTTP status, tělo) poslední kontroly"""
+        result = self.current()
+        if result is None:
+            return 503, render_status({'status': 'not_ready', 'ready': False, 'error': STALE_ERROR})
+        return result[2], result[3]
+
+    def _check_cycle(self):
+        """Hlavní cyklus kontroly"""
+        while not self._stop_event.wait(self.interval):
+            self.refresh()
+
+    def start(self):
+        """Provede první kontrolu a spustí vlákno"""
+        if self.running:
+            return
+        self.refresh()
+        if self.interval <= 0:
+            return
+        self.running = True
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._check_cycle, daemon=True, name="HealthMonitor")
+        self.thread.start()
+
+    def stop(self):
+        """Zastaví vlákno kontroly"""
+        if not self.running:
+            return
+        self.running = False
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def get_status(self):
+        """Vrátí stav poslední kontroly"""
+        result = self.result
+        if result is None:
+            return None
+        return dict(result[1], age_seconds=round(time.monotonic() - result[0], 1))
+
+
+# Globální instance
+_health_monitor = None
+
+
+def init_health_monitor(check, interval=HEALTH_CHECK_INTERVAL):
+    """Inicializuje a spustí kontrolu stavu (interval z konfigurace aplikace)"""
+    global _health_monitor
+    if _health_monitor is None:
+        _health_monitor = HealthMonitor(check, interval)
+        _health_monitor.start()
+    return _health_monitor
+
+
+def get_health_monitor():
+    """Vrátí globální instanci kontroly stavu"""
+    return _health_monitor
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Příjem nových vtipů přes /admin/jokes pro Joker API
+Vtipy se připisují do append-only logu (NDJSON, jeden vtip na řádek) se skupinovým fsync.
+Workery log dočítají od své pozice a nové vtipy připojí ke snímku bez přenačtení TXT souborů;
+při startu se log zkompaktuje zpět do TXT souborů (JOKE_FORMAT.md) a začne znovu prázdný.
+Spusť: python ingest.py compact [log] [jokes_dir]
+"""
+import os
+import sys
+import json
+import fcntl
+import logging
+import argparse
+import threading
+
+from jokestore import StoreError, validate_joke
+
+logger = logging.getLogger('ingest')
+
+# Tělo NDJSON požadavku se čte po blocích (iterace proudu WSGI čte po bajtech)
+READ_CHUNK = 64 * 1024
+
+
+class IngestError(ValueError):
+    """Neplatný záznam v požadavku na přidání vtipů"""
+
+
+class BatchTooLarge(IngestError):
+    """Požadavek obsahuje víc vtipů, než je povoleno"""
+
+
+def parse_record(data, languages, categories):
+    """Ověří jeden záznam {"language", "category", "joke"}, vrátí (jazyk, kategorie, vtip)"""
+    if not isinstance(data, dict) or not isinstance(data.get('joke'), str):
+        raise IngestError('Záznam musí být JSON objekt s textem vtipu v poli "joke"')
+    language = str(data.get('language', 'cz')).lower()
+    category = str(data.get('category', 'normal')).lower()
+    if language not in languages:
+        raise IngestError(f"Nepodporovaný jazyk: {language}")
+    if category not in categories:
+        raise IngestError(f"Nepodporovaná kategorie: {category}")
+    try:
+        return language, category, validate_joke(data['joke'])
+    except StoreError as e:
+        raise IngestError(str(e)) from None
+
+
+def read_lines(stream, chunk_size=READ_CHUNK):
+    """Řádky z proudu těla požadavku"""
+    rest = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        lines = (rest + chunk).split(b'\n')
+        rest = lines.pop()
+        yield from lines
+    if rest:
+        yield rest
+
+
+def parse_ndjson(lines, languages, categories, limit):
+    """Ověří NDJSON řádky (prázdné přeskočí) - celá dávka projde, nebo se odmítne (IngestError)"""
+    records = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        if len(records) == limit:
+            raise BatchTooLarge(f"Dávka může obsahovat nejvýše {limit} vtipů")
+        try:
+            records.append(parse_record(json.loads(line), languages, categories))
+        except ValueError as e:
+            raise IngestError(f"Řádek {number}: {e}") from None
+    if not records:
+        raise IngestError('Požadavek neobsahuje žádný vtip')
+    return records
+
+
+def encode_record(language, category, joke):
+    """Řádek logu pro jeden vtip"""
+    return json.dumps({'language': language, 'category': category, 'joke': joke},
+                      ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def decode_records(data):
+    """Záznamy z celých řádků logu - poškozený řádek (zápis přerušený pádem) se přeskočí"""
+    records = []
+    for line in data.splitlines():
+        try:
+            record = json.loads(line)
+            records.append((record['language'], record['category'], record['joke']))
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Přeskakuji poškozený záznam logu: {line[:80]!r}")
+    return records
+
+
+def file_inode(filename):
+    """Inode souboru (None, pokud neexistuje) - atomická výměna TXT ho změní"""
+    try:
+        return os.stat(filename).st_ino
+    except FileNotFoundError:
+        return None
+
+
+def append_jokes(filename, jokes):
+    """Připíše vtipy na konec TXT souboru (atomická výměna), vrátí počet připsaných"""
+    content = ''
+    if os.path.exists(filename):
+        with open(filename, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+    content = content.rstrip('\n')
+    content = (content + '\n\n' if content.strip() else '') + '\n\n'.join(jokes) + '\n'
+    tmp_path = f"{filename}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, filename)
+    return len(jokes)
+
+
+class IngestLog:
+    """Append-only log přidaných vtipů sdílený všemi workery
+
+    Zápis drží flock (kvůli kompaktaci) a je jedno os.write s O_APPEND. Na fsync čekají
+    souběžné zápisy společně - kdo přijde během běžícího fsync, počká na další, který
+    pokryje všechny zápisy do té doby (skupinový commit). Pozice čtení je (inode, offset),
+    nový inode znamená, že log mezitím zkompaktoval jiný proces.
+
+    Kompaktaci provází značka (path.compacting): inode logu, rozsah zapisovaných záznamů
+    a inode každého TXT souboru před připsáním. Po pádu se kompaktace téhož logu dokončí
+    a TXT soubor, jehož inode se od značky změnil, se už nepřipisuje znovu.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.marker_path = f"{path}.compacting"
+        self._fd = None
+        self._pid = None
+        self._cond = threading.Condition()
+        self._written = 0
+        self._synced = 0
+        self._syncing = False
+
+    def _locked_fd(self):
+        """Deskriptor aktuálního logu se zámkem - po kompaktaci (nový inode) se log otevře znovu"""
+        while True:
+            # Deskriptor zděděný forkem sdílí zámek s rodičem, každý proces si otevírá vlastní
+            if self._fd is None or self._pid != os.getpid():
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                self._pid = os.getpid()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(self._fd).st_ino == os.stat(self.path).st_ino:
+                    return self._fd
+            except FileNotFoundError:
+                pass
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    def append(self, records):
+        """Připíše záznamy (jazyk, kategorie, vtip) - vrátí se až po fsync"""
+        data = memoryview(b''.join(encode_record(*record) for record in records))
+        with self._cond:
+            fd = self._locked_fd()
+            try:
+                while data:
+                    data = data[os.write(fd, data):]
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self._written += 1
+            ticket = self._written
+
+            while self._synced < ticket:
+                if self._syncing:
+                    self._cond.wait()
+                    continue
+                self._syncing = True
+                target = self._written
+                self._cond.release()
+                try:
+                    os.fsync(fd)
+                except BaseException:
+                    self._cond.acquire()
+                    self._syncing = False
+                    self._cond.notify_all()
+                    raise
+                self._cond.acquire()
+                self._syncing = False
+                self._synced = target
+                self._cond.notify_all()
+
+    def read(self, position=None):
+        """Přečte celé záznamy za pozicí, vrátí (záznamy, nová pozice); bez logu ([], None)"""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return [], None
+        with f:
+            stat = os.fstat(f.fileno())
+            offset = position[1] if position and position[0] == stat.st_ino else 0
+            if stat.st_size <= offset:
+                return [], (stat.st_ino, offset)
+            f.seek(offset)
+            data = f.read()
+        # Rozepsaný poslední řádek se přečte až příště
+        end = data.rfind(b'\n') + 1
+        return decode_records(data[:end]), (stat.st_ino, offset + end)
+
+    def _read_marker(self, inode):
+        """Značka přerušené kompaktace logu s daným inode, jinak None (značku jiného logu smaže)"""
+        try:
+            with open(self.marker_path, 'r', encoding='utf-8') as f:
+                marker = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            marker = None
+        if isinstance(marker, dict) and marker.get('inode') == inode:
+            return marker
+        # Log už byl vyměněn - inode starého logu může dostat jiný soubor
+        os.unlink(self.marker_path)
+        return None
+
+    def _write_marker(self, marker):
+        tmp_path = f"{self.marker_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(marker, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.marker_path)
+
+    def _compact_range(self, data, inode, start, end, files, jokes_dir, counts):
+        """Připíše záznamy data[start:end] do TXT, před každým souborem uloží značku"""
+        grouped = {}
+        for language, category, joke in decode_records(data[start:end]):
+            grouped.setdefault((language, category), []).append(joke)
+        for key, jokes in grouped.items():
+            name = f"{key[0]}_{key[1]}.txt"
+            filename = os.path.join(jokes_dir, name)
+            inode_before = file_inode(filename)
+            counts.setdefault(key, 0)
+            if name in files and files[name] != inode_before:
+                continue  # Připsáno přerušenou kompaktací
+            files[name] = inode_before
+            self._write_marker({'inode': inode, 'start': start, 'end': end, 'files': files})
+            counts[key] += append_jokes(filename, jokes)
+
+    def compact(self, jokes_dir):
+        """Připíše záznamy logu do TXT souborů a začne nový log, vrátí {(jazyk, kategorie): počet}"""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return {}
+        with f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            inode = os.fstat(f.fileno()).st_ino
+            marker = self._read_marker(inode)
+            data = f.read()
+            if not data:
+                return {}
+            end = data.rfind(b'\n') + 1
+            counts = {}
+            start = 0
+            # Dokončení přerušené kompaktace, záznamy připsané po pádu se zapíší zvlášť
+            if marker and marker['end'] <= end:
+                self._compact_range(data, inode, marker['start'], marker['end'], marker['files'], jokes_dir,
+                                    counts)
+                start = marker['end']
+            if start < end:
+                self._compact_range(data, inode, start, end, {}, jokes_dir, counts)
+
+            # Prázdný log nahradí starý - zapisovatelé čekající na zámek starého se přepojí
+            tmp_path = f"{self.path}.tmp"
+            open(tmp_path, 'wb').close()
+            os.replace(tmp_path, self.path)
+            try:
+                os.unlink(self.marker_path)
+            except FileNotFoundError:
+                pass  # Log bez celého záznamu
+        return counts
+
+
+def main():
+    from config import Config
+
+    parser = argparse.ArgumentParser(description='Log přidaných vtipů Joker API')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    compact = subparsers.add_parser('compact', help='Zapíše log do TXT souborů a vyprázdní ho')
+    compact.add_argument('log', nargs='?', default=Config.INGEST_LOG)
+    compact.add_argument('jokes_dir', nargs='?', default=Config.JOKES_DIR)
+    args = parser.parse_args()
+
+    counts = IngestLog(args.log).compact(args.jokes_dir)
+    for (language, category), count in sorted(counts.items()):
+        print(f"{language}_{category}: +{count} vtipů")
+    print(f"Zkompaktováno {sum(counts.values())} vtipů z {args.log}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+SQLite úložiště vtipů pro Joker API (volitelné, CORPUS_DB)
+Vtipy každého (jazyk, kategorie) mají hustá id 0..N-1, takže náhodný vtip je jedno vyhledání
+podle primárního klíče. Změny (add/delete) vidí všechny workery přes WAL; hot reload je
+převezme podle verze záznamu v tabulce entries. Sloupec rewritten je verze poslední změny,
+která přepsala existující vtipy (delete, import) - přidání na konec ho nemění, takže reload
+pozná, že stačí zpracovat nové vtipy.
+Spusť: python jokestore.py import [jokes_dir] [db] | export [db] [jokes_dir]
+       python jokestore.py add LANG CAT "text" | delete LANG CAT ID | stats [db]
+"""
+import os
+import sys
+import sqlite3
+import argparse
+import threading
+from collections.abc import Sequence
+from itertools import islice
+
+from corpus import parse_jokes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jokes (
+    language TEXT NOT NULL,
+    category TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (language, category, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS entries (
+    language TEXT NOT NULL,
+    category TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0,
+    rewritten INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (language, category)
+) WITHOUT ROWID;
+"""
+
+# Zápis čeká na zámek jiného zapisujícího procesu (ms)
+BUSY_TIMEOUT = 5000
+# Počet řádků v jedné dávce importu a průchodu záznamem
+IMPORT_BATCH = 10000
+
+
+class StoreError(ValueError):
+    """Neplatná změna úložiště (vtip s prázdným řádkem, neexistující id)"""
+
+
+class StaleView(IndexError):
+    """Čtecí snímek už neodpovídá - vtip mezitím smazaný nebo pohled zavřený po výměně snímku korpusu"""
+
+
+def connect(path, readonly=False):
+    """Otevře spojení do databáze ve WAL režimu"""
+    if readonly:
+        conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, isolation_level=None, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT}')
+    return conn
+
+
+def validate_joke(text):
+    """Vtip v podobě, která projde exportem do TXT a zpět (viz JOKE_FORMAT.md)"""
+    text = text.replace('\r\n', '\n').strip()
+    if not text:
+        raise StoreError("Vtip je prázdný")
+    if '\n\n' in text:
+        raise StoreError("Vtip nesmí obsahovat prázdný řádek (odděluje vtipy)")
+    return text
+
+
+class StoredJokes(Sequence):
+    """Vtipy jednoho (jazyk, kategorie) v čtecím snímku - prvek je jedno vyhledání podle klíče"""
+
+    def __init__(self, view, language, category, count, decode=True):
+        self._view = view
+        self._language = language
+        self._category = category
+        self._count = count
+        self._decode = decode
+
+    @property
+    def view(self):
+        """Čtecí snímek, ze kterého se vtipy čtou"""
+        return self._view
+
+    def encoded(self):
+        """Stejný pohled, prvky jsou UTF-8 bytes"""
+        return StoredJokes(self._view, self._language, self._category, self._count, decode=False)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('index vtipu mimo rozsah')
+        text = self._view.fetch(self._language, self._category, index)
+        return text if self._decode else text.encode('utf-8')
+
+    def __iter__(self):
+        # Průchod (stavba indexů při reloadu) jedním dotazem místo N vyhledání
+        for text in self._view.scan(self._language, self._category, self._count):
+            yield text if self._decode else text.encode('utf-8')
+
+
+class StoreView:
+    """Čtecí snímek databáze - spojení s otevřenou read transakcí (WAL drží konzistentní stav)
+
+    Snímek korpusu v app.py drží jeden pohled; po změně verze vznikne nový a starý se
+    hned zavře (close), aby otevřená read transakce neblokovala checkpoint WAL. Požadavek,
+    který starý pohled ještě čte, dostane StaleView a zopakuje se nad novým snímkem.
+    Spojení patří procesu, který ho otevřel - po forku (gunicorn --preload) si worker
+    při prvním čtení otevře vlastní.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.closed = False
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        if self.closed:
+            raise StaleView('čtecí snímek je zavřený')
+        if self._pid != os.getpid():
+            self._conn = connect(self.path, readonly=True)
+            self._conn.execute('BEGIN')
+            self._pid = os.getpid()
+        return self._conn
+
+    def versions(self):
+        """{(jazyk, kategorie): (verze, počet, rewritten)} v tomto snímku - odpovídá jeho vtipům"""
+        with self._lock:
+            rows = self._connection().execute(
+                'SELECT language, category, version, count, rewritten FROM entries').fetchall()
+        return {(language, category): (version, count, rewritten)
+                for language, category, version, count, rewritten in rows}
+
+    def counts(self):
+        """Počty vtipů všech záznamů v tomto snímku"""
+        with self._lock:
+            rows = self._connection().execute('SELECT language, category, count FROM entries').fetchall()
+        return {(language, category): count for language, category, count in rows}
+
+    def get(self, language, category):
+        """StoredJokes pro daný jazyk a kategorii nebo None"""
+        count = self.counts().get((language, category))
+        return StoredJokes(self, language, category, count) if count is not None else None
+
+    def fetch(self, language, category, joke_id):
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT text FROM jokes WHERE language = ? AND category = ? AND id = ?',
+                (language, category, joke_id)).fetchone()
+        if row is None:
+            # Snímek zděděný přes fork je novější než počet vtipů (smazání) - požadavek se zopakuje po reloadu
+            raise StaleView(f'vtip {joke_id} už neexistuje')
+        return row[0]
+
+    def scan(self, language, category, count):
+        with self._lock:
+            cursor = self._connection().execute(
+                'SELECT text FROM jokes WHERE language = ? AND category = ? AND id < ? ORDER BY id',
+                (language, category, count))
+        while True:
+            with self._lock:
+                if self.closed:
+                    raise StaleView('čtecí snímek je zavřený')
+                rows = cursor.fetchmany(IMPORT_BATCH)
+            if not rows:
+                return
+            for (text,) in rows:
+                yield text
+
+    def release(self):
+        """Ukončí read transakci tohoto procesu, pohled zůstává platný - další čtení otevře
+        nové spojení (master po preloadu tak nedrží transakci, která blokuje checkpoint WAL)"""
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self._pid = None
+
+    def close(self):
+        """Ukončí read transakci - další čtení z pohledu vyvolá StaleView"""
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self.closed = True
+
+    def __del__(self):
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+
+
+class JokeStore:
+    """Zápisy a kontrola verzí - změny drží id husté (smazání přesune poslední vtip na uvolněné id)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        if self._pid != os.getpid():
+            self._conn = connect(self.path)
+            self._conn.executescript(SCHEMA)
+            # Databáze ze starší verze - sloupec rewritten chybí
+            columns = [row[1] for row in self._conn.execute('PRAGMA table_info(entries)')]
+            if 'rewritten' not in columns:
+                self._conn.execute('ALTER TABLE entries ADD COLUMN rewritten INTEGER NOT NULL DEFAULT 0')
+            self._pid = os.getpid()
+        return self._conn
+
+    def versions(self):
+        """{(jazyk, kategorie): (verze, počet, rewritten)} - levný dotaz pro hot reload"""
+        with self._lock:
+            rows = self._connection().execute(
+                'SELECT language, category, version, count, rewritten FROM entries').fetchall()
+        return {(language, category): (version, count, rewritten)
+                for language, category, version, count, rewritten in rows}
+
+    def view(self):
+        """Nový čtecí snímek"""
+        self._connection()
+        return StoreView(self.path)
+
+    def _write(self, language, category, change, rewrite=True):
+        """Provede změnu záznamu v zápisové transakci a zvýší jeho verzi, vrátí nový počet vtipů
+
+        rewrite=False pro změny, které jen přidávají vtipy na konec (rewritten zůstává).
+        """
+        with self._lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT count FROM entries WHERE language = ? AND category = ?',
+                                   (language, category)).fetchone()
+                count = change(conn, row[0] if row else 0)
+                conn.execute('INSERT INTO entries (language, category, count, version, rewritten) '
+                             'VALUES (?, ?, ?, 1, ?) ON CONFLICT (language, category) DO UPDATE SET '
+                             'count = excluded.count, version = version + 1, '
+                             'rewritten = CASE WHEN ? THEN version + 1 ELSE rewritten END',
+                             (language, category, count, int(rewrite), rewrite))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        return count
+
+    def add(self, language, category, text):
+        """Přidá vtip na konec záznamu, vrátí jeho id"""
+        return self.extend(language, category, [text]) - 1
+
+    def extend(self, language, category, jokes):
+        """Přidá vtipy na konec záznamu v jedné transakci, vrátí nový počet vtipů"""
+        jokes = [validate_joke(joke) for joke in jokes]
+
+        def insert(conn, count):
+            conn.executemany('INSERT INTO jokes (language, category, id, text) VALUES (?, ?, ?, ?)',
+                             ((language, category, count + i, joke) for i, joke in enumerate(jokes)))
+            return count + len(jokes)
+
+        return self._write(language, category, insert, rewrite=False)
+
+    def delete(self, language, category, joke_id):
+        """Smaže vtip - poslední vtip záznamu se přesune na jeho id (StoreError pro neexistující id)"""
+
+        def remove(conn, count):
+            if not 0 <= joke_id < count:
+                raise StoreError(f"Vtip {joke_id} v {language}_{category} neexistuje")
+            last = count - 1
+            if joke_id != last:
+                conn.execute('UPDATE jokes SET text = (SELECT text FROM jokes WHERE language = ? AND category = ? '
+                             'AND id = ?) WHERE language = ? AND category = ? AND id = ?',
+                             (language, category, last, language, category, joke_id))
+            conn.execute('DELETE FROM jokes WHERE language = ? AND category = ? AND id = ?',
+                         (language, category, last))
+            return last
+
+        self._write(language, category, remove)
+
+    def replace(self, language, category, jokes):
+        """Nahradí všechny vtipy záznamu (import) - vtipy se zapisují po dávkách, vrátí počet"""
+        jokes = iter(jokes)
+
+        def fill(conn, count):
+            conn.execute('DELETE FROM jokes WHERE language = ? AND category = ?', (language, category))
+            total = 0
+            while True:
+                batch = [validate_joke(joke) for joke in islice(jokes, IMPORT_BATCH)]
+                if not batch:
+                    return total
+                conn.executemany('INSERT INTO jokes (language, category, id, text) VALUES (?, ?, ?, ?)',
+                                 ((language, category, total + i, joke) for i, joke in enumerate(batch)))
+                total += len(batch)
+
+        return self._write(language, category, fill)
+
+    def export(self, language, category):
+        """Vtipy záznamu v pořadí id"""
+        jokes = self.view().get(language, category)
+        return list(jokes) if jokes is not None else []
+
+
+def import_dir(store, jokes_dir, languages, categories):
+    """Naimportuje TXT soubory (JOKE_FORMAT.md) do úložiště, vrátí počty vtipů"""
+    counts = {}
+    for lang in languages:
+        for cat in categories:
+            filename = os.path.join(jokes_dir, f"{lang}_{cat}.txt")
+            jokes = []
+            if os.path.exists(filename):
+                with open(filename, 'r', encoding='utf-8') as f:
+                    jokes = parse_jokes(f.read())
+            counts[(lang, cat)] = store.replace(lang, cat, jokes)
+    return counts
+
+
+def export_dir(store, jokes_dir, languages, categories):
+    """Zapíše vtipy z úložiště do TXT souborů (vtipy oddělené prázdným řádkem), vrátí počty"""
+    os.makedirs(jokes_dir, exist_ok=True)
+    counts = {}
+    for lang in languages:
+        for cat in categories:
+            jokes = store.export(lang, cat)
+            filename = os.path.join(jokes_dir, f"{lang}_{cat}.txt")
+            with open(f"{filename}.tmp", 'w', encoding='utf-8') as f:
+                f.write('\n\n'.join(jokes) + ('\n' if jokes else ''))
+            os.replace(f"{filename}.tmp", filename)
+            counts[(lang, cat)] = len(jokes)
+    return counts
+
+
+def main():
+    from config import Config
+
+    default_db = Config.CORPUS_DB or 'jokes.db'
+    parser = argparse.ArgumentParser(description='SQLite úložiště vtipů Joker API')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='Naimportuje jokes/ do databáze (nahradí záznamy)')
+    import_parser.add_argument('jokes_dir', nargs='?', default=Config.JOKES_DIR)
+    import_parser.add_argument('db', nargs='?', default=default_db)
+
+    export_parser = subparsers.add_parser('export', help='Vyexportuje databázi do TXT souborů')
+    export_parser.add_argument('db', nargs='?', default=default_db)
+    export_parser.add_argument('jokes_dir', nargs='?', default=Config.JOKES_DIR)
+
+    add_parser = subparsers.add_parser('add', help='Přidá vtip (text "-" = ze stdin)')
+    add_parser.add_argument('language')
+    add_parser.add_argument('category')
+    add_parser.add_argument('text')
+    add_parser.add_argument('--db', default=default_db)
+
+    delete_parser = subparsers.add_parser('delete', help='Smaže vtip podle id')
+    delete_parser.add_argument('language')
+    delete_parser.add_argument('category')
+    delete_parser.add_argument('id', type=int)
+    delete_parser.add_argument('--db', default=default_db)
+
+    stats_parser = subparsers.add_parser('stats', help='Počty vtipů a verze záznamů')
+    stats_parser.add_argument('db', nargs='?', default=default_db)
+
+    args = parser.parse_args()
+    store = JokeStore(args.db)
+
+    try:
+        if args.command == 'import':
+            counts = import_dir(store, args.jokes_dir, Config.SUPPORTED_LANGUAGES, Config.SUPPORTED_CATEGORIES)
+            for (lang, cat), count in counts.items():
+                print(f"  {lang}_{cat}: {count} vtipů")
+            print(f"✅ Naimportováno do {args.db}")
+        elif args.command == 'export':
+            counts = export_dir(store, args.jokes_dir, Config.SUPPORTED_LANGUAGES, Config.SUPPORTED_CATEGORIES)
+            for (lang, cat), count in counts.items():
+                print(f"  {lang}_{cat}: {count} vtipů")
+            print(f"✅ Vyexportováno do {args.jokes_dir}")
+        elif args.command == 'add':
+            text = sys.stdin.read() if args.text == '-' else args.text
+            joke_id = store.add(args.language, args.category, text)
+            print(f"✅ Přidán vtip {args.language}_{args.category} #{joke_id}")
+        elif args.command == 'delete':
+            store.delete(args.language, args.category, args.id)
+            print(f"✅ Smazán vtip {args.language}_{args.category} #{args.id}")
+        else:
+            for (lang, cat), (version, count, _) in sorted(store.versions().items()):
+                print(f"  {lang}_{cat}: {count} vtipů (verze {version})")
+    except StoreError as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Zátěžový test Joker API - reprodukovatelný mix provozu in-process i proti skutečnému gunicornu
+Měří propustnost, latence p50/p99/p999 a RSS workerů, porovnává s baseline v loadtest_baseline.json
+Spusť: python loadtest.py [režim ...] [--check | --save-baseline]
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import platform
+import tempfile
+import subprocess
+from collections import Counter
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(APP_DIR, 'loadtest_baseline.json')
+
+# Výchozí mix provozu - poměry jazyků a kategorií, podíl neplatných požadavků a health probe
+DEFAULT_LANGUAGES = 'cz=40,sk=20,en-gb=20,en-us=20'
+DEFAULT_CATEGORIES = 'normal=85,explicit=15'
+DEFAULT_INVALID_RATE = 0.05
+DEFAULT_HEALTH_RATE = 0.01
+
+# Povolené zhoršení proti baseline (podíl), přepíše --threshold
+LOADTEST_THRESHOLD = float(os.getenv('LOADTEST_THRESHOLD', 0.15))
+
+# Neplatné požadavky, jak je posílají rozbití klienti - každý končí 400 a varováním v logu
+INVALID_PATHS = ('/joke?lang=xx', '/joke?category=nic', '/jokes?count=0', '/joke?cursor=garbage')
+
+# Gunicorn jako v Dockerfile (gthread) a ASGI režim
+SERVERS = {
+    'gunicorn': ['gunicorn', '--worker-class', 'gthread', '--threads', '16', 'app:app'],
+    'asgi': ['gunicorn', '--worker-class', 'uvicorn.workers.UvicornWorker', 'asgi:app'],
+}
+
+# Metriky porovnávané s baseline: (klíč, True = vyšší je lepší, násobek tolerance)
+# Chvost latence je na sdíleném stroji hlučnější, proto má p99/p999 volnější mez
+COMPARED = (('rps', True, 1), ('p50_ms', False, 1), ('p99_ms', False, 2), ('p999_ms', False, 3),
+            ('rss_mb', False, 1))
+
+
+def parse_weights(text):
+    """'cz=40,sk=20' -> {'cz': 40.0, 'sk': 20.0}"""
+    weights = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+class TrafficMix:
+    """Deterministický sled URL podle mixu provozu (stejný seed = stejný sled)"""
+
+    def __init__(self, languages=DEFAULT_LANGUAGES, categories=DEFAULT_CATEGORIES,
+                 invalid_rate=DEFAULT_INVALID_RATE, health_rate=DEFAULT_HEALTH_RATE, seed=1):
+        self.languages = parse_weights(languages) if isinstance(languages, str) else dict(languages)
+        self.categories = parse_weights(categories) if isinstance(categories, str) else dict(categories)
+        self.invalid_rate = invalid_rate
+        self.health_rate = health_rate
+        self.seed = seed
+
+    def describe(self):
+        """Popis mixu pro baseline - výsledky jsou porovnatelné jen při stejném mixu"""
+        return {
+            'languages': self.languages,
+            'categories': self.categories,
+            'invalid_rate': self.invalid_rate,
+            'health_rate': self.health_rate,
+            'seed': self.seed
+        }
+
+    def paths(self, count):
+        """Vrátí count URL"""
+        rng = random.Random(self.seed)
+        languages, language_weights = zip(*self.languages.items())
+        categories, category_weights = zip(*self.categories.items())
+        paths = []
+        for _ in range(count):
+            roll = rng.random()
+            if roll < self.health_rate:
+                paths.append('/health')
+            elif roll < self.health_rate + self.invalid_rate:
+                paths.append(rng.choice(INVALID_PATHS))
+            else:
+                language = rng.choices(languages, language_weights)[0]
+                category = rng.choices(categories, category_weights)[0]
+                paths.append(f'/joke?lang={language}&category={category}')
+        return paths
+
+
+def generate_corpus(jokes_dir, size_mb, seed=42):
+    """Vygeneruje syntetický korpus TXT souborů o celkové velikosti size_mb"""
+    from config import Config
+
+    rng = random.Random(seed)
+    words = ['pepíček', 'blondýna', 'doktor', 'programátor', 'pivo', 'tchyně',
+             'policajt', 'kůň', 'učitelka', 'Chuck', 'Norris', 'žirafa']
+    files = [f"{lang}_{cat}.txt" for lang in Config.SUPPORTED_LANGUAGES
+             for cat in Config.SUPPORTED_CATEGORIES]
+    per_file = size_mb * 1024 * 1024 // len(files)
+
+    for name in files:
+        with open(os.path.join(jokes_dir, name), 'w', encoding='utf-8') as f:
+            written = 0
+            while written < per_file:
+                lines = [' '.join(rng.choices(words, k=rng.randint(4, 14)))
+                         for _ in range(rng.randint(1, 4))]
+                joke = '\n'.join(lines) + '\n\n'
+                written += f.write(joke)
+
+
+def percentile(latencies, q):
+    """Percentil ze seřazených latencí"""
+    return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+
+def summarize(elapsed, latencies, statuses, rss_kb):
+    """Výsledek jednoho běhu - latence v ms, RSS největšího workeru v MB"""
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'p999_ms': round(percentile(latencies, 0.999) * 1000, 3),
+        'rss_mb': round(max(rss_kb) / 1024, 1),
+        'workers_rss_mb': [round(rss / 1024, 1) for rss in rss_kb],
+        'statuses': {str(code): count for code, count in sorted(statuses.items())}
+    }
+
+
+def read_rss(pid):
+    """RSS procesu v kB"""
+    with open(f'/proc/{pid}/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('VmRSS'))
+
+
+def child_pids(parent):
+    """PID přímých potomků procesu (workery gunicornu)"""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # Jméno procesu v závorkách může obsahovat mezery - PPID je druhé pole za ním
+                if int(f.read().rsplit(')', 1)[1].split()[1]) == parent:
+                    children.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return children
+
+
+async def http_load(port, paths, requests_count, connections):
+    """Keep-alive HTTP klient na asyncio - vrátí (sekundy, seřazené latence, počty statusů)
+
+    paths je jedno URL, nebo sled URL, který se posílá po řadě (přes všechna spojení).
+    """
+    import asyncio
+
+    if isinstance(paths, str):
+        paths = [paths]
+    requests = [f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode('ascii') for path in paths]
+    latencies = []
+    statuses = Counter()
+    sent = 0
+
+    async def worker():
+        nonlocal sent
+        reader = writer = None
+        while sent < requests_count:
+            request = requests[sent % len(requests)]
+            sent += 1
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            start = time.perf_counter()
+            writer.write(request)
+            head = await reader.readuntil(b'\r\n\r\n')
+            headers = head.lower()
+            length = int(headers.split(b'content-length:')[1].split(b'\r\n')[0])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            statuses[int(head[9:12])] += 1
+            if b'connection: close' in headers:
+                writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(connections)))
+    return time.perf_counter() - start, sorted(latencies), statuses
+
+
+def wait_for_port(port, process, timeout=15):
+    """Počká, až server začne přijímat spojení"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server skončil s kódem {process.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server na portu {port} nenaběhl")
+
+
+def free_port():
+    """Volný TCP port na localhostu"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def load_env(workdir):
+    """Prostředí měřené aplikace - bez auto-update a rate limitu, metriky a logy ve workdir"""
+    return dict(os.environ, PYTHONPATH=APP_DIR, AUTO_UPDATE_ENABLED='false', RATELIMIT_ENABLED='false',
+                METRICS_DIR=workdir)
+
+
+def run_inprocess(paths, workdir):
+    """Flask test client v samostatném procesu (bez sítě, sekvenčně)"""
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--inprocess-worker', str(len(paths))],
+                            input='\n'.join(paths), cwd=workdir, env=load_env(workdir),
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def inprocess_worker(count):
+    """Tělo in-process režimu - čte URL ze stdin, na stdout vypíše výsledek jako JSON"""
+    import logging
+    from app import app
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    paths = sys.stdin.read().split('\n')[:count]
+    client = app.test_client()
+    for path in paths[:min(500, count)]:
+        client.get(path)
+
+    latencies = []
+    statuses = Counter()
+    start = time.perf_counter()
+    for path in paths:
+        request_start = time.perf_counter()
+        response = client.get(path)
+        response.get_data()
+        latencies.append(time.perf_counter() - request_start)
+        statuses[response.status_code] += 1
+    elapsed = time.perf_counter() - start
+    print(json.dumps(summarize(elapsed, latencies, statuses, [read_rss(os.getpid())])))
+
+
+def run_server(mode, paths, workdir, workers, connections):
+    """Skutečný gunicorn přes síť - zahřátí, přehrání sledu URL, RSS workerů"""
+    import asyncio
+
+    port = free_port()
+    command = SERVERS[mode] + ['-w', str(workers), '-b', f'127.0.0.1:{port}']
+    process = subprocess.Popen(command, cwd=workdir, env=load_env(workdir),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port, process)
+        # Zahřátí - UvicornWorker naslouchá dřív, než workery doimportují aplikaci
+        asyncio.run(http_load(port, paths[:1000], min(2000, len(paths)), connections))
+        elapsed, latencies, statuses = asyncio.run(http_load(port, paths, len(paths), connections))
+        rss = [read_rss(pid) for pid in child_pids(process.pid)]
+    finally:
+        process.terminate()
+        process.wait()
+    return summarize(elapsed, latencies, statuses, rss)
+
+
+def compare(results, baseline, threshold):
+    """Vrátí seznam regresí proti baseline (prázdný = v pořádku)"""
+    regressions = []
+    for mode, result in results.items():
+        expected = baseline.get('modes', {}).get(mode)
+        if not expected:
+            continue
+        for key, higher_is_better, tolerance in COMPARED:
+            if key not in expected:
+                continue
+            allowed = threshold * tolerance
+            limit = expected[key] * (1 - allowed if higher_is_better else 1 + allowed)
+            if (result[key] < limit) if higher_is_better else (result[key] > limit):
+                regressions.append(f"{mode} {key}: {result[key]} (baseline {expected[key]}, mez {limit:.3f})")
+    return regressions
+
+
+def machine_info():
+    """Popis stroje ukládaný s baseline (čísla z jiného stroje nejsou porovnatelná)"""
+    return {
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'platform': f'{platform.system()}-{platform.machine()}'
+    }
+
+
+def print_result(mode, result):
+    """Vytiskne výsledek jednoho režimu"""
+    print(f"  {mode:<12} {result['rps']:>9.0f} req/s  p50 {result['p50_ms']:>7.2f} ms  "
+          f"p99 {result['p99_ms']:>7.2f} ms  p999 {result['p999_ms']:>7.2f} ms  "
+          f"RSS {'/'.join(f'{rss:g}' for rss in result['workers_rss_mb'])} MB")
+    print(f"  {'':<12} statusy {result['statuses']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Zátěžový test Joker API')
+    parser.add_argument('modes', nargs='*', default=['inprocess', 'gunicorn'],
+                        help=f"Režimy (inprocess, {', '.join(SERVERS)})")
+    parser.add_argument('--requests', type=int, default=20000, help='Počet požadavků na režim')
+    parser.add_argument('--workers', type=int, default=2, help='Počet gunicorn workerů')
+    parser.add_argument('--connections', type=int, default=32, help='Souběžná keep-alive spojení')
+    parser.add_argument('--languages', default=DEFAULT_LANGUAGES, help='Váhy jazyků (cz=40,sk=20,...)')
+    parser.add_argument('--categories', default=DEFAULT_CATEGORIES, help='Váhy kategorií')
+    parser.add_argument('--invalid', type=float, default=DEFAULT_INVALID_RATE, help='Podíl neplatných požadavků')
+    parser.add_argument('--health', type=float, default=DEFAULT_HEALTH_RATE, help='Podíl /health probe')
+    parser.add_argument('--seed', type=int, default=1, help='Seed sledu URL')
+    parser.add_argument('--corpus-mb', type=int, default=0,
+                        help='Syntetický korpus této velikosti místo jokes/ (0 = jokes/)')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='Soubor s baseline')
+    parser.add_argument('--threshold', type=float, default=LOADTEST_THRESHOLD,
+                        help='Povolené zhoršení proti baseline (0.15 = 15 %%)')
+    parser.add_argument('--check', action='store_true', help='Skončí chybou při regresi proti baseline')
+    parser.add_argument('--save-baseline', action='store_true', help='Uloží výsledky jako novou baseline')
+    parser.add_argument('--inprocess-worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.inprocess_worker:
+        inprocess_worker(args.inprocess_worker)
+        return 0
+
+    unknown = [mode for mode in args.modes if mode != 'inprocess' and mode not in SERVERS]
+    if unknown:
+        print(f"❌ Neznámé režimy: {', '.join(unknown)}")
+        return 1
+
+    mix = TrafficMix(args.languages, args.categories, args.invalid, args.health, args.seed)
+    paths = mix.paths(args.requests)
+    setup = {'mix': mix.describe(), 'requests': args.requests, 'workers': args.workers,
+             'connections': args.connections, 'corpus_mb': args.corpus_mb}
+
+    print(f"🏁 Zátěžový test Joker API ({args.requests} požadavků, {args.connections} spojení, "
+          f"{args.workers} workery)")
+    results = {}
+    # Aplikace běží v dočasném adresáři (jokes/ je odkaz nebo syntetický korpus), logy necháme tam
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.corpus_mb:
+            os.mkdir(os.path.join(workdir, 'jokes'))
+            generate_corpus(os.path.join(workdir, 'jokes'), args.corpus_mb)
+        else:
+            os.symlink(os.path.join(APP_DIR, 'jokes'), os.path.join(workdir, 'jokes'))
+        for mode in args.modes:
+            if mode == 'inprocess':
+                results[mode] = run_inprocess(paths, workdir)
+            else:
+                results[mode] = run_server(mode, paths, workdir, args.workers, args.connections)
+            print_result(mode, results[mode])
+
+    if args.save_baseline:
+        baseline = dict(setup, machine=machine_info(), modes=results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"\n💾 Baseline uložena do {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nℹ️  Baseline neexistuje (--save-baseline ji vytvoří)")
+        return 1 if args.check else 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if any(baseline.get(key) != value for key, value in setup.items()):
+        print("\n⚠️  Nastavení testu se liší od baseline - výsledky nejsou porovnatelné")
+        return 1 if args.check else 0
+    if baseline.get('machine') != machine_info():
+        print(f"\n⚠️  Baseline je z jiného stroje ({baseline.get('machine')}), porovnání je orientační")
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ Regrese nad {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1 if args.check else 0
+    print(f"\n✅ Bez regrese proti baseline (mez {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
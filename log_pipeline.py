@@ -0,0 +1,253 @@
+"""
+Neblokující logování pro Joker API
+Request vlákna jen vloží záznam do fronty; formátování, deduplikaci, sampling a zápis
+do sdíleného rotovaného souboru (zámek mezi workery) dělá jedno vlákno na proces.
+"""
+import os
+import time
+import atexit
+import fcntl
+import queue
+import logging
+import threading
+from logging.handlers import QueueHandler, RotatingFileHandler
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Konfigurace
+LOG_MODE = os.getenv('LOG_MODE', 'queue').lower()  # queue | sync (původní přímý zápis)
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))  # při zaplnění se záznamy zahazují
+LOG_DEDUPE_WINDOW = float(os.getenv('LOG_DEDUPE_WINDOW', 10))  # sekundy, 0 = bez deduplikace
+LOG_RATE_LIMIT = float(os.getenv('LOG_RATE_LIMIT', 100))  # záznamů/s pod ERROR, 0 = bez limitu
+
+# Horní mez sledovaných různých zpráv v okně deduplikace (ochrana paměti při floodu z mnoha IP)
+DEDUPE_MAX_KEYS = 10000
+
+LOG_FORMAT = '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
+
+
+class SharedRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler bezpečný pro více procesů nad jedním souborem
+
+    Zápis i rotace probíhá pod fcntl zámkem na souboru <log>.lock. Před zápisem se
+    ověří, že otevřený soubor je stále ten na disku (jiný worker ho mohl zrotovat),
+    a o rotaci se rozhoduje podle skutečné velikosti souboru, ne podle pozice v procesu.
+    """
+
+    def __init__(self, filename, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.lock_file = open(f'{self.baseFilename}.lock', 'a')
+
+    def _reopen_if_rotated(self):
+        try:
+            if self.stream is None or os.stat(self.baseFilename).st_ino != os.fstat(self.stream.fileno()).st_ino:
+                raise FileNotFoundError
+        except FileNotFoundError:
+            if self.stream:
+                self.stream.close()
+            self.stream = self._open()
+
+    def shouldRollover(self, record):
+        if self.maxBytes <= 0:
+            return False
+        message = f'{self.format(record)}\n'
+        return os.fstat(self.stream.fileno()).st_size + len(message.encode(self.encoding or 'utf-8')) >= self.maxBytes
+
+    def emit(self, record):
+        fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+        try:
+            self._reopen_if_rotated()
+            super().emit(record)
+        finally:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def close(self):
+        super().close()
+        self.lock_file.close()
+
+
+class LazyQueueHandler(QueueHandler):
+    """QueueHandler, který záznam neformátuje - zprávu s argumenty složí až vlákno zápisu"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """Vlákno zápisu logů - deduplikace, sampling a zápis přes cílové handlery
+
+    Deduplikace: stejná zpráva se stejnými argumenty (např. neplatný jazyk ze stejné IP)
+    se v okně dedupe_window zapíše jednou, po uzavření okna následuje souhrn s počtem
+    opakování. Sampling: záznamy pod ERROR propouští token bucket rate_limit/s, zahozené
+    se hlásí souhrnně. Chyby (ERROR a výš) projdou vždy.
+    """
+
+    def __init__(self, handlers, dedupe_window=LOG_DEDUPE_WINDOW, rate_limit=LOG_RATE_LIMIT,
+                 queue_size=LOG_QUEUE_SIZE):
+        self.handlers = handlers
+        self.dedupe_window = dedupe_window
+        self.rate_limit = rate_limit
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.handler = LazyQueueHandler(self.queue)
+        self.running = False
+        self.thread = None
+        self.written = 0
+        self.suppressed = 0
+        self.sampled = 0
+        # Deduplikace: (úroveň, šablona, argumenty) -> [první záznam, počet opakování, konec okna]
+        self._recent = {}
+        self._tokens = rate_limit
+        self._last_refill = time.monotonic()
+        self._sampled_since_report = 0
+        self._next_flush = 0
+
+    def start(self):
+        """Spustí vlákno zápisu"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._write_cycle, daemon=True, name="LogPipeline")
+        self.thread.start()
+
+    def stop(self):
+        """Zapíše zbytek fronty a zastaví vlákno"""
+        if not self.running:
+            return
+        self.running = False
+        self.queue.put(None)
+        if self.thread:
+            self.thread.join(timeout=5)
+        for handler in self.handlers:
+            handler.flush()
+
+    def get_status(self):
+        """Vrátí status logování"""
+        return {
+            'running': self.running,
+            'queued': self.queue.qsize(),
+            'written': self.written,
+            'suppressed_duplicates': self.suppressed,
+            'sampled_out': self.sampled,
+            'dropped_queue_full': self.handler.dropped
+        }
+
+    def _write_cycle(self):
+        """Hlavní smyčka - zpracovává frontu a periodicky uzavírá okna deduplikace"""
+        while True:
+            try:
+                record = self.queue.get(timeout=1)
+            except queue.Empty:
+                record = False
+            if record is None:
+                self._flush_recent(force=True)
+                return
+            if record:
+                self._process(record)
+            if time.monotonic() >= self._next_flush:
+                self._flush_recent()
+                self._next_flush = time.monotonic() + 1
+
+    def _process(self, record):
+        now = time.monotonic()
+        if self.dedupe_window > 0 and record.levelno < logging.ERROR:
+            try:
+                key = (record.levelno, record.msg, record.args)
+                hash(key)
+            except TypeError:
+                key = None
+            if key is not None:
+                entry = self._recent.get(key)
+                if entry is not None and now < entry[2]:
+                    entry[1] += 1
+                    self.suppressed += 1
+                    return
+                if len(self._recent) < DEDUPE_MAX_KEYS:
+                    self._recent[key] = [record, 0, now + self.dedupe_window]
+
+        if self.rate_limit > 0 and record.levelno < logging.ERROR:
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._last_refill) * self.rate_limit)
+            self._last_refill = now
+            if self._tokens < 1:
+                self.sampled += 1
+                self._sampled_since_report += 1
+                return
+            self._tokens -= 1
+
+        self._write(record)
+
+    def _flush_recent(self, force=False):
+        """Za každé uzavřené okno s opakováním zapíše souhrnný záznam"""
+        now = time.monotonic()
+        for key, (record, repeats, window_end) in list(self._recent.items()):
+            if force or now >= window_end:
+                del self._recent[key]
+                if repeats:
+                    self._write(self._summary(record, f"{record.getMessage()} "
+                                                      f"(opakováno {repeats}× za {self.dedupe_window:g} s)"))
+        if self._sampled_since_report:
+            self._write(self._summary(None, f"Logování omezeno: zahozeno {self._sampled_since_report} "
+                                            f"záznamů nad {self.rate_limit:g}/s"))
+            self._sampled_since_report = 0
+
+    @staticmethod
+    def _summary(record, message):
+        """Souhrnný záznam s aktuálním časem (místo a úroveň podle původního záznamu)"""
+        if record is None:
+            return logging.LogRecord('log_pipeline', logging.WARNING, __file__, 0, message, None, None)
+        return logging.LogRecord(record.name, record.levelno, record.pathname, record.lineno,
+                                 message, None, None, record.funcName)
+
+    def _write(self, record):
+        self.written += 1
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+def create_file_handler(path, max_bytes=10240000, backup_count=10, shared=True):
+    """Vytvoří rotovaný souborový handler se standardním formátem logu"""
+    handler_class = SharedRotatingFileHandler if shared else RotatingFileHandler
+    handler = handler_class(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.setLevel(logging.INFO)
+    return handler
+
+
+# Globální instance logování
+_log_pipeline = None
+
+
+def init_log_pipeline(logger, path, mode=LOG_MODE, max_bytes=10240000, backup_count=10,
+                      queue_size=LOG_QUEUE_SIZE, dedupe_window=LOG_DEDUPE_WINDOW, rate_limit=LOG_RATE_LIMIT):
+    """Napojí logger na soubor - přes frontu (mode=queue) nebo přímo (mode=sync)
+
+    Nastavení předává aplikace z konfigurace (LOG_MODE, LOG_MAX_BYTES, LOG_BACKUP_COUNT, ...).
+    """
+    global _log_pipeline
+    if mode.lower() == 'sync':
+        logger.addHandler(create_file_handler(path, max_bytes, backup_count, shared=False))
+        return None
+    if _log_pipeline is None:
+        _log_pipeline = LogPipeline([create_file_handler(path, max_bytes, backup_count)],
+                                    dedupe_window=dedupe_window, rate_limit=rate_limit, queue_size=queue_size)
+        _log_pipeline.start()
+        # Při ukončení workeru zapsat zbytek fronty
+        atexit.register(_log_pipeline.stop)
+    logger.addHandler(_log_pipeline.handler)
+    return _log_pipeline
+
+
+def get_log_pipeline():
+    """Vrátí globální instanci logování"""
+    return _log_pipeline
@@ -0,0 +1,214 @@
+"""
+Metriky pro Joker API (Prometheus text format na /metrics)
+Čítače a histogramy latence leží ve sdílené paměti (mmap), každý worker zapisuje do vlastního
+slotu bez zámků mezi procesy a /metrics sečte sloty všech workerů - i těch, které už skončily.
+Soubor patří jedné instanci služby (PID gunicorn masteru nebo METRICS_INSTANCE) a maže se
+při jejím ukončení.
+"""
+import os
+import glob
+import mmap
+import fcntl
+import atexit
+import bisect
+import hashlib
+import logging
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Konfigurace
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_DIR = os.getenv('METRICS_DIR', '/dev/shm' if os.path.isdir('/dev/shm') else 'logs')
+METRICS_MAX_WORKERS = int(os.getenv('METRICS_MAX_WORKERS', 64))
+# Jméno instance v názvu souboru (výchozí PID procesu, který workery spustil)
+METRICS_INSTANCE = os.getenv('METRICS_INSTANCE', '')
+
+# Horní hranice bucketů histogramu latence (sekundy)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+STATUS_CODES = (200, 304, 400, 404, 429, 500, 503)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# fcntl zámky slotů se berou na bajtech daleko za koncem souboru
+SLOT_LOCK_BASE = 1 << 40
+
+
+class Metrics:
+    """Registr metrik s pevným rozložením čítačů (u64) ve slotu workeru
+
+    Rozložení slotu (pro každou routu): počty podle statusu (+ ostatní), buckety histogramu
+    (nekumulativní, + nad poslední hranicí), součet latencí v mikrosekundách, odmítnutí
+    rate limitem; za routami počty vydaných vtipů podle jazyka a kategorie.
+    Soubor se jmenuje podle instance a hashe rozložení, takže workery jiné instance nebo
+    s jinou verzí routy nesdílí.
+    """
+
+    def __init__(self, routes, languages, categories, directory=METRICS_DIR, max_workers=METRICS_MAX_WORKERS,
+                 instance=None):
+        self.logger = logging.getLogger('metrics')
+        self.routes = list(routes) + ['other']
+        self.joke_keys = [(lang, cat) for lang in languages for cat in categories]
+        self.max_workers = max_workers
+
+        self.route_stride = len(STATUS_CODES) + 1 + len(LATENCY_BUCKETS) + 1 + 2
+        self.route_index = {route: i * self.route_stride for i, route in enumerate(self.routes)}
+        self.status_index = {code: i for i, code in enumerate(STATUS_CODES)}
+        self.bucket_bounds = [int(bound * 1e6) for bound in LATENCY_BUCKETS]
+        self.bucket_base = len(STATUS_CODES) + 1
+        self.sum_offset = self.bucket_base + len(LATENCY_BUCKETS) + 1
+        self.joke_base = len(self.routes) * self.route_stride
+        self.joke_index = {key: self.joke_base + i for i, key in enumerate(self.joke_keys)}
+        self.slot_size = self.joke_base + len(self.joke_keys)
+
+        layout = repr((self.routes, self.joke_keys, STATUS_CODES, LATENCY_BUCKETS)).encode('utf-8')
+        digest = hashlib.sha1(layout).hexdigest()[:12]
+        self.instance = str(instance or os.getpid())
+        self.path = os.path.join(directory, f'joker-metrics-{self.instance}-{digest}')
+        self.size = self.slot_size * 8 * max_workers
+
+        self.lock = threading.Lock()
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self.fd).st_size < self.size:
+            os.ftruncate(self.fd, self.size)
+        self.map = mmap.mmap(self.fd, self.size)
+        self.counters = memoryview(self.map).cast('Q')
+        self.slot = None
+        self.base = 0
+        self._claim_slot()
+        # Po forku (gunicorn --preload) si dítě musí zabrat vlastní slot
+        os.register_at_fork(after_in_child=self._claim_slot)
+
+    def _claim_slot(self):
+        """Zabere volný slot workeru (fcntl zámek drží proces po celou dobu běhu)"""
+        self.lock = threading.Lock()
+        self.slot = None
+        for slot in range(self.max_workers):
+            try:
+                fcntl.lockf(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, SLOT_LOCK_BASE + slot)
+            except OSError:
+                continue
+            # Čítače ukončeného workeru v slotu zůstávají - součty jsou dál monotónní
+            self.slot = slot
+            self.base = slot * self.slot_size
+            return
+        self.logger.warning(f"Všech {self.max_workers} slotů metrik je obsazeno, worker metriky nezapisuje")
+
+    def record_request(self, route, status, seconds):
+        """Zapíše jeden požadavek - tři inkrementy čítačů"""
+        if self.slot is None:
+            return
+        base = self.base + self.route_index.get(route, self.route_index['other'])
+        micros = int(seconds * 1e6)
+        status_slot = self.status_index.get(status, len(STATUS_CODES))
+        bucket = bisect.bisect_left(self.bucket_bounds, micros)
+        counters = self.counters
+        with self.lock:
+            counters[base + status_slot] += 1
+            counters[base + self.bucket_base + bucket] += 1
+            counters[base + self.sum_offset] += micros
+
+    def record_rate_limited(self, route):
+        """Zapíše odmítnutí rate limitem"""
+        if self.slot is None:
+            return
+        index = self.base + self.route_index.get(route, self.route_index['other']) + self.sum_offset + 1
+        with self.lock:
+            self.counters[index] += 1
+
+    def record_jokes(self, language, category, count=1):
+        """Zapíše počet vydaných vtipů"""
+        index = self.joke_index.get((language, category))
+        if self.slot is None or index is None:
+            return
+        with self.lock:
+            self.counters[self.base + index] += count
+
+    def totals(self):
+        """Sečte sloty všech workerů"""
+        totals = [0] * self.slot_size
+        counters = self.counters
+        for slot in range(self.max_workers):
+            base = slot * self.slot_size
+            for i, value in enumerate(counters[base:base + self.slot_size]):
+                totals[i] += value
+        return totals
+
+    def render(self, gauges=()):
+        """Vrátí metriky v Prometheus text formátu; gauges = [(jméno, nápověda, hodnota)]"""
+        totals = self.totals()
+        lines = ['# HELP joker_requests_total Počet HTTP požadavků podle routy a statusu',
+                 '# TYPE joker_requests_total counter']
+        for route, base in self.route_index.items():
+            for code, i in list(self.status_index.items()) + [('other', len(STATUS_CODES))]:
+                if totals[base + i]:
+                    lines.append(f'joker_requests_total{{route="{route}",status="{code}"}} {totals[base + i]}')
+
+        lines += ['# HELP joker_request_duration_seconds Latence požadavku (do odeslání hlaviček)',
+                  '# TYPE joker_request_duration_seconds histogram']
+        for route, base in self.route_index.items():
+            buckets = totals[base + self.bucket_base:base + self.sum_offset]
+            count = sum(buckets)
+            if not count:
+                continue
+            cumulative = 0
+            for bound, value in zip(LATENCY_BUCKETS, buckets):
+                cumulative += value
+                lines.append(f'joker_request_duration_seconds_bucket{{route="{route}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'joker_request_duration_seconds_bucket{{route="{route}",le="+Inf"}} {count}')
+            lines.append(f'joker_request_duration_seconds_sum{{route="{route}"}} {totals[base + self.sum_offset] / 1e6:.6f}')
+            lines.append(f'joker_request_duration_seconds_count{{route="{route}"}} {count}')
+
+        lines += ['# HELP joker_rate_limited_total Požadavky odmítnuté rate limitem',
+                  '# TYPE joker_rate_limited_total counter']
+        for route, base in self.route_index.items():
+            value = totals[base + self.sum_offset + 1]
+            if value:
+                lines.append(f'joker_rate_limited_total{{route="{route}"}} {value}')
+
+        lines += ['# HELP joker_jokes_served_total Vydané vtipy podle jazyka a kategorie',
+                  '# TYPE joker_jokes_served_total counter']
+        for (language, category), index in self.joke_index.items():
+            lines.append(f'joker_jokes_served_total{{language="{language}",category="{category}"}} {totals[index]}')
+
+        for name, help_text, value in gauges:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value}']
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+# Globální instance metrik
+_metrics = None
+
+
+def remove_metrics_files(instance, directory=METRICS_DIR):
+    """Smaže soubory čítačů instance (při ukončení masteru), vrátí počet smazaných"""
+    removed = 0
+    for path in glob.glob(os.path.join(glob.escape(directory), f'joker-metrics-{glob.escape(str(instance))}-*')):
+        try:
+            os.unlink(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def init_metrics(routes, languages, categories, instance=None, enabled=METRICS_ENABLED, directory=METRICS_DIR,
+                 max_workers=METRICS_MAX_WORKERS, name=METRICS_INSTANCE):
+    """Inicializuje metriky (None, pokud jsou vypnuté)
+
+    instance je PID procesu, který workery spustil a soubor při ukončení smaže (gunicorn
+    on_exit); bez něj i bez jména instance (name, METRICS_INSTANCE) patří soubor tomuto
+    procesu a smaže ho atexit.
+    """
+    global _metrics
+    if enabled and _metrics is None:
+        _metrics = Metrics(routes, languages, categories, directory, max_workers, instance=name or instance)
+        if instance is None and not name:
+            atexit.register(remove_metrics_files, _metrics.instance, directory)
+    return _metrics
+
+
+def get_metrics():
+    """Vrátí globální instanci metrik"""
+    return _metrics
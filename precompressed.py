@@ -0,0 +1,61 @@
+"""
+Předkomprimované varianty cachovaných odpovědí pro Joker API
+Těla cachovaná pro generaci korpusu (metadata endpointy) se zkomprimují jednou při sestavení,
+požadavek jen vybere variantu podle Accept-Encoding - komprese nestojí CPU v request path.
+Malá těla se nekomprimují (hlavička a framing by úsporu sežraly).
+"""
+import gzip
+from functools import lru_cache
+
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+try:
+    import zstandard
+except ImportError:  # volitelné - bez balíčku zstandard jen gzip
+    zstandard = None
+
+# Úroveň komprese - komprimuje se jednou za generaci korpusu, takže se vyplatí maximum
+GZIP_LEVEL = 9
+ZSTD_LEVEL = 19
+IDENTITY = 'identity'
+
+# Kodéry v pořadí preference serveru (při stejné kvalitě v Accept-Encoding vyhrává první)
+ENCODERS = {}
+if zstandard is not None:
+    ENCODERS['zstd'] = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress
+# mtime=0 - stejné tělo dá ve všech workerech stejné bytes
+ENCODERS['gzip'] = lambda body: gzip.compress(body, GZIP_LEVEL, mtime=0)
+
+
+def compress_variants(body, min_size):
+    """Zkomprimuje tělo všemi kodéry, vrátí {kódování: bytes} jen pro varianty menší než originál"""
+    if len(body) < min_size:
+        return {}
+    variants = {}
+    for encoding, compress in ENCODERS.items():
+        compressed = compress(body)
+        if len(compressed) < len(body):
+            variants[encoding] = compressed
+    return variants
+
+
+@lru_cache(maxsize=256)
+def parse_accept_encoding(value):
+    """Naparsovaná hlavička Accept-Encoding - klienti posílají jen pár různých hodnot"""
+    return parse_accept_header(value, Accept)
+
+
+def choose_encoding(accept_encoding, available):
+    """Vybere variantu podle Accept-Encoding - available jsou kódování v pořadí preference
+    zakončená identity; bez hlavičky nebo bez shody se posílá identity"""
+    if not accept_encoding or len(available) == 1:
+        return IDENTITY
+    accept = parse_accept_encoding(accept_encoding)
+    best, best_quality = IDENTITY, 0
+    for encoding in available:
+        quality = accept[encoding]
+        # Při shodné kvalitě (např. "*") vyhrává dřívější, tedy komprimovaná varianta
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
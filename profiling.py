@@ -0,0 +1,286 @@
+"""
+Měření fází požadavku a vzorkovací profiler pro Joker API
+Fáze (limiter, parametry, načtení, render, hlavičky, CORS) jdou do hlavičky Server-Timing a do logu
+pomalých požadavků; profiler vzorkuje zásobníky vybraných požadavků do logs/profile-<pid>.folded.
+"""
+import os
+import sys
+import time
+import logging
+import threading
+from collections import Counter
+from flask import g, request
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Konfigurace
+PHASE_TIMING = os.getenv('PHASE_TIMING', 'false').lower() == 'true'
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 200))  # 0 = bez logu pomalých požadavků
+PROFILE_SAMPLE_EVERY = int(os.getenv('PROFILE_SAMPLE_EVERY', 0))  # profilovat 1 z N požadavků, 0 = vypnuto
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 1))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'logs')
+# Řídicí soubor profileru - zapisuje ho operátor ("every=100", "seconds=60" nebo "off")
+PROFILE_CONTROL = os.getenv('PROFILE_CONTROL', os.path.join(PROFILE_DIR, 'profile.control'))
+
+# Jak často profiler kontroluje řídicí soubor a zapisuje nasbírané zásobníky (sekundy)
+CONTROL_POLL = 1
+FLUSH_INTERVAL = 10
+MAX_STACK_DEPTH = 64
+
+
+class PhaseTimer:
+    """Časy fází jednoho požadavku - každá značka uzavře fázi od předchozí značky"""
+
+    def __init__(self):
+        self.start = self.last = time.perf_counter()
+        self.phases = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def total(self):
+        return self.last - self.start
+
+    def header(self):
+        """Hodnota hlavičky Server-Timing (ms)"""
+        parts = [f'{name};dur={seconds * 1000:.3f}' for name, seconds in self.phases]
+        parts.append(f'total;dur={self.total() * 1000:.3f}')
+        return ', '.join(parts)
+
+
+def mark_phase(name):
+    """Uzavře fázi aktuálního požadavku (volat jen pod PHASE_TIMING)"""
+    timer = g.get('phase_timer')
+    if timer is not None:
+        timer.mark(name)
+
+
+def init_request_timing(app, logger, enabled=PHASE_TIMING, slow_ms=SLOW_REQUEST_MS):
+    """Napojí měření fází na aplikaci - po Limiteru a CORS, aby jejich hooky byly uvnitř měření"""
+    if not enabled:
+        return
+
+    def start_phase_timer():
+        g.phase_timer = PhaseTimer()
+
+    def end_limiter_phase():
+        mark_phase('limiter')
+
+    def write_server_timing(response):
+        timer = g.get('phase_timer')
+        if timer is None:
+            return response
+        timer.mark('cors')
+        response.headers['Server-Timing'] = timer.header()
+        if slow_ms and timer.total() * 1000 >= slow_ms:
+            logger.warning("Pomalý požadavek %s %s: %.1f ms (%s)", request.method, request.full_path,
+                           timer.total() * 1000, timer.header())
+        return response
+
+    # before_request běží v pořadí registrace, after_request obráceně - začátek i konec měření
+    # proto patří na začátek seznamů, kontrola limitu (hook Limiteru) pak padne do fáze 'limiter'
+    app.before_request_funcs.setdefault(None, []).insert(0, start_phase_timer)
+    app.before_request(end_limiter_phase)
+    app.after_request_funcs.setdefault(None, []).insert(0, write_server_timing)
+
+
+def collapse_stack(frame):
+    """Zásobník jako řádek pro flame graph: kořen;...;list (soubor:funkce)"""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """Vzorkovací profiler vybraných požadavků
+
+    Požadavek se profiluje, pokud je N-tý v pořadí (every) nebo běží časové okno (seconds).
+    Vlákno profileru pak v intervalu čte zásobníky vláken profilovaných požadavků
+    (sys._current_frames) a sčítá je do Counteru. Vypnutý profiler stojí v request path
+    jen kontrolu jednoho atributu; řídicí soubor čte vlákno jednou za sekundu.
+    """
+
+    def __init__(self, every=PROFILE_SAMPLE_EVERY, interval=PROFILE_INTERVAL_MS / 1000,
+                 output_dir=PROFILE_DIR, control_path=PROFILE_CONTROL):
+        self.logger = logging.getLogger('profiler')
+        self.default_every = every
+        self.every = every
+        self.interval = interval
+        self.output_dir = output_dir
+        self.control_path = control_path
+        self.window_until = 0
+        self.enabled = every > 0
+        self.counter = 0
+        self.targets = set()
+        self.stacks = Counter()
+        self.samples = 0
+        self.profiled_requests = 0
+        self.running = False
+        self.thread = None
+        self._control_mtime = None
+        self._stop_event = threading.Event()
+
+    @property
+    def output_path(self):
+        return os.path.join(self.output_dir, f'profile-{os.getpid()}.folded')
+
+    def start(self):
+        """Spustí vlákno profileru"""
+        if self.running:
+            return
+        self.running = True
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._sample_cycle, daemon=True, name="SamplingProfiler")
+        self.thread.start()
+
+    def stop(self):
+        """Zastaví vlákno a zapíše nasbírané zásobníky"""
+        if not self.running:
+            return
+        self.running = False
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+        self.flush()
+
+    def get_status(self):
+        """Vrátí status profileru"""
+        return {
+            'enabled': self.enabled,
+            'sample_every': self.every,
+            'window_seconds_left': max(0, round(self.window_until - time.monotonic(), 1)),
+            'profiled_requests': self.profiled_requests,
+            'samples': self.samples,
+            'output': self.output_path if self.stacks else None
+        }
+
+    def begin_request(self):
+        """Volá se na začátku požadavku - vrátí True, pokud se požadavek profiluje"""
+        if not self.enabled:
+            return False
+        if self.every:
+            self.counter += 1
+            selected = self.counter % self.every == 0
+        else:
+            selected = False
+        if not selected and time.monotonic() >= self.window_until:
+            return False
+        self.targets.add(threading.get_ident())
+        self.profiled_requests += 1
+        return True
+
+    def end_request(self):
+        self.targets.discard(threading.get_ident())
+
+    def configure(self, every=None, seconds=None):
+        """Přepne profiler - every = 1 z N požadavků, seconds = profilovat vše po dobu okna"""
+        if every is not None:
+            self.every = every
+        if seconds is not None:
+            self.window_until = time.monotonic() + seconds if seconds > 0 else 0
+        self.enabled = self.every > 0 or self.window_until > time.monotonic()
+        self.logger.info(f"Profiler: 1 z {self.every or '-'} požadavků, okno "
+                         f"{max(0, self.window_until - time.monotonic()):.0f} s")
+
+    def _read_control(self):
+        """Načte řídicí soubor, pokud se od minula změnil (smazání vrátí výchozí nastavení)"""
+        try:
+            mtime = os.stat(self.control_path).st_mtime
+        except OSError:
+            if self._control_mtime is not None:
+                self._control_mtime = None
+                self.configure(every=self.default_every, seconds=0)
+            return
+        if mtime == self._control_mtime:
+            return
+        self._control_mtime = mtime
+        try:
+            with open(self.control_path, encoding='utf-8') as f:
+                options = dict(line.strip().partition('=')[::2] for line in f if line.strip())
+            if 'off' in options:
+                self.configure(every=0, seconds=0)
+            else:
+                self.configure(every=int(options['every']) if 'every' in options else None,
+                               seconds=float(options['seconds']) if 'seconds' in options else None)
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Neplatný řídicí soubor profileru {self.control_path}: {str(e)}")
+
+    def _sample_cycle(self):
+        """Hlavní smyčka - vzorkuje, když je profiler zapnutý, jinak jen hlídá řídicí soubor"""
+        next_control = next_flush = 0
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            if now >= next_control:
+                self._read_control()
+                if self.enabled and not self.every and now >= self.window_until:
+                    self.enabled = False
+                    self.flush()
+                next_control = now + CONTROL_POLL
+            if not self.enabled:
+                self._stop_event.wait(CONTROL_POLL)
+                continue
+            if self.targets:
+                frames = sys._current_frames()
+                for ident in list(self.targets):
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        self.stacks[collapse_stack(frame)] += 1
+                        self.samples += 1
+            if now >= next_flush:
+                self.flush()
+                next_flush = now + FLUSH_INTERVAL
+            self._stop_event.wait(self.interval)
+
+    def flush(self):
+        """Zapíše součty zásobníků (formát "zásobník počet" pro flamegraph.pl / speedscope)"""
+        if not self.stacks:
+            return
+        stacks = self.stacks.copy()
+        temp_path = f'{self.output_path}.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f'{stack} {count}\n')
+            os.replace(temp_path, self.output_path)
+        except OSError as e:
+            self.logger.error(f"Nelze zapsat profil {self.output_path}: {str(e)}")
+
+
+# Globální instance profileru
+_profiler = None
+
+
+def init_profiler(app, every=PROFILE_SAMPLE_EVERY, interval=PROFILE_INTERVAL_MS / 1000,
+                  output_dir=PROFILE_DIR, control_path=PROFILE_CONTROL):
+    """Inicializuje profiler a napojí ho na začátek a konec požadavků (vlákno spouští start())
+
+    Profiler je jeden na proces - nastavení platí z první aplikace, která ho vytvořila.
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = SamplingProfiler(every, interval, output_dir, control_path)
+
+    profiler = _profiler
+
+    def begin_profiled_request():
+        if profiler.begin_request():
+            g.profiled = True
+
+    def end_profiled_request(error=None):
+        if g.pop('profiled', False):
+            profiler.end_request()
+
+    app.before_request_funcs.setdefault(None, []).insert(0, begin_profiled_request)
+    app.teardown_request(end_profiled_request)
+    return profiler
+
+
+def get_profiler():
+    """Vrátí globální instanci profileru"""
+    return _profiler
@@ -0,0 +1,396 @@
+"""
+Úložiště rate limitů pro Joker API (import modulu registruje schémata pro Flask-Limiter)
+shm://          hashovací tabulka ve sdílené paměti (mmap), limit platí pro celý host bez Redisu
+redis+lease://  Redis s lokální předagregací - workery zapisují čítače dávkově přes pipeline
+Použití: RATELIMIT_STORAGE_URI=shm:///dev/shm/joker-ratelimit?slots=65536
+
+Modul registruje i strategii gcra (RATELIMIT_STRATEGY=gcra) - token bucket nad shm://.
+
+Formát souboru (little-endian):
+    hlavička   magic, verze, počet skupin
+    skupiny    po GROUP_SIZE slotech (hash klíče, hodnota, expirace); klíč patří do jedné skupiny
+"""
+import os
+import mmap
+import time
+import fcntl
+import struct
+import hashlib
+import logging
+import threading
+from urllib.parse import urlencode, urlparse, parse_qs
+
+from limits.storage import RedisStorage, Storage
+from limits.strategies import STRATEGIES, RateLimiter
+from limits.util import WindowStats
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'JOKERRL1'
+VERSION = 1
+
+HEADER = struct.Struct('<8sII')
+SLOT = struct.Struct('<Qdd')
+GROUP_SIZE = 16
+GROUP = struct.Struct('<' + 'Qdd' * GROUP_SIZE)
+
+DEFAULT_PATH = '/dev/shm/joker-ratelimit'
+DEFAULT_SLOTS = 65536
+LOCK_STRIPES = 64
+
+# redis+lease:// - lokální rozpočet zásahů na klíč a interval dávkového zápisu (ms)
+DEFAULT_LEASE = 10
+DEFAULT_FLUSH_INTERVAL_MS = 50
+
+# fcntl zámky se berou na bajtech daleko za koncem souboru - nepřekrývají se s daty
+INIT_LOCK = 1 << 40
+STRIPE_LOCK_BASE = INIT_LOCK + 1
+
+
+class SharedMemoryStorage(Storage):
+    """Rate limit úložiště v hashovací tabulce sdílené procesy přes mmap
+
+    Klíč se zahashuje do jedné skupiny o GROUP_SIZE slotech. Zápisy chrání pruhované zámky
+    (threading.Lock v procesu + fcntl zámek na bajtu souboru mezi procesy). Slot s prošlou
+    expirací je volný; když je skupina plná živých klíčů, přepíše se ten s nejbližší expirací
+    (přibližné vyhazování nečinných klíčů).
+
+    Fixed window (výchozí strategie) používá incr/get, strategie gcra acquire_gcra/get_gcra -
+    hodnota slotu je pak teoretický čas příchodu. Moving window úložiště nepodporuje.
+    """
+
+    STORAGE_SCHEME = ['shm']
+
+    def __init__(self, uri, wrap_exceptions=False, **options):
+        parsed = urlparse(uri)
+        query = parse_qs(parsed.query)
+        self.path = parsed.path or DEFAULT_PATH
+        slots = int(query.get('slots', [DEFAULT_SLOTS])[0])
+        self.groups = max(1, slots // GROUP_SIZE)
+        self.locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._open()
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    def _open(self):
+        """Otevře (a případně inicializuje) soubor tabulky a namapuje ho"""
+        size = HEADER.size + self.groups * GROUP.size
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, INIT_LOCK)
+        try:
+            header = os.pread(self.fd, HEADER.size, 0)
+            if (os.fstat(self.fd).st_size != size
+                    or header != HEADER.pack(MAGIC, VERSION, self.groups)):
+                # Nový nebo nekompatibilní soubor - vynulovat a zapsat hlavičku
+                os.ftruncate(self.fd, 0)
+                os.ftruncate(self.fd, size)
+                os.pwrite(self.fd, HEADER.pack(MAGIC, VERSION, self.groups), 0)
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, INIT_LOCK)
+        self.map = mmap.mmap(self.fd, size)
+
+    def __getstate__(self):
+        return {'path': self.path, 'groups': self.groups}
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        self.groups = state['groups']
+        self.locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._open()
+
+    @property
+    def base_exceptions(self):
+        return OSError
+
+    def _locate(self, key):
+        """Vrátí (hash klíče, offset skupiny, pruh zámku)"""
+        digest = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+        digest = digest or 1  # 0 značí prázdný slot
+        group = digest % self.groups
+        return digest, HEADER.size + group * GROUP.size, group % LOCK_STRIPES
+
+    def _update(self, key, update):
+        """Atomicky upraví slot klíče - update(hodnota, expirace, now) vrátí (výsledek, hodnota, expirace)
+
+        Prošlý nebo chybějící slot předá update jako (0.0, 0.0).
+        """
+        digest, offset, stripe = self._locate(key)
+        with self.locks[stripe]:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, STRIPE_LOCK_BASE + stripe)
+            try:
+                now = time.time()
+                fields = GROUP.unpack_from(self.map, offset)
+                target = None
+                victim = 0
+                for slot in range(GROUP_SIZE):
+                    slot_hash, value, expires = fields[slot * 3:slot * 3 + 3]
+                    if slot_hash == digest:
+                        target = slot
+                        break
+                    if expires < fields[victim * 3 + 2]:
+                        victim = slot
+
+                if target is None:
+                    target = victim
+                    value = expires = 0.0
+                elif expires <= now:
+                    value = expires = 0.0
+
+                result, value, expires = update(value, expires, now)
+                SLOT.pack_into(self.map, offset + target * SLOT.size, digest, value, expires)
+                return result
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, STRIPE_LOCK_BASE + stripe)
+
+    def _read(self, key):
+        """Vrátí (hodnota, expirace) živého slotu klíče nebo None - čtení bez zámku"""
+        digest, offset, _ = self._locate(key)
+        fields = GROUP.unpack_from(self.map, offset)
+        now = time.time()
+        for slot in range(GROUP_SIZE):
+            slot_hash, value, expires = fields[slot * 3:slot * 3 + 3]
+            if slot_hash == digest:
+                return (value, expires) if expires > now else None
+        return None
+
+    def incr(self, key, expiry, amount=1):
+        """Fixed window - zvýší čítač okna, první zásah nastaví expiraci okna"""
+        def update(value, expires, now):
+            if not expires:
+                expires = now + expiry
+            return int(value + amount), value + amount, expires
+        return self._update(key, update)
+
+    def get(self, key):
+        entry = self._read(key)
+        return int(entry[0]) if entry else 0
+
+    def get_expiry(self, key):
+        entry = self._read(key)
+        return entry[1] if entry else time.time()
+
+    def acquire_gcra(self, key, limit, expiry, amount=1):
+        """Token bucket (GCRA) - kapacita limit, doplňování limit tokenů za expiry sekund"""
+        if amount > limit:
+            return False
+        emission = expiry / limit
+
+        def update(value, expires, now):
+            tat = max(value, now) + amount * emission
+            if tat - now > expiry:
+                return False, value, expires
+            # Slot je nečinný (a volný k přepsání), jakmile se bucket celý doplní
+            return True, tat, tat
+        return self._update(key, update)
+
+    def get_gcra(self, key, limit, expiry):
+        """Vrátí (čas úplného doplnění, spotřebované tokeny) pro statistiky limitu"""
+        now = time.time()
+        entry = self._read(key)
+        if not entry:
+            return now, 0
+        used = -(-(entry[0] - now) * limit // expiry)  # zaokrouhlení nahoru
+        return entry[0], int(used)
+
+    def check(self):
+        return not self.map.closed
+
+    def reset(self):
+        """Vymaže všechny klíče"""
+        for stripe in range(LOCK_STRIPES):
+            self.locks[stripe].acquire()
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, LOCK_STRIPES, STRIPE_LOCK_BASE)
+        try:
+            size = self.groups * GROUP.size
+            self.map[HEADER.size:HEADER.size + size] = bytes(size)
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, LOCK_STRIPES, STRIPE_LOCK_BASE)
+            for stripe in range(LOCK_STRIPES):
+                self.locks[stripe].release()
+        return None
+
+    def clear(self, key):
+        self._update(key, lambda value, expires, now: (None, 0.0, 0.0))
+
+
+class GcraRateLimiter(RateLimiter):
+    """Strategie gcra - token bucket s kapacitou limit, doplňovaný rovnoměrně za dobu okna
+
+    Na rozdíl od moving window nepamatuje jednotlivé zásahy, jen teoretický čas příchodu;
+    dávka na začátku okna se tedy doplňuje průběžně, ne až po uplynutí celého okna.
+    Vyžaduje úložiště s acquire_gcra/get_gcra (shm://).
+    """
+
+    def __init__(self, storage):
+        if not hasattr(storage, 'acquire_gcra'):
+            raise NotImplementedError(f"Strategie gcra není pro úložiště {storage.__class__.__name__} implementovaná")
+        super().__init__(storage)
+
+    def hit(self, item, *identifiers, cost=1):
+        return self.storage.acquire_gcra(item.key_for(*identifiers), item.amount, item.get_expiry(), amount=cost)
+
+    def test(self, item, *identifiers, cost=1):
+        _, used = self.storage.get_gcra(item.key_for(*identifiers), item.amount, item.get_expiry())
+        return used <= item.amount - cost
+
+    def get_window_stats(self, item, *identifiers):
+        refilled, used = self.storage.get_gcra(item.key_for(*identifiers), item.amount, item.get_expiry())
+        return WindowStats(refilled, item.amount - used)
+
+
+STRATEGIES['gcra'] = GcraRateLimiter
+
+
+class LeasedCounter:
+    """Lokální stav jednoho klíče v okně - poslední známý globální čítač a nezapsané zásahy"""
+
+    __slots__ = ('known', 'pending', 'inflight', 'expires')
+
+    def __init__(self, expires):
+        self.known = 0
+        self.pending = 0
+        self.inflight = 0
+        self.expires = expires
+
+    @property
+    def count(self):
+        return self.known + self.inflight + self.pending
+
+
+class LeasedRedisStorage(Storage):
+    """Fixed window v Redisu s lokální předagregací (redis+lease://host:port/db?lease=10&flush_ms=50)
+
+    Worker smí pro klíč povolit až `lease` zásahů nad posledním známým globálním čítačem
+    bez síťové komunikace. Nezapsané zásahy zapisuje vlákno po `flush_ms` jednou pipeline
+    (SET NX EX + INCRBY + PTTL na klíč) a odpověď obnoví známé čítače. Po vyčerpání
+    rozpočtu se klíč zapíše synchronně. Globální limit tak může být překročen nejvýš
+    o (počet workerů × lease) zásahů na okno.
+
+    Klíče a jejich formát jsou shodné s redis:// úložištěm limits, oba režimy lze míchat.
+    """
+
+    STORAGE_SCHEME = ['redis+lease', 'rediss+lease']
+
+    def __init__(self, uri, wrap_exceptions=False, **options):
+        parsed = urlparse(uri)
+        query = parse_qs(parsed.query)
+        self.lease = int(query.pop('lease', [DEFAULT_LEASE])[0])
+        self.flush_interval = int(query.pop('flush_ms', [DEFAULT_FLUSH_INTERVAL_MS])[0]) / 1000
+        redis_uri = parsed._replace(scheme=parsed.scheme.replace('+lease', ''),
+                                    query=urlencode(query, doseq=True)).geturl()
+        self.redis = RedisStorage(redis_uri, **options)
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.dirty = {}
+        self.flusher = None
+        self.pid = None
+        self.stop_event = threading.Event()
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return self.redis.base_exceptions
+
+    def _ensure_flusher(self):
+        """Spustí vlákno dávkového zápisu (po forku workeru znovu, vlákna fork nepřežijí)"""
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.counters = {}
+            self.dirty = {}
+            self.flusher = threading.Thread(target=self._flush_cycle, daemon=True,
+                                            name='ratelimit-flush')
+            self.flusher.start()
+            self.pid = os.getpid()
+
+    def _flush_cycle(self):
+        """Smyčka vlákna - periodicky zapíše nezapsané zásahy"""
+        while not self.stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Zápis rate limit čítačů do Redisu selhal: {e}")
+
+    def flush(self, keys=None):
+        """Zapíše nezapsané zásahy (všech nebo vybraných klíčů) jednou pipeline"""
+        with self.lock:
+            batch = []
+            for key in (keys if keys is not None else list(self.dirty)):
+                expiry = self.dirty.pop(key, None)
+                counter = self.counters.get(key)
+                if expiry is None or counter is None or not counter.pending:
+                    continue
+                counter.inflight += counter.pending
+                batch.append((key, counter, counter.pending, expiry))
+                counter.pending = 0
+        if not batch:
+            return
+
+        pipeline = self.redis.get_connection().pipeline(transaction=False)
+        for key, _, amount, expiry in batch:
+            redis_key = self.redis.prefixed_key(key)
+            pipeline.set(redis_key, 0, ex=int(expiry), nx=True)
+            pipeline.incrby(redis_key, amount)
+            pipeline.pttl(redis_key)
+        try:
+            results = pipeline.execute()
+        except Exception:
+            # Zásahy vrátit do fronty, zkusí se to v dalším cyklu
+            with self.lock:
+                for key, counter, amount, expiry in batch:
+                    counter.inflight -= amount
+                    counter.pending += amount
+                    self.dirty[key] = expiry
+            raise
+
+        now = time.time()
+        with self.lock:
+            for index, (key, counter, amount, _) in enumerate(batch):
+                count, ttl = results[index * 3 + 1], results[index * 3 + 2]
+                counter.inflight -= amount
+                counter.known = max(counter.known, int(count))
+                if ttl > 0:
+                    counter.expires = now + ttl / 1000
+
+    def incr(self, key, expiry, amount=1):
+        """Zvýší čítač okna - bez sítě, dokud nezapsané zásahy nepřekročí lease"""
+        self._ensure_flusher()
+        with self.lock:
+            now = time.time()
+            counter = self.counters.get(key)
+            if counter is None or counter.expires <= now:
+                counter = self.counters[key] = LeasedCounter(now + expiry)
+            counter.pending += amount
+            self.dirty[key] = expiry
+            if counter.pending + counter.inflight <= self.lease:
+                return counter.count
+        # Rozpočet vyčerpán - synchronní zápis vrátí přesný globální čítač
+        self.flush([key])
+        with self.lock:
+            return counter.count
+
+    def get(self, key):
+        counter = self.counters.get(key)
+        if counter is None or counter.expires <= time.time():
+            return 0
+        return counter.count
+
+    def get_expiry(self, key):
+        counter = self.counters.get(key)
+        return counter.expires if counter is not None else time.time()
+
+    def check(self):
+        return self.redis.check()
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.dirty.clear()
+        return self.redis.reset()
+
+    def clear(self, key):
+        with self.lock:
+            self.counters.pop(key, None)
+            self.dirty.pop(key, None)
+        self.redis.clear(key)
@@ -0,0 +1,146 @@
+"""
+Minimální zástupce Redis serveru (RESP přes TCP) pro testy a benchmarky rate limitingu
+Umí jen příkazy, které posílá limits a ratelimit.py (INCRBY, SET NX EX, PTTL, GET, DEL,
+skripty incr_expire/clear_keys); každý příkaz ale platí skutečný síťový round trip.
+"""
+import time
+import fnmatch
+import hashlib
+import threading
+import socketserver
+
+
+def encode(value, resp3=False):
+    """Zakóduje odpověď do RESP2 (nebo RESP3, pokud si ho klient vyjednal přes HELLO)"""
+    if value is None or value is False:
+        return b'_\r\n' if resp3 else b'$-1\r\n'
+    if value is True:
+        return b'+OK\r\n'
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, bytes):
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+    if isinstance(value, dict):
+        return b'%%%d\r\n' % len(value) + b''.join(encode(k) + encode(v) for k, v in value.items())
+    if isinstance(value, Exception):
+        return b'-' + str(value).encode('utf-8') + b'\r\n'
+    return b'+' + value.encode('ascii') + b'\r\n'
+
+
+class RedisStandin:
+    """Klíče s čítači a expirací v paměti, obsluha RESP v samostatném vlákně"""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.scripts = {}
+        self.commands = 0
+        self.lock = threading.Lock()
+        self.server = None
+
+    def start(self):
+        """Spustí server na volném portu, vrátí URL"""
+        standin = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                resp3 = False
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    args = []
+                    for _ in range(int(line[1:])):
+                        length = int(self.rfile.readline()[1:])
+                        args.append(self.rfile.read(length + 2)[:-2])
+                    if args[0].upper() == b'HELLO' and len(args) > 1:
+                        resp3 = args[1] == b'3'
+                    self.wfile.write(encode(standin.execute(args), resp3))
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f'redis://127.0.0.1:{self.server.server_address[1]}'
+
+    def stop(self):
+        """Zastaví server"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _live(self, key):
+        if key in self.expires and self.expires[key] <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def _incrby(self, key, amount):
+        self._live(key)
+        self.data[key] = int(self.data.get(key, 0)) + amount
+        return self.data[key]
+
+    def execute(self, args):
+        """Provede jeden příkaz"""
+        command = args[0].upper()
+        with self.lock:
+            self.commands += 1
+            if command == b'HELLO':
+                # Novější redis klienti vyjednávají protokol - odpověď je RESP3 mapa
+                return {b'proto': int(args[1]) if len(args) > 1 else 2}
+            if command == b'PING':
+                return 'PONG'
+            if command == b'SCRIPT':
+                sha = hashlib.sha1(args[2]).hexdigest().encode('ascii')
+                self.scripts[sha] = args[2]
+                return sha
+            if command in (b'EVALSHA', b'EVAL'):
+                script = args[1] if command == b'EVAL' else self.scripts.get(args[1])
+                if script is None:
+                    return Exception('NOSCRIPT No matching script')
+                keys = args[3:3 + int(args[2])]
+                argv = args[3 + int(args[2]):]
+                if b'incrby' in script:
+                    # incr_expire.lua: ARGV = [expiry, amount]
+                    count = self._incrby(keys[0], int(argv[1]))
+                    if count == int(argv[1]):
+                        self.expires[keys[0]] = time.monotonic() + int(argv[0])
+                    return count
+                # clear_keys.lua: smaže klíče podle vzoru
+                pattern = keys[0].decode('utf-8') if keys else argv[0].decode('utf-8')
+                removed = [key for key in self.data if fnmatch.fnmatchcase(key.decode('utf-8'), pattern)]
+                for key in removed:
+                    self.data.pop(key)
+                    self.expires.pop(key, None)
+                return len(removed)
+            if command == b'INCRBY':
+                return self._incrby(args[1], int(args[2]))
+            if command == b'SET':
+                options = [arg.upper() for arg in args[3:]]
+                if b'NX' in options and self._live(args[1]):
+                    return None
+                self.data[args[1]] = args[2]
+                self.expires.pop(args[1], None)
+                if b'EX' in options:
+                    self.expires[args[1]] = time.monotonic() + int(args[3 + options.index(b'EX') + 1])
+                return True
+            if command == b'PTTL':
+                if not self._live(args[1]):
+                    return -2
+                if args[1] not in self.expires:
+                    return -1
+                return int((self.expires[args[1]] - time.monotonic()) * 1000)
+            if command == b'GET':
+                if not self._live(args[1]):
+                    return None
+                value = self.data[args[1]]
+                return value if isinstance(value, bytes) else str(value).encode('ascii')
+            if command == b'DEL':
+                removed = sum(self.data.pop(key, None) is not None for key in args[1:])
+                for key in args[1:]:
+                    self.expires.pop(key, None)
+                return removed
+            if command == b'FLUSHALL':
+                self.data.clear()
+                self.expires.clear()
+                return True
+            return True
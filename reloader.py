@@ -0,0 +1,99 @@
+"""
+Hot reload korpusu vtipů pro Joker API
+Pravidelně kontroluje soubory v jokes/ (mtime/velikost) a změněné záznamy přenačte bez restartu
+"""
+import os
+import threading
+import logging
+from datetime import datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Konfigurace
+JOKES_RELOAD_INTERVAL = float(os.getenv('JOKES_RELOAD_INTERVAL', 5))  # sekundy, 0 = vypnuto
+
+
+class CorpusWatcher:
+    """Sleduje změny korpusu a volá reload mimo request path"""
+
+    def __init__(self, reload, interval=JOKES_RELOAD_INTERVAL):
+        self.reload = reload
+        self.interval = interval
+        self.logger = logging.getLogger('corpus_watcher')
+        self.running = False
+        self.thread = None
+        self.last_check = None
+        self.last_change = None
+        self._stop_event = threading.Event()
+
+    def check(self):
+        """Jedna kontrola změn - reload sám porovná podpisy souborů se snímkem"""
+        self.last_check = datetime.now()
+        changed = self.reload()
+        if changed:
+            self.last_change = self.last_check
+            self.logger.info(f"Přenačteny záznamy: {', '.join(changed)}")
+        return changed
+
+    def _watch_cycle(self):
+        """Hlavní cyklus sledování"""
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                self.logger.error(f"Chyba při kontrole změn korpusu: {str(e)}")
+
+    def start(self):
+        """Spustí sledování v samostatném vlákně"""
+        if self.interval <= 0:
+            self.logger.info("Hot reload korpusu je zakázán (JOKES_RELOAD_INTERVAL=0)")
+            return
+
+        if self.running:
+            self.logger.warning("Sledování korpusu již běží")
+            return
+
+        self.running = True
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._watch_cycle, daemon=True, name="CorpusWatcher")
+        self.thread.start()
+        self.logger.info(f"Sledování korpusu spuštěno (kontrola každých {self.interval:g} s)")
+
+    def stop(self):
+        """Zastaví sledování"""
+        if not self.running:
+            return
+
+        self.running = False
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+        self.logger.info("Sledování korpusu zastaveno")
+
+    def get_status(self):
+        """Vrátí status sledování korpusu"""
+        return {
+            'running': self.running,
+            'interval_seconds': self.interval,
+            'last_check': self.last_check.isoformat() if self.last_check else None,
+            'last_change': self.last_change.isoformat() if self.last_change else None
+        }
+
+
+# Globální instance sledování korpusu
+_corpus_watcher = None
+
+
+def init_corpus_watcher(reload, interval=JOKES_RELOAD_INTERVAL):
+    """Inicializuje a spustí sledování korpusu (interval z konfigurace aplikace)"""
+    global _corpus_watcher
+    if _corpus_watcher is None:
+        _corpus_watcher = CorpusWatcher(reload, interval)
+        _corpus_watcher.start()
+    return _corpus_watcher
+
+
+def get_corpus_watcher():
+    """Vrátí globální instanci sledování korpusu"""
+    return _corpus_watcher
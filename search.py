@@ -0,0 +1,162 @@
+"""
+Fulltextové vyhledávání vtipů pro Joker API
+Invertovaný index pro jeden záznam (jazyk, kategorie): slovo -> seřazené indexy vtipů
+v kompaktním poli array('I'). Slova se porovnávají bez diakritiky a velikosti písmen,
+takže dotaz "blondyna" najde "Blondýna"; dotaz je AND slov, "slovo*" hledá prefix.
+"""
+import re
+import sys
+import unicodedata
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+
+# Slova kratší než MIN_TOKEN_LENGTH (předložky, spojky) se neindexují
+MIN_TOKEN_LENGTH = 2
+# Krátký prefix sjednocuje posting listy velké části slovníku
+MIN_PREFIX_LENGTH = 3
+MAX_QUERY_TERMS = 8
+# Cache výsledků dotazů na index (klíč je normalizovaný dotaz)
+QUERY_CACHE_SIZE = 1024
+
+# Malá latinková písmena s diakritikou -> základní písmeno (pokrývá češtinu i slovenštinu)
+FOLD_TABLE = {code: unicodedata.normalize('NFD', chr(code))[0]
+              for code in range(0xC0, 0x250)
+              if len(unicodedata.normalize('NFD', chr(code))) > 1}
+TOKEN_PATTERN = re.compile(r'\w+')
+# V angličtině apostrof slovo nerozděluje (don't -> dont)
+APOSTROPHES = {ord("'"): None, ord('’'): None}
+APOSTROPHE_LANGUAGES = ('en-gb', 'en-us')
+
+EMPTY = array('I')
+
+
+class SearchError(ValueError):
+    """Neplatný vyhledávací dotaz"""
+
+
+def fold(text):
+    """Malá písmena bez diakritiky"""
+    return text.lower().translate(FOLD_TABLE)
+
+
+def tokenize(text, language=None):
+    """Rozdělí text na normalizovaná slova (bez diakritiky, malými písmeny)"""
+    text = fold(text)
+    if language in APOSTROPHE_LANGUAGES:
+        text = text.translate(APOSTROPHES)
+    return [token for token in TOKEN_PATTERN.findall(text) if len(token) >= MIN_TOKEN_LENGTH]
+
+
+def parse_query(query, language=None):
+    """Převede dotaz na n-tici (slovo, prefix) - slova se spojují přes AND"""
+    terms = []
+    for word in query.split():
+        prefix = word.endswith('*')
+        tokens = tokenize(word.rstrip('*'), language)
+        terms += [(token, False) for token in tokens[:-1]]
+        if tokens:
+            if prefix and len(tokens[-1]) < MIN_PREFIX_LENGTH:
+                raise SearchError(f"Prefix musí mít alespoň {MIN_PREFIX_LENGTH} znaky: {word}")
+            terms.append((tokens[-1], prefix))
+    if not terms:
+        raise SearchError(f"Dotaz neobsahuje žádné slovo o délce alespoň {MIN_TOKEN_LENGTH} znaky")
+    if len(terms) > MAX_QUERY_TERMS:
+        raise SearchError(f"Dotaz může obsahovat nejvýše {MAX_QUERY_TERMS} slov")
+    # Pořadí slov výsledek nemění - seřazení sjednotí klíč cache
+    return tuple(sorted(set(terms)))
+
+
+def intersect(postings):
+    """Průnik seřazených seznamů indexů, začíná od nejkratšího"""
+    postings = sorted(postings, key=len)
+    result = postings[0]
+    for other in postings[1:]:
+        if not result:
+            break
+        if len(result) * 16 < len(other):
+            # Krátký seznam proti dlouhému - binární hledání s posouvanou dolní mezí
+            matched = array('I')
+            low, end = 0, len(other)
+            for value in result:
+                low = bisect_left(other, value, low)
+                if low == end:
+                    break
+                if other[low] == value:
+                    matched.append(value)
+            result = matched
+        else:
+            result = array('I', sorted(set(result).intersection(other)))
+    return result
+
+
+class SearchIndex:
+    """Invertovaný index vtipů jednoho záznamu
+
+    Posting listy jsou array('I') seřazených indexů do sekvence vtipů (4 B na výskyt slova
+    ve vtipu), slovník slov je navíc seřazený pro prefixové dotazy přes bisect. Výsledek
+    dotazu je seřazená sekvence indexů, kterou volající nesmí měnit.
+    """
+
+    def __init__(self, jokes, language=None):
+        self.language = language
+        self.size = len(jokes)
+        postings = {}
+        for index, joke in enumerate(jokes):
+            for token in set(tokenize(joke, language)):
+                posting = postings.get(token)
+                if posting is None:
+                    posting = postings[token] = array('I')
+                posting.append(index)
+        self.postings = postings
+        self.terms = sorted(postings)
+        self._match = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._match_terms)
+
+    def extended(self, jokes, start):
+        """Nový index s vtipy jokes[start:] navíc (jokes[:start] jsou vtipy tohoto indexu)
+
+        Tokenizují se jen nové vtipy; posting listy slov, která v nich nejsou, se sdílejí.
+        Nový index má vlastní cache dotazů.
+        """
+        added = {}
+        for index in range(start, len(jokes)):
+            for token in set(tokenize(jokes[index], self.language)):
+                posting = added.get(token)
+                if posting is None:
+                    posting = added[token] = array('I')
+                posting.append(index)
+
+        index = SearchIndex((), self.language)
+        index.size = len(jokes)
+        index.postings = dict(self.postings)
+        for token, posting in added.items():
+            previous = self.postings.get(token)
+            index.postings[token] = previous + posting if previous is not None else posting
+        new_terms = added.keys() - self.postings.keys()
+        index.terms = sorted(self.terms + list(new_terms)) if new_terms else self.terms
+        return index
+
+    def search(self, query):
+        """Vrátí seřazené indexy vtipů, které obsahují všechna slova dotazu (SearchError)"""
+        return self._match(parse_query(query, self.language))
+
+    def _match_terms(self, terms):
+        return intersect([self._posting(term, prefix) for term, prefix in terms])
+
+    def _posting(self, term, prefix):
+        """Posting list slova, u prefixu sjednocení všech slov se stejným začátkem"""
+        if not prefix:
+            return self.postings.get(term, EMPTY)
+        start = bisect_left(self.terms, term)
+        end = bisect_left(self.terms, term + '\U0010ffff', start)
+        if end - start == 1:
+            return self.postings[self.terms[start]]
+        merged = set()
+        for word in self.terms[start:end]:
+            merged.update(self.postings[word])
+        return array('I', sorted(merged))
+
+    def memory(self):
+        """Paměť indexu v bajtech (posting listy, slova, slovník a seřazený seznam slov)"""
+        return (sys.getsizeof(self.postings) + sys.getsizeof(self.terms)
+                + sum(sys.getsizeof(word) + sys.getsizeof(posting) for word, posting in self.postings.items()))
@@ -0,0 +1,136 @@
+"""
+Neopakující se procházení vtipů pro Joker API
+Kurzor prochází pseudonáhodnou permutaci indexů (Feistelova síť s cycle-walkingem),
+takže server si pro klienta nic nepamatuje - token nese seed a pozici, podepsané HMAC,
+aby klient nemohl podvrhnout rozsah permutace
+"""
+import os
+import hmac
+import struct
+import base64
+import hashlib
+import binascii
+
+# Formát tokenu: verze, seed, začátek segmentu, velikost segmentu, pozice v segmentu + podpis
+TOKEN_VERSION = 2
+TOKEN = struct.Struct('<BQIII')
+SIGNATURE_SIZE = 12  # zkrácené HMAC-SHA256
+
+FEISTEL_ROUNDS = 4
+MASK64 = (1 << 64) - 1
+
+
+class CursorError(ValueError):
+    """Neplatný nebo poškozený token kurzoru"""
+
+
+def _mix(value):
+    """Promíchá 64bitové číslo (finalizer ze SplitMix64)"""
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return value ^ (value >> 31)
+
+
+def permute(index, size, key):
+    """Bijekce na rozsahu [0, size) - index na pozici v permutaci určené klíčem"""
+    if size <= 1:
+        return index
+
+    # Vyvážená Feistelova síť nad nejmenší sudou mocninou dvojky >= size
+    bits = max(2, (size - 1).bit_length())
+    bits += bits & 1
+    half = bits // 2
+    mask = (1 << half) - 1
+
+    value = index
+    while True:
+        left, right = value >> half, value & mask
+        for round_number in range(FEISTEL_ROUNDS):
+            round_key = (key + round_number * 0x9E3779B97F4A7C15) & MASK64
+            left, right = right, left ^ (_mix(right ^ round_key) & mask)
+        value = (left << half) | right
+        # Cycle-walking - hodnoty mimo rozsah se permutují znovu, dokud nepadnou do [0, size)
+        if value < size:
+            return value
+
+
+class ShuffleCursor:
+    """Pozice klienta v neopakující se permutaci jednoho seznamu vtipů
+
+    Permutuje se segment [base, base + size). Když korpus mezitím naroste, po vyčerpání
+    segmentu kurzor pokračuje novými vtipy; indexy za koncem zmenšeného korpusu přeskočí.
+    Po vyčerpání celého korpusu začne nový cyklus s jiným seedem. Token je podepsaný klíčem
+    key, takže base a size pochází vždy od serveru.
+    """
+
+    def __init__(self, seed, base, size, position, key=b''):
+        self.seed = seed
+        self.base = base
+        self.size = size
+        self.position = position
+        self.key = key
+
+    @classmethod
+    def new(cls, total, key=b''):
+        """Nový kurzor s náhodným seedem přes celý seznam (key podepisuje token)"""
+        return cls(int.from_bytes(os.urandom(8), 'little'), 0, total, 0, key)
+
+    @classmethod
+    def decode(cls, token, key=b''):
+        """Načte kurzor z tokenu - token s jiným podpisem (jiný klíč, podvržený) se odmítne"""
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            data, signature = raw[:TOKEN.size], raw[TOKEN.size:]
+            version, seed, base, size, position = TOKEN.unpack(data)
+        except (binascii.Error, struct.error, ValueError):
+            raise CursorError('Neplatný token kurzoru')
+        if (version != TOKEN_VERSION or position > size
+                or not hmac.compare_digest(signature, sign(data, key))):
+            raise CursorError('Neplatný token kurzoru')
+        return cls(seed, base, size, position, key)
+
+    def encode(self):
+        """Zakóduje kurzor do podepsaného URL-safe tokenu"""
+        data = TOKEN.pack(TOKEN_VERSION, self.seed, self.base, self.size, self.position)
+        return base64.urlsafe_b64encode(data + sign(data, self.key)).rstrip(b'=').decode('ascii')
+
+    def fits(self, total):
+        """Kurzor patří k seznamu o délce total - permutovaný rozsah nepřesahuje jeho konec
+        (korpus mohl jen narůst); jinak je třeba začít nový"""
+        return self.base + self.size <= total
+
+    def next_index(self, total):
+        """Vrátí další index do seznamu o délce total a posune kurzor
+
+        Indexy za koncem seznamu se přeskakují nejvýše total-krát, pak CursorError
+        (kurzor k seznamu nepatří), aby průchod nemohl trvat neomezeně dlouho.
+        """
+        if total <= 0:
+            raise CursorError('Prázdný seznam vtipů')
+
+        skipped = 0
+        while True:
+            if self.position >= self.size:
+                if total > self.base + self.size:
+                    # Korpus narostl - nejdřív projdeme nové vtipy
+                    self.base += self.size
+                    self.size = total - self.base
+                else:
+                    # Vše vyčerpáno - nový cyklus přes celý seznam
+                    self.seed = _mix(self.seed + 1)
+                    self.base = 0
+                    self.size = total
+                self.position = 0
+
+            index = self.base + permute(self.position, self.size, self.seed)
+            self.position += 1
+            if index < total:
+                return index
+            skipped += 1
+            if skipped >= total:
+                raise CursorError('Kurzor neodpovídá seznamu vtipů')
+
+
+def sign(data, key):
+    """Podpis dat tokenu (zkrácené HMAC-SHA256)"""
+    return hmac.new(key, data, hashlib.sha256).digest()[:SIGNATURE_SIZE]
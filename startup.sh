@@ -1 +1 @@
-gunicorn --bind=0.0.0.0:8000 --timeout 600 app:app
+gunicorn --bind=0.0.0.0:8000 --worker-class gthread --threads 16 --timeout 600 app:app
@@ -0,0 +1,101 @@
+"""
+Streamování vtipů pro Joker API (NDJSON a Server-Sent Events)
+Jedno otevřené spojení místo opakovaného pollingu /joke
+"""
+import time
+import asyncio
+
+from shuffle import ShuffleCursor
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+SSE_MIMETYPE = 'text/event-stream'
+
+# Doporučená prodleva před znovupřipojením SSE klienta po konci streamu (ms)
+SSE_RETRY_MS = 5000
+
+
+def format_joke(body, stream_format):
+    """Zabalí předrenderované JSON tělo vtipu do události streamu"""
+    if stream_format == 'sse':
+        return b'event: joke\ndata: ' + body.rstrip(b'\n') + b'\n\n'
+    return body
+
+
+def format_heartbeat(stream_format):
+    """Heartbeat udržující spojení přes proxy a load balancery"""
+    if stream_format == 'sse':
+        return b': heartbeat\n\n'
+    return b'{"heartbeat":true,"service":"Joker"}\n'
+
+
+def format_end(stream_format, reason):
+    """Závěrečná událost - klient se má připojit znovu"""
+    if stream_format == 'sse':
+        return b'event: end\ndata: {"reason":"' + reason.encode('ascii') + b'"}\n\n'
+    return b'{"end":true,"reason":"' + reason.encode('ascii') + b'","service":"Joker"}\n'
+
+
+def stream_steps(get_bodies, stream_format, interval, heartbeat, max_duration, clock=time.monotonic):
+    """Plán streamu - generuje bytes k odeslání nebo float (kolik sekund čekat)
+
+    Logika je oddělená od čekání, takže ji sdílí synchronní (WSGI) i asyncio (ASGI) stream.
+    get_bodies je volán při každém vtipu, takže stream vidí hot reload korpusu.
+    Vtipy se vybírají kurzorem bez opakování. Stream skončí po max_duration sekundách,
+    aby jedno spojení nedrželo worker neomezeně dlouho.
+    """
+    now = clock()
+    deadline = now + max_duration
+    next_joke = now
+    last_sent = now
+    cursor = None
+
+    if stream_format == 'sse':
+        yield f'retry: {SSE_RETRY_MS}\n\n'.encode('ascii')
+
+    while True:
+        now = clock()
+        if now >= deadline:
+            yield format_end(stream_format, 'max_duration')
+            return
+
+        if now >= next_joke:
+            bodies = get_bodies()
+            if bodies:
+                if cursor is None or not cursor.fits(len(bodies)):
+                    # Korpus se zmenšil - nový cyklus místo přeskakování indexů za koncem
+                    cursor = ShuffleCursor.new(len(bodies))
+                try:
+                    body = bodies[cursor.next_index(len(bodies))]
+                except IndexError:
+                    # Vtip ze zastaralého čtecího snímku (SQLite) - další se vezme už z nového
+                    body = None
+                if body is not None:
+                    yield format_joke(body, stream_format)
+                    last_sent = now
+            next_joke = now + interval
+        elif now - last_sent >= heartbeat:
+            yield format_heartbeat(stream_format)
+            last_sent = now
+
+        wake_up = min(next_joke, last_sent + heartbeat, deadline)
+        if wake_up > now:
+            yield wake_up - now
+
+
+def joke_stream(get_bodies, stream_format, interval, heartbeat, max_duration,
+                clock=time.monotonic, sleep=time.sleep):
+    """Synchronní generátor událostí streamu (WSGI) - čeká přes sleep"""
+    for step in stream_steps(get_bodies, stream_format, interval, heartbeat, max_duration, clock):
+        if isinstance(step, bytes):
+            yield step
+        else:
+            sleep(step)
+
+
+async def joke_stream_async(get_bodies, stream_format, interval, heartbeat, max_duration):
+    """Asynchronní generátor událostí streamu (ASGI) - čekání neblokuje event loop"""
+    for step in stream_steps(get_bodies, stream_format, interval, heartbeat, max_duration):
+        if isinstance(step, bytes):
+            yield step
+        else:
+            await asyncio.sleep(step)
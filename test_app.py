@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Testy Joker API přes in-process Flask test client (bez běžícího serveru)
+Spusť: python -m pytest test_app.py
+"""
+import os
+import json
+import shutil
+
+# Testy nesmí spouštět auto-update ani narážet na rate limit
+os.environ.setdefault('AUTO_UPDATE_ENABLED', 'false')
+
+import app as joker
+from app import app, limiter, load_jokes
+from shuffle import ShuffleCursor
+
+limiter.enabled = False
+client = app.test_client()
+
+
+def test_joke_prerendered_body():
+    """Předrenderovaná odpověď /joke je validní JSON se stejnými poli jako dříve"""
+    response = client.get('/joke?lang=cz&category=normal')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    assert response.headers['X-Content-Type-Options'] == 'nosniff'
+
+    data = json.loads(response.get_data())
+    assert data['success'] is True
+    assert data['language'] == 'cz'
+    assert data['category'] == 'normal'
+    assert data['service'] == 'Joker'
+    assert data['joke'] in load_jokes('cz', 'normal')
+    assert 'timestamp' not in data
+
+
+def test_joke_timestamp_opt_in():
+    """Pole timestamp se přidá jen na vyžádání"""
+    response = client.get('/joke?lang=sk&category=normal&timestamp=true')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['timestamp'].endswith('Z')
+    assert data['joke'] in load_jokes('sk', 'normal')
+
+
+def test_joke_invalid_language():
+    """Neplatný jazyk vrací 400 s bezpečnostními hlavičkami"""
+    response = client.get('/joke?lang=xx')
+    assert response.status_code == 400
+    assert response.get_json()['requested'] == 'xx'
+    assert response.headers['X-Frame-Options'] == 'DENY'
+
+
+def test_joke_formats_negotiation():
+    """format= má přednost před Accept, text/plain a compact nesou jen vtip, výchozí je JSON"""
+    jokes = load_jokes('cz', 'normal')
+    response = client.get('/joke?lang=cz', headers={'Accept': 'text/plain'})
+    assert response.mimetype == 'text/plain'
+    assert response.get_data(as_text=True) in jokes
+
+    for accept in (None, '*/*', 'text/html,application/xhtml+xml,*/*;q=0.8', 'text/plain;q=0.5, application/json'):
+        response = client.get('/joke?lang=cz', headers={'Accept': accept} if accept else {})
+        assert response.mimetype == 'application/json'
+
+    response = client.get('/joke?lang=cz&format=compact', headers={'Accept': 'text/plain'})
+    assert response.mimetype == 'application/json'
+    assert list(response.get_json()) == ['joke'] and response.get_json()['joke'] in jokes
+
+    response = client.get('/joke?lang=cz&format=compact&cursor=new&width=32')
+    assert list(response.get_json()) == ['joke', 'cursor']
+
+
+def test_compact_body_matches_serialization():
+    """Kompaktní tělo vyříznuté z předrenderovaného je stejné jako serializovaný {"joke": ...}"""
+    for joke in ('Prostý vtip', 'Uvozovky "a" \\ lomítko\nnový řádek', '日本語'):
+        body = joker.render_joke_body(joke, 'en-gb', 'explicit')
+        assert joker.compact_body(body, 'en-gb', 'explicit') == joker.render_compact_body(joke)
+        assert json.loads(joker.compact_body(body, 'en-gb', 'explicit')) == {'joke': joke}
+
+
+def test_period_joke_cacheable():
+    """/joke/daily vrací stejný vtip po celý interval s Cache-Control a Expires do jeho konce"""
+    response = client.get('/joke/daily?lang=cz')
+    assert response.status_code == 200
+    assert response.get_data() == client.get('/joke/daily?lang=cz').get_data()
+    data = response.get_json()
+    assert data['joke'] in load_jokes('cz', 'normal') and data['valid_until'].endswith('T00:00:00Z')
+    max_age = int(response.headers['Cache-Control'].split('max-age=')[1])
+    assert response.headers['Cache-Control'].startswith('public') and 0 <= max_age <= 86400
+    assert response.headers['Expires'].endswith('00:00:00 GMT')
+
+    response = client.get('/joke/daily?lang=cz', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304 and response.get_data() == b''
+
+    assert client.get('/joke/hourly?lang=sk&format=text').mimetype == 'text/plain'
+    assert client.get('/joke/weekly').status_code == 404
+    assert client.get('/joke/daily?lang=xx').status_code == 400
+
+
+def test_period_selection_deterministic():
+    """Výběr závisí jen na intervalu, záznamu a počtu vtipů, interval končí na hranici"""
+    assert joker.period_bucket('daily', 86400 * 3 + 5) == (3, 86400 * 4)
+    picks = {joker.period_index(bucket, 'cz', 'normal', 1000) for bucket in range(50)}
+    assert len(picks) > 40 and all(0 <= pick < 1000 for pick in picks)
+    assert joker.period_index(7, 'cz', 'normal', 1000) == joker.period_index(7, 'cz', 'normal', 1000)
+
+
+def test_jokes_batch_distinct():
+    """Dávka vrací navzájem různé vtipy z daného záznamu, omezené počtem dostupných"""
+    response = client.get('/jokes?lang=cz&category=normal&count=5')
+    assert response.status_code == 200
+    data = json.loads(response.get_data())
+    available = load_jokes('cz', 'normal')
+    assert data['count'] == min(5, len(available)) == len(data['jokes'])
+    assert len(set(data['jokes'])) == len(data['jokes'])
+    assert all(joke in available for joke in data['jokes'])
+
+
+def test_jokes_batch_invalid_count():
+    """Neplatný počet vrací 400"""
+    assert client.get('/jokes?count=0').status_code == 400
+    assert client.get('/jokes?count=abc').status_code == 400
+
+
+def test_jokes_batch_weighted_rate_limit():
+    """Dávka se do sdíleného limitu /joke počítá podle počtu vtipů"""
+    limiter.enabled = True
+    limiter.reset()
+    try:
+        for _ in range(200 // joker.BATCH_MAX_COUNT):
+            assert client.get(f'/jokes?count={joker.BATCH_MAX_COUNT}').status_code == 200
+        assert client.get('/joke').status_code == 429
+    finally:
+        limiter.reset()
+        limiter.enabled = False
+
+
+def test_joke_cursor_no_repeats():
+    """Kurzor v /joke projde všechny vtipy bez opakování a vrací token pro další krok"""
+    total = len(load_jokes('cz', 'normal'))
+    seen = []
+    cursor = 'new'
+    for _ in range(total):
+        data = json.loads(client.get(f'/joke?lang=cz&category=normal&cursor={cursor}').get_data())
+        seen.append(data['joke'])
+        cursor = data['cursor']
+    assert sorted(seen) == sorted(load_jokes('cz', 'normal'))
+
+    data = client.get(f'/joke?lang=cz&category=normal&timestamp=true&cursor={cursor}').get_json()
+    assert data['cursor'] and data['timestamp']
+    assert client.get('/joke?cursor=garbage').status_code == 400
+
+
+def test_cursor_token_cannot_hang_worker():
+    """Podvržený token se odmítne, podepsaný kurzor přes delší seznam začne nový cyklus"""
+    assert client.get('/joke?cursor=ATkwAAAAAAAAGPz_______8AAAAA').status_code == 400
+    assert client.get('/jokes?cursor=ATkwAAAAAAAAGPz_______8AAAAA').status_code == 400
+    token = ShuffleCursor(1, 2 ** 32 - 2, 2 ** 32 - 1, 0, joker.CURSOR_KEY).encode()
+    for url in (f'/joke?cursor={token}', f'/jokes?count=3&cursor={token}'):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert ShuffleCursor.decode(response.get_json()['cursor'], joker.CURSOR_KEY).base == 0
+
+
+def test_stream_generator_heartbeat_and_end():
+    """Stream posílá vtipy v intervalu, heartbeat mezi nimi a končí po max_duration"""
+    from streaming import joke_stream
+
+    now = [0.0]
+    bodies = joker.load_joke_bodies('cz', 'normal')
+    events = list(joke_stream(lambda: bodies, 'sse', interval=20, heartbeat=7, max_duration=45,
+                              clock=lambda: now[0],
+                              sleep=lambda seconds: now.__setitem__(0, now[0] + seconds)))
+
+    assert events[0].startswith(b'retry:')
+    kinds = [event.split(b'\n')[0] for event in events[1:]]
+    assert kinds == [b'event: joke', b': heartbeat', b': heartbeat', b'event: joke',
+                     b': heartbeat', b': heartbeat', b'event: joke', b'event: end']
+
+
+def test_stream_invalid_interval():
+    """Příliš krátký interval se odmítne dřív, než se obsadí slot streamu"""
+    assert client.get('/stream?interval=0.01').status_code == 400
+    assert client.get('/stream?interval=abc').status_code == 400
+
+
+def test_metadata_etag_and_304():
+    """Metadata endpointy posílají ETag a Cache-Control, shodný If-None-Match vrací 304"""
+    for url in ('/', '/languages', '/categories', '/stats'):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'].startswith('public')
+        etag = response.headers['ETag']
+
+        cached = client.get(url, headers={'If-None-Match': etag})
+        assert cached.status_code == 304
+        assert cached.get_data() == b''
+        assert cached.headers['ETag'] == etag
+
+        assert client.get(url, headers={'If-None-Match': '"jiny"'}).status_code == 200
+
+
+def test_hot_reload_swaps_only_changed_entries(tmp_path, monkeypatch):
+    """Změna jednoho souboru přenačte jen jeho záznam a zvýší generaci snímku"""
+    shutil.copytree('jokes', tmp_path / 'jokes')
+    monkeypatch.setattr(joker, 'CORPUS_FILE', '')
+    monkeypatch.chdir(tmp_path)
+    try:
+        joker.reload_jokes()
+        before = joker.corpus_snapshot
+        stats_etag = client.get('/stats').headers['ETag']
+
+        with open(tmp_path / 'jokes' / 'sk_normal.txt', 'a', encoding='utf-8') as f:
+            f.write('\n\nNový vtip\nna dva řádky.\n')
+        os.utime(tmp_path / 'jokes' / 'sk_normal.txt', ns=(1, 1))
+
+        assert joker.reload_jokes() == ['sk_normal']
+        after = joker.corpus_snapshot
+        assert after.generation == before.generation + 1
+        assert load_jokes('sk', 'normal')[-1] == 'Nový vtip\nna dva řádky.'
+        assert after.jokes['cz_normal'] is before.jokes['cz_normal']
+        assert client.get('/health').get_json()['generation'] == after.generation
+
+        # Reload zneplatní cache metadat - /stats má nový obsah i ETag
+        stats = client.get('/stats', headers={'If-None-Match': stats_etag})
+        assert stats.status_code == 200
+        assert stats.headers['ETag'] != stats_etag
+        assert stats.get_json()['jokes_per_language']['sk']['normal'] == len(load_jokes('sk', 'normal'))
+
+        # Bez změn se snímek nevymění
+        assert joker.reload_jokes() == []
+        assert joker.corpus_snapshot is after
+    finally:
+        monkeypatch.undo()
+        joker.reload_jokes()
+
+
+def test_create_app_factory():
+    """Továrna sestaví další aplikaci nad stejným korpusem bez spouštění služeb workeru"""
+    from config import TestingConfig
+
+    generation = joker.corpus_snapshot.generation
+    test_app = joker.create_app(TestingConfig, start_services=False)
+    assert test_app is not app
+    assert test_app.config['TESTING'] is True
+    assert set(test_app.view_functions) == set(app.view_functions)
+    assert joker.corpus_snapshot.generation == generation
+
+    response = test_app.test_client().get('/joke?lang=en-gb&category=normal')
+    assert response.status_code == 200
+    assert response.get_json()['joke'] in load_jokes('en-gb', 'normal')
+    assert response.headers['X-Content-Type-Options'] == 'nosniff'
+    assert test_app.test_client().get('/nic').status_code == 404
+
+
+def test_create_app_applies_config():
+    """Předaná konfigurace platí i pro nastavení procesu - jiné šířky tisku korpus sestaví znovu"""
+    from config import TestingConfig
+
+    class NarrowConfig(TestingConfig):
+        PRINT_WIDTHS = [20]
+        BATCH_MAX_COUNT = 2
+
+    generation = joker.corpus_snapshot.generation
+    try:
+        narrow = joker.create_app(NarrowConfig, start_services=False).test_client()
+        assert joker.BATCH_MAX_COUNT == 2
+        assert joker.corpus_snapshot.generation == generation + 1
+        assert set(joker.corpus_snapshot.texts['cz_normal']) == {20, None}
+        assert narrow.get('/joke?format=text&width=20').status_code == 200
+        assert narrow.get('/joke?format=text&width=32').status_code == 400
+    finally:
+        joker.create_app(TestingConfig, start_services=False)
+    assert joker.PRINT_WIDTHS == TestingConfig.PRINT_WIDTHS
+    assert set(joker.corpus_snapshot.texts['cz_normal']) == set(TestingConfig.PRINT_WIDTHS) | {None}
+
+    # Stejná konfigurace korpus nepřestavuje
+    generation = joker.corpus_snapshot.generation
+    joker.create_app(TestingConfig, start_services=False)
+    assert joker.corpus_snapshot.generation == generation
+
+
+def test_worker_services_use_app_config(tmp_path, monkeypatch):
+    """Služby workeru (log, hot reload, health, metriky) a měření fází berou nastavení z konfigurace aplikace"""
+    from config import TestingConfig
+
+    class ServiceConfig(TestingConfig):
+        LOG_DIR = str(tmp_path)
+        LOG_MODE = 'sync'
+        LOG_MAX_BYTES = 1234
+        LOG_BACKUP_COUNT = 2
+        JOKES_RELOAD_INTERVAL = 0
+        HEALTH_CHECK_INTERVAL = 7
+        METRICS_ENABLED = False
+        METRICS_DIR = str(tmp_path)
+        PHASE_TIMING = True
+
+    calls = {}
+
+    def record(name, result=None):
+        def init(*args, **kwargs):
+            calls[name] = (args, kwargs)
+            return result
+        return init
+
+    class Idle:
+        running = False
+        start = stop = lambda self: None
+
+    monkeypatch.setattr(joker, 'init_log_pipeline', record('log'))
+    monkeypatch.setattr(joker, 'init_corpus_watcher', record('watcher', Idle()))
+    monkeypatch.setattr(joker, 'init_auto_updater', record('updater'))
+    monkeypatch.setattr(joker, 'init_health_monitor', record('health'))
+    monkeypatch.setattr(joker, 'init_metrics', record('metrics'))
+    monkeypatch.setattr(joker, 'get_profiler', lambda: Idle())
+    monkeypatch.setattr(joker, 'services_pid', None)
+    monkeypatch.setattr(joker, 'metrics', joker.metrics)
+    try:
+        timed = joker.create_app(ServiceConfig, start_services=False)
+        assert 'Server-Timing' in timed.test_client().get('/joke').headers
+        joker.start_worker_services(timed)
+    finally:
+        joker.create_app(TestingConfig, start_services=False)
+    assert not joker.PHASE_TIMING
+
+    args, kwargs = calls['log']
+    assert args[1] == os.path.join(str(tmp_path), 'joker.log')
+    assert (kwargs['mode'], kwargs['max_bytes'], kwargs['backup_count']) == ('sync', 1234, 2)
+    assert calls['watcher'][0][1] == 0
+    assert calls['health'][0][1] == 7
+    assert calls['metrics'][1]['enabled'] is False
+    assert calls['metrics'][1]['directory'] == str(tmp_path)
+
+
+def test_gunicorn_binary_upgrade(monkeypatch):
+    """Nový master z binárního upgradu (SIGUSR2) po startu ukončí předchozí master"""
+    import runpy
+    import signal
+
+    monkeypatch.setattr(joker, 'services_deferred', joker.services_deferred)
+    conf = runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py'))
+    kills = []
+    monkeypatch.setattr(os, 'kill', lambda pid, sig: kills.append((pid, sig)))
+    monkeypatch.setattr('gc.freeze', lambda: None)
+
+    class Server:
+        log = joker.logger
+        master_pid = 0
+
+    conf['when_ready'](Server())
+    assert kills == []
+    Server.master_pid = 4321
+    conf['when_ready'](Server())
+    assert kills == [(4321, signal.SIGTERM)]
+
+
+if __name__ == '__main__':
+    import pytest
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Testy ASGI vstupu (asgi.py) - volání aplikace přímo přes scope/receive/send
+Spusť: python -m pytest test_asgi.py
+"""
+import os
+import json
+import asyncio
+
+os.environ.setdefault('AUTO_UPDATE_ENABLED', 'false')
+
+import asgi
+import app as joker
+from app import app, limiter, load_jokes
+
+limiter.enabled = False
+client = app.test_client()
+
+
+def call(path, query='', headers=()):
+    """Zavolá ASGI aplikaci, vrátí (status, hlavičky, tělo)"""
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': path, 'root_path': '', 'scheme': 'http',
+        'query_string': query.encode('latin-1'), 'http_version': '1.1',
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+        'client': ('127.0.0.1', 50000), 'server': ('localhost', 8000),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(asgi.app(scope, receive, send))
+    start = messages[0]
+    headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in start['headers']}
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    return start['status'], headers, body
+
+
+def test_joke_matches_flask():
+    """Nativní /joke vrací stejná pole a hlavičky jako Flask"""
+    status, headers, body = call('/joke', 'lang=cz&category=normal')
+    flask_response = client.get('/joke?lang=cz&category=normal')
+    assert status == 200
+    assert headers['content-type'] == flask_response.headers['Content-Type']
+    assert headers['x-content-type-options'] == 'nosniff'
+    assert headers['access-control-allow-origin'] == '*'
+
+    data = json.loads(body)
+    assert data.keys() == json.loads(flask_response.get_data()).keys()
+    assert data['joke'] in load_jokes('cz', 'normal')
+
+
+def test_errors_delegated_to_flask():
+    """Neplatné parametry a ostatní endpointy zpracuje Flask se shodným výstupem"""
+    for path, query in (('/joke', 'lang=xx'), ('/jokes', 'count=0'), ('/joke', 'cursor=garbage'),
+                        ('/joke', 'max_length=abc'), ('/joke', 'max_length=1'),
+                        ('/stream', 'interval=abc'), ('/neexistuje', '')):
+        status, _, body = call(path, query)
+        flask_response = client.get(f'{path}?{query}')
+        assert status == flask_response.status_code
+        assert json.loads(body) == flask_response.get_json()
+
+    status, _, body = call('/health')
+    assert status == 200 and json.loads(body)['status'] == 'healthy'
+
+
+def test_joke_formats_native():
+    """Text a compact obsluhuje ASGI nativně se stejným výstupem jako Flask"""
+    status, headers, body = call('/joke', 'lang=sk&width=32', headers=(('Accept', 'text/plain'),))
+    assert status == 200 and headers['content-type'] == 'text/plain; charset=utf-8'
+    assert body in list(joker.corpus_snapshot.texts['sk_normal'][32])
+
+    status, headers, body = call('/joke', 'lang=cz&format=text&cursor=new')
+    assert 'x-cursor' in headers and body.decode('utf-8') in load_jokes('cz', 'normal')
+
+    status, headers, body = call('/joke', 'lang=cz&format=compact')
+    assert headers['content-type'] == 'application/json' and list(json.loads(body)) == ['joke']
+
+    for query in ('format=xml', 'width=7'):
+        status, _, body = call('/joke', query)
+        assert status == 400 and json.loads(body) == client.get(f'/joke?{query}').get_json()
+
+
+def test_period_joke_native():
+    """Vtip intervalu v ASGI je shodný s Flaskem včetně ETagu a 304"""
+    status, headers, body = call('/joke/daily', 'lang=sk')
+    flask_response = client.get('/joke/daily?lang=sk')
+    assert status == 200 and body == flask_response.get_data()
+    assert headers['etag'] == flask_response.headers['ETag'] and headers['expires'] == flask_response.headers['Expires']
+    status, _, body = call('/joke/daily', 'lang=sk', headers=[('If-None-Match', headers['etag'])])
+    assert status == 304 and body == b''
+
+
+def test_health_probes_native():
+    """Liveness a readiness odpovídá ASGI přímo, tělo readiness je shodné s Flaskem"""
+    status, headers, body = call('/health/live')
+    assert status == 200 and json.loads(body)['status'] == 'alive'
+    status, headers, body = call('/health/ready')
+    assert status == 200 and body == client.get('/health/ready').get_data()
+
+
+def test_jokes_batch_and_cursor():
+    """Dávka a kurzor fungují i na nativní cestě"""
+    status, _, body = call('/jokes', 'lang=cz&category=normal&count=3&cursor=new')
+    data = json.loads(body)
+    assert status == 200
+    assert data['count'] == len(data['jokes']) and data['cursor']
+
+
+def test_metadata_etag_and_origin():
+    """Metadata sdílí ETag s Flaskem a CORS kopíruje Origin stejně jako flask-cors"""
+    status, headers, body = call('/stats', headers=[('Origin', 'https://example.com')])
+    assert status == 200
+    assert headers['etag'] == client.get('/stats').headers['ETag']
+    assert headers['access-control-allow-origin'] == 'https://example.com'
+    assert headers['vary'] == 'Origin'
+    assert json.loads(body) == client.get('/stats').get_json()
+
+    status, _, body = call('/stats', headers=[('If-None-Match', headers['etag'])])
+    assert status == 304 and body == b''
+
+    status, headers, body = call('/', headers=[('Accept-Encoding', 'gzip')])
+    flask_response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert headers['content-encoding'] == 'gzip' and headers['etag'] == flask_response.headers['ETag']
+    assert body == flask_response.get_data()
+
+
+def test_shared_rate_limit():
+    """Nativní cesta počítá do stejného limitu jako Flask-Limiter"""
+    limiter.enabled = True
+    limiter.reset()
+    try:
+        for _ in range(200 // joker.BATCH_MAX_COUNT):
+            assert call('/jokes', f'count={joker.BATCH_MAX_COUNT}')[0] == 200
+        assert client.get('/joke').status_code == 429
+        status, _, body = call('/joke')
+        assert status == 429
+        assert json.loads(body)['error'] == 'Příliš mnoho požadavků'
+    finally:
+        limiter.reset()
+        limiter.enabled = False
+
+
+def test_fallback_not_charged_twice(monkeypatch):
+    """Požadavek, který nativní cesta započítala a pak předala Flasku, se do limitu nepočítá znovu"""
+    item = asgi.JOKE_LIMIT.item
+
+    def remaining():
+        return limiter.limiter.get_window_stats(item, '127.0.0.1', 'joke')[1]
+
+    joke_response = joker.joke_response
+
+    def stale_once(*args, **kwargs):
+        monkeypatch.setattr(joker, 'joke_response', joke_response)
+        raise asgi.StaleView('snímek zavřen')
+
+    limiter.enabled = True
+    limiter.reset()
+    try:
+        monkeypatch.setattr(joker, 'joke_response', stale_once)
+        assert call('/joke')[0] == 200
+        assert remaining() == item.amount - 1
+
+        for _ in range(item.amount - 1):
+            assert call('/joke')[0] == 200
+        status, _, body = call('/joke')
+        assert status == 429 and json.loads(body)['error'] == 'Příliš mnoho požadavků'
+        assert limiter.limiter.storage.get(item.key_for('127.0.0.1', 'joke')) == item.amount + 1
+    finally:
+        limiter.reset()
+        limiter.enabled = False
+
+
+def test_native_routes_recorded_in_metrics():
+    """Nativně obsluhované požadavky se započítají do metrik pod jménem Flask endpointu"""
+    if joker.metrics is None:
+        return
+    before = joker.metrics.render().decode('utf-8')
+    call('/jokes', 'lang=cz&count=1')
+    after = joker.metrics.render().decode('utf-8')
+    line = 'joker_request_duration_seconds_count{route="get_jokes"} '
+
+    def count(text):
+        return int(text.split(line)[1].split()[0]) if line in text else 0
+    assert count(after) == count(before) + 1
+
+
+if __name__ == '__main__':
+    import pytest
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -4,7 +4,9 @@ Test script pro auto-update funkčnost
 """
 import sys
 import os
-from auto_update import AutoUpdater
+import subprocess
+import auto_update
+from auto_update import AutoUpdater, classify_changes
 import logging
 
 # Nastavení loggingu
@@ -69,6 +71,94 @@ def test_auto_updater():
     print("✅ Všechny testy dokončeny!")
     return True
 
+def git(repo, *args):
+    return subprocess.run(['git', '-C', str(repo), '-c', 'user.name=Test', '-c', 'user.email=test@example.com',
+                           *args], capture_output=True, text=True, check=True).stdout.strip()
+
+
+def commit_file(repo, path, text):
+    """Zapíše soubor v pracovní kopii, commitne a pushne do origin"""
+    (repo / path).parent.mkdir(exist_ok=True)
+    (repo / path).write_text(text, encoding='utf-8')
+    git(repo, 'add', path)
+    git(repo, 'commit', '-q', '-m', f'Změna {path}')
+    git(repo, 'push', '-q', 'origin', f'HEAD:{auto_update.GIT_BRANCH}')
+
+
+def test_classify_changes():
+    """Kroky aktualizace podle změněných souborů"""
+    assert classify_changes(['jokes/cz_normal.txt', 'README.md']) == {'reload'}
+    assert classify_changes(['app.py', 'jokes/sk_normal.txt']) == {'reload', 'restart'}
+    assert classify_changes(['requirements.txt']) == {'install', 'restart'}
+    assert classify_changes(['CHANGELOG.md']) == set()
+
+
+def test_single_leader(tmp_path):
+    """Zámek drží jediný proces, po uvolnění ho převezme další"""
+    lock = str(tmp_path / 'update.lock')
+    first, second = AutoUpdater(lock_path=lock), AutoUpdater(lock_path=lock)
+    assert first._acquire_leadership()
+    assert not second._acquire_leadership()
+    assert second.get_status()['role'] == 'follower'
+    first._release_leadership()
+    assert second._acquire_leadership()
+    second._release_leadership()
+
+
+def test_update_by_changed_files(tmp_path, monkeypatch):
+    """Změna vtipů se jen přenačte, změna kódu restartuje, requirements.txt se instaluje"""
+    origin, work, deploy = tmp_path / 'origin.git', tmp_path / 'work', tmp_path / 'deploy'
+    subprocess.run(['git', 'init', '-q', '--bare', str(origin)], check=True)
+    subprocess.run(['git', 'clone', '-q', str(origin), str(work)], check=True, capture_output=True)
+    commit_file(work, 'jokes/cz_normal.txt', 'První vtip\n')
+    subprocess.run(['git', 'clone', '-q', '-b', auto_update.GIT_BRANCH, str(origin), str(deploy)], check=True)
+
+    monkeypatch.setattr(auto_update, 'RESTART_DELAY', 0)
+    events = []
+    updater = AutoUpdater(reload=lambda: events.append('reload') or ['cz_normal'], repo_dir=str(deploy))
+    monkeypatch.setattr(updater, '_restart_application', lambda: events.append('restart'))
+    monkeypatch.setattr(updater, '_install_requirements', lambda: events.append('install'))
+
+    updater._run_check()
+    assert events == []
+    assert updater.current_commit == git(work, 'rev-parse', 'HEAD')
+
+    commit_file(work, 'jokes/cz_normal.txt', 'První vtip\n\nDruhý vtip\n')
+    updater._run_check()
+    assert events == ['reload']
+    assert (deploy / 'jokes' / 'cz_normal.txt').read_text(encoding='utf-8').endswith('Druhý vtip\n')
+    assert updater.get_status()['last_update']['actions'] == ['reload']
+
+    commit_file(work, 'README.md', 'Dokumentace\n')
+    updater._run_check()
+    assert events == ['reload']
+
+    commit_file(work, 'requirements.txt', 'flask\n')
+    updater._run_check()
+    assert events == ['reload', 'install', 'restart']
+    assert updater.current_commit == git(deploy, 'rev-parse', 'HEAD') == git(work, 'rev-parse', 'HEAD')
+
+
+def test_restart_signal_by_preload(monkeypatch):
+    """S preload_app se nový kód načte binárním upgradem (SIGUSR2), bez něj SIGHUP"""
+    import signal
+
+    kills = []
+    monkeypatch.setattr(os, 'kill', lambda pid, sig: kills.append((pid, sig)))
+    monkeypatch.setenv('GUNICORN_PROCESS', '1')
+    updater = AutoUpdater()
+
+    for mode, expected in (('upgrade', signal.SIGUSR2), ('reload', signal.SIGHUP)):
+        monkeypatch.setenv('GUNICORN_RESTART', mode)
+        updater._restart_application()
+        assert kills.pop() == (os.getppid(), expected)
+
+    # Bez gunicorn.conf.py nelze preload poznat - restart se odmítne
+    monkeypatch.delenv('GUNICORN_RESTART')
+    updater._restart_application()
+    assert kills == []
+
+
 if __name__ == '__main__':
     try:
         success = test_auto_updater()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Testy zkompilovaného korpusu vtipů (corpus.py)
+Spusť: python -m pytest test_corpus.py
+"""
+import os
+import random
+
+import pytest
+
+from config import Config
+from corpus import MappedCorpus, CorpusError, compile_corpus, parse_jokes
+
+
+def load_txt(language, category):
+    """Načte vtipy přímo z TXT souboru (referenční výsledek)"""
+    filename = os.path.join(Config.JOKES_DIR, f"{language}_{category}.txt")
+    with open(filename, 'r', encoding='utf-8') as f:
+        return parse_jokes(f.read())
+
+
+def test_compile_roundtrip(tmp_path):
+    """Zkompilovaný korpus vrací stejné vtipy ve stejném pořadí jako TXT soubory"""
+    output = str(tmp_path / 'jokes.corpus')
+    counts = compile_corpus(Config.JOKES_DIR, output,
+                            Config.SUPPORTED_LANGUAGES, Config.SUPPORTED_CATEGORIES)
+
+    corpus = MappedCorpus(output)
+    try:
+        assert corpus.verify()
+        for lang in Config.SUPPORTED_LANGUAGES:
+            for cat in Config.SUPPORTED_CATEGORIES:
+                expected = load_txt(lang, cat)
+                jokes = corpus.get(lang, cat)
+                assert counts[(lang, cat)] == len(expected)
+                assert list(jokes) == expected
+                assert random.choice(jokes) in expected
+        assert corpus.get('xx', 'normal') is None
+    finally:
+        corpus.close()
+
+
+def test_multiline_jokes(tmp_path):
+    """Víceřádkové vtipy a chybějící soubory podle JOKE_FORMAT.md"""
+    jokes_dir = tmp_path / 'jokes'
+    jokes_dir.mkdir()
+    (jokes_dir / 'cz_normal.txt').write_text(
+        'Co je to zelený?\nOkurka.\n\nProč hroši?\nBřicho.\n\n\n', encoding='utf-8')
+    output = str(tmp_path / 'jokes.corpus')
+    compile_corpus(str(jokes_dir), output, ['cz'], ['normal', 'explicit'])
+
+    corpus = MappedCorpus(output)
+    try:
+        assert list(corpus.get('cz', 'normal')) == ['Co je to zelený?\nOkurka.', 'Proč hroši?\nBřicho.']
+        assert corpus.get('cz', 'normal')[-1] == 'Proč hroši?\nBřicho.'
+        assert list(corpus.get('cz', 'normal').encoded()) == ['Co je to zelený?\nOkurka.'.encode('utf-8'),
+                                                              'Proč hroši?\nBřicho.'.encode('utf-8')]
+        assert len(corpus.get('cz', 'explicit')) == 0
+        with pytest.raises(IndexError):
+            corpus.get('cz', 'normal')[2]
+    finally:
+        corpus.close()
+
+
+def test_invalid_file(tmp_path):
+    """Soubor, který není korpus, se odmítne"""
+    path = tmp_path / 'broken.corpus'
+    path.write_bytes(b'x' * 64)
+    with pytest.raises(CorpusError):
+        MappedCorpus(str(path))
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Testy liveness a readiness (health.py, /health/live, /health/ready)
+Spusť: python -m pytest test_health.py
+"""
+import os
+import json
+
+import pytest
+
+os.environ.setdefault('AUTO_UPDATE_ENABLED', 'false')
+
+import app as joker
+from app import app, limiter
+from corpus import CorpusSnapshot
+from health import HealthMonitor, get_health_monitor
+
+limiter.enabled = False
+client = app.test_client()
+
+
+def test_live_and_ready():
+    """Liveness je pevná odpověď, readiness pokrývá všechny záznamy korpusu"""
+    response = client.get('/health/live')
+    assert response.status_code == 200 and response.get_json()['status'] == 'alive'
+    assert response.headers['Cache-Control'] == 'no-store'
+
+    response = client.get('/health/ready')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['status'] == 'ready' and data['empty_entries'] == []
+    assert set(data['entries']) == {f'{lang}_{cat}' for lang in joker.SUPPORTED_LANGUAGES
+                                    for cat in joker.SUPPORTED_CATEGORIES}
+    assert data['generation'] == joker.corpus_snapshot.generation
+
+
+def test_ready_served_from_snapshot():
+    """Sonda vrací hotové tělo poslední kontroly, nepočítá stav znovu"""
+    monitor = get_health_monitor()
+    assert monitor is not None and monitor.running
+    first = client.get('/health/ready').get_data()
+    assert client.get('/health/ready').get_data() == first == monitor.result[3]
+
+
+def test_not_ready_when_entry_empty(monkeypatch):
+    """Prázdný záznam (i jiný než cz_normal) znamená 503, /health zůstává kompatibilní"""
+    current = joker.corpus_snapshot
+    jokes = dict(current.jokes, sk_explicit=[])
+    monkeypatch.setattr(joker, 'corpus_snapshot', CorpusSnapshot(current.generation, jokes, current.bodies,
+                                                                 current.signatures))
+    monitor = get_health_monitor()
+    try:
+        monitor.refresh()
+        response = client.get('/health/ready')
+        assert response.status_code == 503
+        assert response.get_json()['empty_entries'] == ['sk_explicit']
+
+        response = client.get('/health')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['status'] == 'healthy' and data['ready'] is False
+        assert {'service', 'timestamp', 'version', 'cache_size', 'generation'} <= data.keys()
+    finally:
+        monkeypatch.undo()
+        monitor.refresh()
+
+
+def test_health_served_from_monitor(monkeypatch):
+    """/health bere stav z poslední kontroly na pozadí - na korpus nesahá"""
+    monitor = get_health_monitor()
+    monitor.refresh()
+    monkeypatch.setattr(joker, 'load_jokes', lambda *args: pytest.fail('/health načítá korpus'))
+    monkeypatch.setattr(joker, 'health_check', lambda: pytest.fail('/health skládá stav'))
+    data = client.get('/health').get_json()
+    assert data['status'] == 'healthy' and data['checked_at'] == monitor.result[1]['checked_at']
+
+    checked, status, code, body = monitor.result
+    monkeypatch.setattr(monitor, 'result', (checked - 60, status, code, body))
+    response = client.get('/health')
+    assert response.status_code == 503 and response.get_json()['status'] == 'unhealthy'
+
+
+def test_monitor_stale_and_failing_check():
+    """Zaseknutá kontrola vrací 503, výjimka v kontrole se hlásí jako not_ready"""
+    monitor = HealthMonitor(lambda: {'ready': True}, interval=5)
+    monitor.running = True
+    monitor.refresh()
+    assert monitor.readiness()[0] == 200
+    checked, status, code, body = monitor.result
+    monitor.result = (checked - 60, status, code, body)
+    code, body = monitor.readiness()
+    assert code == 503 and json.loads(body)['status'] == 'not_ready'
+
+    def broken():
+        raise RuntimeError('korpus nedostupný')
+
+    monitor = HealthMonitor(broken, interval=0)
+    code, body = monitor.readiness()
+    assert code == 503 and json.loads(body)['error'] == 'korpus nedostupný'
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Testy přidávání vtipů přes /admin/jokes a logu přidaných vtipů (ingest.py)
+Spusť: python -m pytest test_ingest.py
+"""
+import os
+import json
+import threading
+
+import pytest
+
+os.environ.setdefault('AUTO_UPDATE_ENABLED', 'false')
+
+import app as joker
+from app import app, limiter, load_jokes
+from config import Config
+from ingest import BatchTooLarge, IngestError, IngestLog, parse_ndjson
+from jokestore import JokeStore, StoreView, import_dir
+
+limiter.enabled = False
+client = app.test_client()
+
+KEY = 'tajny-klic'
+AUTH = {'Authorization': f'Bearer {KEY}'}
+LANGUAGES = Config.SUPPORTED_LANGUAGES
+CATEGORIES = Config.SUPPORTED_CATEGORIES
+
+
+def ndjson(*records):
+    return '\n'.join(json.dumps(record, ensure_ascii=False) for record in records) + '\n'
+
+
+@pytest.fixture
+def ingest(tmp_path, monkeypatch):
+    """Log v dočasném adresáři; snímek korpusu se po testu vrátí"""
+    monkeypatch.setattr(joker, 'ADMIN_API_KEY', KEY)
+    monkeypatch.setattr(joker, 'ingest_log', IngestLog(str(tmp_path / 'ingest.log')))
+    monkeypatch.setattr(joker, 'ingest_position', None)
+    monkeypatch.setattr(joker, 'ingested', {})
+    monkeypatch.setattr(joker, 'corpus_snapshot', joker.corpus_snapshot)
+    return joker.ingest_log
+
+
+def test_parse_ndjson():
+    """Celá dávka se ověří, chyba nese číslo řádku, prázdné řádky se přeskočí"""
+    lines = [b'{"language": "SK", "joke": "Vtip\\r\\nna dva \\u0159\\u00e1dky. "}\n', b'\n',
+             b'{"joke": "Druh\\u00fd"}\n']
+    assert parse_ndjson(lines, LANGUAGES, CATEGORIES, 10) == [('sk', 'normal', 'Vtip\nna dva řádky.'),
+                                                              ('cz', 'normal', 'Druhý')]
+    for bad in (b'{"joke": "A\\n\\nB"}', b'{"joke": "A", "language": "de"}', b'[1]', b'{"joke": '):
+        with pytest.raises(IngestError, match='Řádek 2'):
+            parse_ndjson([lines[0], bad], LANGUAGES, CATEGORIES, 10)
+    with pytest.raises(BatchTooLarge):
+        parse_ndjson(lines, LANGUAGES, CATEGORIES, 1)
+    with pytest.raises(IngestError):
+        parse_ndjson([b'\n'], LANGUAGES, CATEGORIES, 10)
+
+
+def test_log_group_commit(tmp_path, monkeypatch):
+    """Souběžné zápisy sdílejí fsync, čtení vrací jen celé řádky od své pozice"""
+    log = IngestLog(str(tmp_path / 'ingest.log'))
+    syncs = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, 'fsync', lambda fd: (syncs.append(fd), fsync(fd)))
+
+    threads = [threading.Thread(target=lambda n=n: [log.append([('cz', 'normal', f'Vtip {n}-{i}')])
+                                                    for i in range(20)]) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert 0 < len(syncs) <= 160
+
+    records, position = log.read()
+    assert sorted(joke for _, _, joke in records) == sorted(f'Vtip {n}-{i}' for n in range(8) for i in range(20))
+    with open(log.path, 'ab') as f:
+        f.write(b'{"language":"cz","category":"normal","jo')
+    assert log.read(position) == ([], position)
+
+
+def test_compact_into_txt(tmp_path, monkeypatch):
+    """Kompaktace připíše vtipy za obsah TXT, opakování po pádu je nezdvojí, log začne znovu"""
+    jokes_dir = tmp_path / 'jokes'
+    jokes_dir.mkdir()
+    (jokes_dir / 'cz_normal.txt').write_text('První vtip.\n\nDruhý\nvtip.\n\n', encoding='utf-8')
+    log = IngestLog(str(tmp_path / 'ingest.log'))
+    log.append([('cz', 'normal', 'Třetí vtip.'), ('sk', 'explicit', 'Nový\nvtip.')])
+    _, position = log.read()
+
+    # Pád před výměnou logu - TXT soubory jsou zapsané, značka zůstala
+    replace = os.replace
+
+    def crash(src, dst):
+        if dst == log.path:
+            raise KeyboardInterrupt
+        replace(src, dst)
+
+    monkeypatch.setattr(os, 'replace', crash)
+    with pytest.raises(KeyboardInterrupt):
+        log.compact(str(jokes_dir))
+    monkeypatch.setattr(os, 'replace', replace)
+    assert os.path.exists(log.marker_path)
+    # Mezitím přidaný vtip se při dokončení zapíše, už zapsané ne
+    log.append([('cz', 'normal', 'Třetí vtip.')])
+
+    assert log.compact(str(jokes_dir)) == {('cz', 'normal'): 1, ('sk', 'explicit'): 0}
+    assert (jokes_dir / 'cz_normal.txt').read_text(encoding='utf-8') == \
+        'První vtip.\n\nDruhý\nvtip.\n\nTřetí vtip.\n\nTřetí vtip.\n'
+    assert (jokes_dir / 'sk_explicit.txt').read_text(encoding='utf-8') == 'Nový\nvtip.\n'
+    assert os.path.getsize(log.path) == 0 and log.read(position) == ([], (os.stat(log.path).st_ino, 0))
+    assert not os.path.exists(log.marker_path)
+
+    # Zapisovatel s deskriptorem starého logu píše do nového
+    log.append([('cz', 'normal', 'Čtvrtý vtip.')])
+    assert log.read()[0] == [('cz', 'normal', 'Čtvrtý vtip.')]
+
+
+def test_compact_keeps_repeated_jokes(tmp_path):
+    """Přidaný vtip shodný s koncem TXT se při kompaktaci nezahodí"""
+    jokes_dir = tmp_path / 'jokes'
+    jokes_dir.mkdir()
+    (jokes_dir / 'cz_normal.txt').write_text('První vtip.\n', encoding='utf-8')
+    log = IngestLog(str(tmp_path / 'ingest.log'))
+    log.append([('cz', 'normal', 'První vtip.')])
+    assert log.compact(str(jokes_dir)) == {('cz', 'normal'): 1}
+    assert (jokes_dir / 'cz_normal.txt').read_text(encoding='utf-8') == 'První vtip.\n\nPrvní vtip.\n'
+
+
+def test_admin_requires_key(monkeypatch):
+    """Bez ADMIN_API_KEY je endpoint vypnutý, špatný klíč vrací 401"""
+    response = client.post('/admin/jokes', json={'joke': 'Vtip'})
+    assert response.status_code == 403
+
+    monkeypatch.setattr(joker, 'ADMIN_API_KEY', KEY)
+    for headers in ({}, {'Authorization': 'Bearer spatny'}, {'Authorization': KEY}):
+        response = client.post('/admin/jokes', json={'joke': 'Vtip'}, headers=headers)
+        assert response.status_code == 401 and response.headers['WWW-Authenticate'] == 'Bearer'
+    assert client.get('/admin/jokes', headers=AUTH).status_code == 405
+
+
+def test_admin_ingest_incremental(ingest):
+    """Vtipy se připojí k záznamu bez čtení TXT, ostatní záznamy a indexy zůstávají stejné"""
+    before = joker.corpus_snapshot
+    response = client.post('/admin/jokes', data=ndjson(
+        {'language': 'sk', 'joke': 'Žirafa vejde\ndo baru.'},
+        {'language': 'sk', 'category': 'explicit', 'joke': 'Tchyně přijde na návštěvu.'}),
+        headers=dict(AUTH, **{'Content-Type': 'application/x-ndjson'}))
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data['added'] == 2
+    assert data['entries']['sk_normal'] == len(before.jokes['sk_normal']) + 1
+
+    snapshot = joker.corpus_snapshot
+    assert snapshot.signatures == before.signatures
+    assert snapshot.lengths['cz_normal'] is before.lengths['cz_normal']
+    assert load_jokes('sk', 'normal')[-1] == 'Žirafa vejde\ndo baru.'
+    response = client.get('/joke?lang=sk&format=text&min_length=21&max_length=21&max_lines=2')
+    assert response.get_data(as_text=True) == 'Žirafa vejde\ndo baru.'
+    assert client.get('/search?q=zirafa&lang=sk').get_json()['matches'] == 1
+
+    # Zápis jiného workeru se převezme při hot reloadu
+    IngestLog(ingest.path).append([('en-gb', 'normal', 'A giraffe walks into a bar.')])
+    assert joker.reload_jokes() == ['en-gb_normal']
+    assert joker.reload_jokes() == []
+
+    # Kompaktace jiným procesem (nový inode) - záznamy s přidanými vtipy se načtou ze souborů
+    ingest.compact(os.path.dirname(ingest.path))
+    assert sorted(joker.reload_jokes()) == ['en-gb_normal', 'sk_explicit', 'sk_normal']
+    assert load_jokes('sk', 'normal') == before.jokes['sk_normal']
+
+
+def test_admin_rejects_invalid_batch(ingest):
+    """Neplatný vtip odmítne celou dávku, nic se nezapíše"""
+    response = client.post('/admin/jokes', data=ndjson({'joke': 'Dobrý'}, {'joke': 'A\n\nB'}),
+                           headers=dict(AUTH, **{'Content-Type': 'application/x-ndjson'}))
+    assert response.status_code == 400 and 'Řádek 2' in response.get_json()['message']
+    assert client.post('/admin/jokes', data='nic', headers=AUTH).status_code == 400
+    assert not os.path.exists(ingest.path)
+
+
+def test_admin_ingest_targets(ingest, tmp_path, monkeypatch):
+    """S CORPUS_DB se vtipy zapíšou do SQLite, zkompilovaný korpus změny odmítá"""
+    path = str(tmp_path / 'jokes.db')
+    import_dir(JokeStore(path), Config.JOKES_DIR, LANGUAGES, CATEGORIES)
+    monkeypatch.setattr(joker, 'CORPUS_DB', path)
+    joker.reload_jokes()
+    response = client.post('/admin/jokes', json={'language': 'en-us', 'joke': 'Stored joke.'}, headers=AUTH)
+    assert response.status_code == 201
+    assert JokeStore(path).export('en-us', 'normal')[-1] == 'Stored joke.'
+    assert load_jokes('en-us', 'normal')[-1] == 'Stored joke.'
+    assert not os.path.exists(ingest.path)
+
+    monkeypatch.setattr(joker, 'CORPUS_DB', '')
+    monkeypatch.setattr(joker, 'CORPUS_FILE', path)
+    assert client.post('/admin/jokes', json={'joke': 'Vtip'}, headers=AUTH).status_code == 409
+
+
+
+def test_db_ingest_extends_indexes(ingest, tmp_path, monkeypatch):
+    """Přidání do SQLite jen rozšíří indexy záznamu o nové vtipy - nic se nestaví znovu
+    ani neprochází celý záznam, indexy ostatních záznamů zůstávají stejné"""
+    path = str(tmp_path / 'jokes.db')
+    import_dir(JokeStore(path), Config.JOKES_DIR, LANGUAGES, CATEGORIES)
+    monkeypatch.setattr(joker, 'CORPUS_DB', path)
+    monkeypatch.setattr(joker, 'SEARCH_ENABLED', True)
+    joker.reload_jokes()
+    width = joker.PRINT_WIDTHS[0]
+    for url in ('/joke?lang=en-us&min_length=1', f'/joke?lang=en-us&width={width}&min_length=1',
+                '/search?q=atoms&lang=en-us', '/joke?lang=cz&min_length=1'):
+        assert client.get(url).status_code == 200
+    before = joker.corpus_snapshot
+
+    scan = StoreView.scan
+    monkeypatch.setattr(StoreView, 'scan', lambda *args: pytest.fail('příjem prochází celý záznam'))
+    response = client.post('/admin/jokes', json={'language': 'en-us', 'joke': 'A zebra walks into a bar.'},
+                           headers=AUTH)
+    assert response.status_code == 201
+
+    snapshot = joker.corpus_snapshot
+    assert snapshot.generation == before.generation + 1
+    assert snapshot.lengths['cz_normal'] is before.lengths['cz_normal']
+    assert not snapshot.lengths['sk_normal'].built and not snapshot.search['sk_normal'].built
+    assert list(snapshot.lengths['en-us_normal'].select(min_length=25, max_length=25)) == [1]
+    assert list(snapshot.texts['en-us_normal'][width].lengths.select(max_lines=1)) == [1]
+    assert client.get('/search?q=zebra&lang=en-us').get_json()['joke'] == 'A zebra walks into a bar.'
+
+    # Smazání přepíše existující vtipy - záznam se načte znovu
+    JokeStore(path).delete('en-us', 'normal', 0)
+    monkeypatch.setattr(StoreView, 'scan', scan)
+    assert joker.reload_jokes() == ['en-us_normal']
+    assert not joker.corpus_snapshot.lengths['en-us_normal'].built
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Testy SQLite úložiště vtipů (jokestore.py) a jeho napojení na hot reload
+Spusť: python -m pytest test_jokestore.py
+"""
+import os
+
+import pytest
+
+os.environ.setdefault('AUTO_UPDATE_ENABLED', 'false')
+
+import app as joker
+from app import app, limiter, load_jokes
+from config import Config
+from corpus import parse_jokes
+from jokestore import JokeStore, StaleView, StoreError, connect, export_dir, import_dir
+
+limiter.enabled = False
+client = app.test_client()
+
+MULTILINE = 'Co je to zelený?\nOkurka.\n\n\nProč hroši?\r\nBřicho.\n\nSetkají se dva.\nPrvní: "Ahoj!"\nDruhý: "Svět!"\n'
+
+
+def test_import_export_roundtrip(tmp_path):
+    """Import a export zachová vtipy i víceřádkové vtipy podle JOKE_FORMAT.md"""
+    jokes_dir = tmp_path / 'jokes'
+    jokes_dir.mkdir()
+    (jokes_dir / 'cz_normal.txt').write_text(MULTILINE, encoding='utf-8')
+    store = JokeStore(str(tmp_path / 'jokes.db'))
+    counts = import_dir(store, str(jokes_dir), ['cz'], ['normal', 'explicit'])
+    assert counts == {('cz', 'normal'): 3, ('cz', 'explicit'): 0}
+    assert store.export('cz', 'normal')[1] == 'Proč hroši?\nBřicho.'
+
+    export_dir(store, str(tmp_path / 'exported'), ['cz'], ['normal', 'explicit'])
+    exported = (tmp_path / 'exported' / 'cz_normal.txt').read_text(encoding='utf-8')
+    assert parse_jokes(exported) == store.export('cz', 'normal')
+    assert (tmp_path / 'exported' / 'cz_explicit.txt').read_text(encoding='utf-8') == ''
+
+    # Druhé kolo je beze změny i na úrovni bytes
+    import_dir(store, str(tmp_path / 'exported'), ['cz'], ['normal', 'explicit'])
+    export_dir(store, str(tmp_path / 'again'), ['cz'], ['normal', 'explicit'])
+    assert (tmp_path / 'again' / 'cz_normal.txt').read_text(encoding='utf-8') == exported
+
+
+def test_repo_corpus_roundtrip(tmp_path):
+    """Vtipy z jokes/ projdou úložištěm beze změny"""
+    store = JokeStore(str(tmp_path / 'jokes.db'))
+    import_dir(store, Config.JOKES_DIR, Config.SUPPORTED_LANGUAGES, Config.SUPPORTED_CATEGORIES)
+    for lang in Config.SUPPORTED_LANGUAGES:
+        for cat in Config.SUPPORTED_CATEGORIES:
+            with open(os.path.join(Config.JOKES_DIR, f'{lang}_{cat}.txt'), encoding='utf-8') as f:
+                assert store.export(lang, cat) == parse_jokes(f.read())
+
+
+def test_add_delete_dense_ids(tmp_path):
+    """Smazání přesune poslední vtip na uvolněné id, id zůstávají 0..N-1"""
+    store = JokeStore(str(tmp_path / 'jokes.db'))
+    assert [store.add('sk', 'normal', f'Vtip {i}') for i in range(4)] == [0, 1, 2, 3]
+    assert store.versions()[('sk', 'normal')] == (4, 4, 0)  # přidání na konec nic nepřepsalo
+    store.delete('sk', 'normal', 1)
+    assert store.export('sk', 'normal') == ['Vtip 0', 'Vtip 3', 'Vtip 2']
+    store.delete('sk', 'normal', 2)
+    assert store.export('sk', 'normal') == ['Vtip 0', 'Vtip 3']
+    assert store.versions()[('sk', 'normal')] == (6, 2, 6)
+
+    with pytest.raises(StoreError):
+        store.delete('sk', 'normal', 5)
+    with pytest.raises(StoreError):
+        store.add('sk', 'normal', 'První\n\nDruhý')
+    assert store.versions()[('sk', 'normal')] == (6, 2, 6)
+
+
+def test_view_is_consistent_snapshot(tmp_path):
+    """Čtecí snímek nevidí pozdější změny jiného spojení, nový snímek ano (WAL)"""
+    path = str(tmp_path / 'jokes.db')
+    writer = JokeStore(path)
+    writer.replace('cz', 'normal', ['A', 'B', 'C'])
+    view = writer.view()
+    jokes = view.get('cz', 'normal')
+
+    other = JokeStore(path)
+    other.delete('cz', 'normal', 0)
+    other.add('cz', 'normal', 'D')
+    assert list(jokes) == ['A', 'B', 'C'] and jokes[0] == 'A'
+    assert list(writer.view().get('cz', 'normal')) == ['C', 'B', 'D']
+    assert jokes.encoded()[1] == b'B'
+
+
+def test_app_serves_and_reloads_from_db(tmp_path, monkeypatch):
+    """S CORPUS_DB jde /joke z SQLite, změna jednoho záznamu přenačte jen ten záznam"""
+    path = str(tmp_path / 'jokes.db')
+    store = JokeStore(path)
+    import_dir(store, Config.JOKES_DIR, Config.SUPPORTED_LANGUAGES, Config.SUPPORTED_CATEGORIES)
+    monkeypatch.setattr(joker, 'CORPUS_DB', path)
+    try:
+        joker.reload_jokes()
+        before = joker.corpus_snapshot
+        assert client.get('/joke?lang=cz').get_json()['joke'] in store.export('cz', 'normal')
+        # Index délek se nad SQLite staví až prvním výběrem podle délky
+        assert not before.lengths['cz_normal'].built
+        assert client.get('/joke?lang=cz&min_length=1').status_code == 200
+        assert before.lengths['cz_normal'].built
+
+        store.add('sk', 'normal', 'Nový vtip\nz databáze.')
+        assert joker.reload_jokes() == ['sk_normal']
+        assert load_jokes('sk', 'normal')[-1] == 'Nový vtip\nz databáze.'
+        assert joker.corpus_snapshot.lengths['cz_normal'] is before.lengths['cz_normal']
+        assert not joker.corpus_snapshot.lengths['cz_explicit'].built
+        response = client.get('/joke?lang=sk&format=text&max_length=21')
+        assert response.get_data(as_text=True) == 'Nový vtip\nz databáze.'
+        assert joker.reload_jokes() == []
+    finally:
+        monkeypatch.undo()
+        joker.reload_jokes()
+
+
+def test_old_view_closed_and_request_retried(tmp_path, monkeypatch):
+    """Reload zavře starý čtecí snímek (WAL se checkpointuje celý), požadavek nad ním se zopakuje"""
+    path = str(tmp_path / 'jokes.db')
+    store = JokeStore(path)
+    import_dir(store, Config.JOKES_DIR, Config.SUPPORTED_LANGUAGES, Config.SUPPORTED_CATEGORIES)
+    monkeypatch.setattr(joker, 'CORPUS_DB', path)
+    try:
+        joker.reload_jokes()
+        before = joker.corpus_snapshot
+        store.add('cz', 'normal', 'Nový vtip.')
+        joker.reload_jokes()
+        with pytest.raises(StaleView):
+            before.jokes['cz_normal'][0]
+        busy, frames, checkpointed = connect(path).execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+        assert busy == 0 and checkpointed == frames
+
+        # Požadavek, který ještě drží starý snímek (nebo vtip smazaný po forku), nevrací 500
+        monkeypatch.setattr(joker, 'corpus_snapshot', before)
+        store.delete('cz', 'normal', 0)
+        for url in ('/joke?lang=cz', '/joke?lang=cz&format=text&min_length=1', '/jokes?lang=cz&count=3'):
+            monkeypatch.setattr(joker, 'corpus_snapshot', before)
+            assert client.get(url).status_code == 200
+        assert len(load_jokes('cz', 'normal')) == len(before.jokes['cz_normal'])
+    finally:
+        monkeypatch.undo()
+        joker.reload_jokes()
+
+
+def test_master_releases_read_transaction(tmp_path, monkeypatch):
+    """Master po preloadu ukončí read transakci (when_ready), workery čtou přes vlastní spojení"""
+    path = str(tmp_path / 'jokes.db')
+    store = JokeStore(path)
+    import_dir(store, Config.JOKES_DIR, Config.SUPPORTED_LANGUAGES, Config.SUPPORTED_CATEGORIES)
+    monkeypatch.setattr(joker, 'CORPUS_DB', path)
+    try:
+        joker.reload_jokes()
+        jokes = load_jokes('cz', 'normal')
+        joker.release_store_views()
+        for i in range(20):
+            JokeStore(path).add('sk', 'normal', f'Vtip {i}.')
+        busy, frames, checkpointed = connect(path).execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+        assert busy == 0 and checkpointed == frames
+        assert jokes[0] == store.export('cz', 'normal')[0]
+    finally:
+        monkeypatch.undo()
+        joker.reload_jokes()
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))
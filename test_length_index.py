@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Testy indexu délky vtipů (length_index.py) a omezení délky v /joke
+Spusť: python -m pytest test_length_index.py
+"""
+import os
+import random
+
+import pytest
+
+# Testy nesmí spouštět auto-update ani narážet na rate limit
+os.environ.setdefault('AUTO_UPDATE_ENABLED', 'false')
+
+from app import app, limiter, load_jokes
+from length_index import LengthIndex, parse_length_limits
+
+limiter.enabled = False
+client = app.test_client()
+
+
+def random_jokes(count, seed=3):
+    rng = random.Random(seed)
+    return ['\n'.join('x' * rng.randint(1, 60) for _ in range(rng.randint(1, 6))) for _ in range(count)]
+
+
+@pytest.mark.parametrize('limits', [
+    {}, {'max_length': 40}, {'min_length': 100, 'max_length': 150}, {'max_lines': 1},
+    {'min_lines': 2, 'max_lines': 3, 'max_length': 80}, {'min_length': 10 ** 6},
+])
+def test_select_matches_filter(limits):
+    """Výběr z indexu odpovídá prostému filtrování seznamu"""
+    jokes = random_jokes(2000)
+    fitting = LengthIndex(jokes).select(**limits)
+    expected = [i for i, joke in enumerate(jokes)
+                if limits.get('min_length', 0) <= len(joke) <= limits.get('max_length', 10 ** 9)
+                and limits.get('min_lines', 0) <= joke.count('\n') + 1 <= limits.get('max_lines', 10 ** 9)]
+    assert sorted(fitting) == expected
+    assert len(fitting) == len(expected)
+    if expected:
+        assert fitting[-1] == fitting[len(fitting) - 1]
+    with pytest.raises(IndexError):
+        fitting[len(fitting)]
+
+
+@pytest.mark.parametrize('added', [3, 1500])
+def test_extended_matches_rebuild(added):
+    """Index rozšířený o nové vtipy (vložením i slitím košů) je stejný jako postavený znovu"""
+    jokes = random_jokes(2000 + added)
+    base = LengthIndex(jokes[:2000])
+    extended = base.extended(jokes, 2000)
+    rebuilt = LengthIndex(jokes)
+    assert extended.line_counts == rebuilt.line_counts
+    assert extended.buckets == rebuilt.buckets
+    assert list(base.select()) == list(LengthIndex(jokes[:2000]).select())
+
+
+def test_parse_length_limits():
+    """Parametry bez omezení vrací None, neplatné hodnoty ValueError"""
+    assert parse_length_limits({}) is None
+    assert parse_length_limits({'max_length': '32', 'lang': 'cz'}) == {'max_length': 32}
+    for value in ('abc', '-1'):
+        with pytest.raises(ValueError):
+            parse_length_limits({'max_lines': value})
+
+
+def test_joke_length_limits():
+    """/joke vrací jen vtipy v mezích, jinak 404 nebo 400"""
+    joke = load_jokes('sk', 'explicit')[0]
+    lines = joke.count('\n') + 1
+
+    data = client.get(f'/joke?lang=sk&category=explicit&max_length={len(joke)}&max_lines={lines}').get_json()
+    assert data['joke'] == joke
+    data = client.get(f'/joke?lang=sk&category=explicit&max_length={len(joke)}&cursor=new').get_json()
+    assert data['joke'] == joke and data['cursor']
+
+    response = client.get(f'/joke?lang=sk&category=explicit&max_length={len(joke) - 1}')
+    assert response.status_code == 404
+    assert response.get_json()['limits'] == {'max_length': len(joke) - 1}
+    assert client.get('/joke?lang=sk&max_lines=dva').status_code == 400
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Testy zátěžového testu (loadtest.py) - mix provozu a porovnání s baseline
+Spusť: python -m pytest test_loadtest.py
+"""
+from collections import Counter
+
+import pytest
+
+from loadtest import TrafficMix, compare
+
+
+def test_traffic_mix_reproducible_and_weighted():
+    """Stejný seed dává stejný sled, poměry odpovídají vahám"""
+    mix = TrafficMix('cz=3,sk=1', 'normal=1', invalid_rate=0.1, health_rate=0.05, seed=7)
+    paths = mix.paths(20000)
+    assert paths == TrafficMix('cz=3,sk=1', 'normal=1', 0.1, 0.05, seed=7).paths(20000)
+    assert paths != TrafficMix('cz=3,sk=1', 'normal=1', 0.1, 0.05, seed=8).paths(20000)
+
+    kinds = Counter('health' if path == '/health' else 'cz' if 'lang=cz&' in path
+                    else 'sk' if 'lang=sk&' in path else 'invalid' for path in paths)
+    assert kinds['health'] == pytest.approx(1000, rel=0.15)
+    assert kinds['invalid'] == pytest.approx(2000, rel=0.15)
+    assert kinds['cz'] == pytest.approx(3 * kinds['sk'], rel=0.1)
+
+
+def test_compare_reports_regressions_over_threshold():
+    """Pokles propustnosti a nárůst latence nad mez je regrese, šum pod mezí ne"""
+    baseline = {'modes': {'gunicorn': {'rps': 1000, 'p50_ms': 10, 'p99_ms': 50, 'p999_ms': 80, 'rss_mb': 40}}}
+    ok = {'gunicorn': {'rps': 900, 'p50_ms': 11, 'p99_ms': 60, 'p999_ms': 110, 'rss_mb': 41}}
+    assert compare(ok, baseline, 0.15) == []
+
+    slow = {'gunicorn': {'rps': 800, 'p50_ms': 12, 'p99_ms': 50, 'p999_ms': 80, 'rss_mb': 40},
+            'asgi': {'rps': 1, 'p50_ms': 1, 'p99_ms': 1, 'p999_ms': 1, 'rss_mb': 1}}
+    regressions = compare(slow, baseline, 0.15)
+    assert [line.split(':')[0] for line in regressions] == ['gunicorn rps', 'gunicorn p50_ms']
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))
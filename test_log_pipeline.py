@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Testy neblokujícího logování (log_pipeline.py)
+Spusť: python -m pytest test_log_pipeline.py
+"""
+import logging
+
+from log_pipeline import LogPipeline, SharedRotatingFileHandler, create_file_handler
+
+
+class ListHandler(logging.Handler):
+    """Sbírá zformátované zprávy"""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def run_pipeline(records, **kwargs):
+    """Pošle záznamy přes pipeline a vrátí zapsané zprávy"""
+    target = ListHandler()
+    pipeline = LogPipeline([target], **kwargs)
+    logger = logging.getLogger('test_log_pipeline')
+    logger.propagate = False
+    logger.handlers = [pipeline.handler]
+    pipeline.start()
+    for level, message, args in records:
+        logger.log(level, message, *args)
+    pipeline.stop()
+    return target.messages
+
+
+def test_dedupe_same_message_and_ip():
+    """Opakovaná zpráva ze stejné IP se zapíše jednou a souhrnem, jiná IP zvlášť"""
+    records = [(logging.WARNING, 'Neplatný jazyk: %s z IP: %s', ('xx', '10.0.0.1'))] * 50
+    records.append((logging.WARNING, 'Neplatný jazyk: %s z IP: %s', ('xx', '10.0.0.2')))
+    messages = run_pipeline(records, dedupe_window=60, rate_limit=0)
+    assert messages[:2] == ['Neplatný jazyk: xx z IP: 10.0.0.1', 'Neplatný jazyk: xx z IP: 10.0.0.2']
+    assert messages[2] == 'Neplatný jazyk: xx z IP: 10.0.0.1 (opakováno 49× za 60 s)'
+    assert len(messages) == 3
+
+
+def test_sampling_keeps_errors():
+    """Nad limitem se varování zahazují a hlásí souhrnně, chyby projdou vždy"""
+    records = [(logging.WARNING, 'Varování %d', (i,)) for i in range(100)]
+    records += [(logging.ERROR, 'Chyba %d', (i,)) for i in range(5)]
+    messages = run_pipeline(records, dedupe_window=0, rate_limit=10)
+    assert sum(message.startswith('Varování') for message in messages) <= 11
+    assert sum(message.startswith('Chyba') for message in messages) == 5
+    assert any(message.startswith('Logování omezeno: zahozeno') for message in messages)
+
+
+def test_shared_rotation_between_writers(tmp_path):
+    """Dva zapisovatelé (workery) nad jedním souborem rotují koordinovaně, nic se neztratí"""
+    path = tmp_path / 'joker.log'
+    writers = [create_file_handler(str(path), max_bytes=2000, backup_count=50) for _ in range(2)]
+    assert all(isinstance(writer, SharedRotatingFileHandler) for writer in writers)
+    for i in range(200):
+        writers[i % 2].handle(logging.makeLogRecord({'msg': f'zpráva {i:03d}', 'levelno': logging.INFO,
+                                                     'levelname': 'INFO'}))
+    for writer in writers:
+        writer.close()
+
+    files = sorted(tmp_path.glob('joker.log*'))
+    lines = [line for file in files if not file.name.endswith('.lock')
+             for line in file.read_text(encoding='utf-8').splitlines()]
+    assert len(lines) == 200
+    assert all(file.stat().st_size <= 2000 for file in files)
+
+
+if __name__ == '__main__':
+    import pytest
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Testy metrik ve sdílené paměti (metrics.py)
+Spusť: python -m pytest test_metrics.py
+"""
+import os
+
+import pytest
+
+from metrics import CONTENT_TYPE, Metrics, remove_metrics_files
+
+
+def make_metrics(directory, max_workers=4, instance=None):
+    return Metrics(['get_joke', 'get_jokes'], ['cs', 'en'], ['general'], directory=str(directory),
+                   max_workers=max_workers, instance=instance)
+
+
+def test_render_counts_and_histogram(tmp_path):
+    """Status, buckety histogramu (kumulativně), rate limit a vydané vtipy"""
+    metrics = make_metrics(tmp_path)
+    metrics.record_request('get_joke', 200, 0.0003)
+    metrics.record_request('get_joke', 200, 0.003)
+    metrics.record_request('get_joke', 429, 0.0001)
+    metrics.record_request('neznama_routa', 404, 0.0001)
+    metrics.record_rate_limited('get_joke')
+    metrics.record_jokes('cs', 'general', 5)
+    metrics.record_jokes('xx', 'general')  # neznámý klíč se ignoruje
+
+    text = metrics.render([('joker_corpus_generation', 'Generace', 3)]).decode('utf-8')
+    assert 'joker_requests_total{route="get_joke",status="200"} 2' in text
+    assert 'joker_requests_total{route="get_joke",status="429"} 1' in text
+    assert 'joker_requests_total{route="other",status="404"} 1' in text
+    assert 'joker_request_duration_seconds_bucket{route="get_joke",le="0.0005"} 2' in text
+    assert 'joker_request_duration_seconds_bucket{route="get_joke",le="0.005"} 3' in text
+    assert 'joker_request_duration_seconds_bucket{route="get_joke",le="+Inf"} 3' in text
+    assert 'joker_request_duration_seconds_count{route="get_joke"} 3' in text
+    assert 'joker_rate_limited_total{route="get_joke"} 1' in text
+    assert 'joker_jokes_served_total{language="cs",category="general"} 5' in text
+    assert 'joker_corpus_generation 3' in text
+    assert 'get_jokes' not in text.split('joker_jokes_served_total')[0]  # prázdné routy se nevypisují
+    assert CONTENT_TYPE.startswith('text/plain')
+
+
+def test_workers_aggregate_across_processes(tmp_path):
+    """Každý forknutý worker zapisuje do vlastního slotu, součet vidí kterýkoli worker"""
+    metrics = make_metrics(tmp_path)
+    children = []
+    for _ in range(3):
+        pid = os.fork()
+        if pid == 0:
+            for _ in range(100):
+                metrics.record_request('get_joke', 200, 0.001)
+            os._exit(0 if metrics.slot not in (None, 0) else 1)
+        children.append(pid)
+    assert all(os.waitpid(pid, 0)[1] == 0 for pid in children)
+
+    metrics.record_request('get_joke', 200, 0.001)
+    # Sloty ukončených workerů se dál započítávají
+    assert 'joker_requests_total{route="get_joke",status="200"} 301' in metrics.render().decode('utf-8')
+
+
+def test_instances_do_not_share_counters(tmp_path):
+    """Každá instance (master) má vlastní soubor, po ukončení se smaže a restart začne od nuly"""
+    first = make_metrics(tmp_path, instance=1000)
+    second = make_metrics(tmp_path, instance=2000)
+    first.record_request('get_joke', 200, 0.001)
+    assert first.path != second.path
+    assert 'get_joke' not in second.render().decode('utf-8').split('joker_jokes_served_total')[0]
+
+    assert remove_metrics_files(1000, str(tmp_path)) == 1
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(second.path)]
+    assert 'get_joke' not in make_metrics(tmp_path, instance=1000).render().decode('utf-8').split('joker_jokes_served_total')[0]
+
+
+def test_metrics_endpoint():
+    """Endpoint /metrics vrací text pro Prometheus a počítá požadavky"""
+    import app as joker
+    if joker.metrics is None:
+        pytest.skip('METRICS_ENABLED=false')
+    client = joker.app.test_client()
+    client.get('/joke?language=cs')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type == CONTENT_TYPE
+    assert b'joker_requests_total{route="get_joke",status="200"}' in response.data
+    assert b'joker_corpus_jokes ' in response.data
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Testy předkomprimovaných variant cachovaných odpovědí (precompressed.py)
+Spusť: python -m pytest test_precompressed.py
+"""
+import os
+import gzip
+import json
+
+import pytest
+
+os.environ.setdefault('AUTO_UPDATE_ENABLED', 'false')
+
+import app as joker
+from app import app, limiter
+from precompressed import choose_encoding, compress_variants
+
+limiter.enabled = False
+client = app.test_client()
+
+
+def test_choose_encoding():
+    """Výběr podle kvality v Accept-Encoding, při shodě preference serveru, jinak identity"""
+    available = ('gzip', 'identity')
+    assert choose_encoding(None, available) == 'identity'
+    assert choose_encoding('gzip, deflate, br', available) == 'gzip'
+    assert choose_encoding('*', available) == 'gzip'
+    assert choose_encoding('gzip;q=0', available) == 'identity'
+    assert choose_encoding('gzip;q=0.1, identity', available) == 'identity'
+    assert choose_encoding('br', available) == 'identity'
+    assert choose_encoding('gzip', ('identity',)) == 'identity'
+
+
+def test_compress_variants_threshold():
+    """Malá a nestlačitelná těla se nekomprimují, gzip je deterministický"""
+    assert compress_variants(b'{"a":1}\n', 1024) == {}
+    assert compress_variants(os.urandom(4096), 1024) == {}
+    body = json.dumps({'text': 'vtip ' * 500}).encode('utf-8')
+    variants = compress_variants(body, 1024)
+    assert gzip.decompress(variants['gzip']) == body
+    assert variants == compress_variants(body, 1024)
+
+
+def test_metadata_gzip_variant():
+    """/ posílá gzip variantu s vlastním ETagem a Vary, malé /languages zůstává bez komprese"""
+    plain = client.get('/')
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+
+    response = client.get('/', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers.getlist('Vary')
+    assert gzip.decompress(response.get_data()) == plain.get_data()
+    assert response.headers['ETag'] != plain.headers['ETag']
+
+    etag = response.headers['ETag']
+    response = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert response.status_code == 304 and response.headers['Vary'] == 'Accept-Encoding'
+
+    response = client.get('/languages', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers and 'Vary' not in response.headers
+
+
+def test_vary_with_cors_origin():
+    """Vary nese Accept-Encoding i Origin od CORS"""
+    response = client.get('/', headers={'Accept-Encoding': 'gzip', 'Origin': 'https://printmaster.example'})
+    vary = ', '.join(response.headers.getlist('Vary'))
+    assert 'Accept-Encoding' in vary and 'Origin' in vary
+
+
+def test_compression_disabled(monkeypatch):
+    """COMPRESS_MIN_SIZE=0 komprimované varianty nestaví"""
+    monkeypatch.setattr(joker, 'COMPRESS_MIN_SIZE', 0)
+    monkeypatch.setattr(joker.corpus_snapshot, 'cache', {})
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers and 'Vary' not in response.headers
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))
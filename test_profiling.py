@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Testy měření fází a vzorkovacího profileru (profiling.py)
+Spusť: python -m pytest test_profiling.py
+"""
+import time
+import logging
+import threading
+
+import pytest
+from flask import Flask
+from flask_cors import CORS
+
+from profiling import SamplingProfiler, init_request_timing, mark_phase
+
+
+def test_server_timing_phases_and_slow_log(caplog):
+    """Hlavička obsahuje fáze v pořadí požadavku, pomalý požadavek se zaloguje"""
+    app = Flask(__name__)
+    CORS(app)
+
+    @app.before_request
+    def check_limit():
+        time.sleep(0.002)
+
+    @app.route('/slow')
+    def slow():
+        mark_phase('params')
+        time.sleep(0.005)
+        mark_phase('load')
+        return 'ok'
+
+    init_request_timing(app, logging.getLogger('test_profiling'), enabled=True, slow_ms=4)
+    with caplog.at_level(logging.WARNING, logger='test_profiling'):
+        response = app.test_client().get('/slow?x=1')
+
+    phases = [part.split(';')[0] for part in response.headers['Server-Timing'].split(', ')]
+    assert phases == ['limiter', 'params', 'load', 'cors', 'total']
+    durations = dict(part.split(';dur=') for part in response.headers['Server-Timing'].split(', '))
+    assert float(durations['limiter']) >= 2 and float(durations['load']) >= 5
+    assert 'Pomalý požadavek GET /slow?x=1' in caplog.text
+
+
+def busy_request(profiler, done):
+    """Profilovaný "požadavek" - točí se, dokud test nepřečte vzorky"""
+    profiler.begin_request()
+    while not done.is_set():
+        sum(range(1000))
+    profiler.end_request()
+
+
+def test_profiler_samples_selected_requests(tmp_path):
+    """Profiluje se jen každý N-tý požadavek, zásobníky jdou do .folded souboru"""
+    profiler = SamplingProfiler(every=2, interval=0.001, output_dir=str(tmp_path),
+                                control_path=str(tmp_path / 'profile.control'))
+    assert not profiler.begin_request()  # první z dvou se neprofiluje
+    profiler.start()
+    done = threading.Event()
+    thread = threading.Thread(target=busy_request, args=(profiler, done))
+    thread.start()
+    deadline = time.monotonic() + 5
+    while profiler.samples < 20 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    done.set()
+    thread.join()
+    profiler.stop()
+
+    lines = (tmp_path / profiler.output_path.rsplit('/', 1)[1]).read_text().splitlines()
+    assert any('test_profiling.py:busy_request' in line for line in lines)
+    assert sum(int(line.rsplit(' ', 1)[1]) for line in lines) == profiler.samples
+
+
+def test_profiler_control_file(tmp_path):
+    """Řídicí soubor zapne časové okno, smazání vrátí výchozí (vypnuto)"""
+    control = tmp_path / 'profile.control'
+    profiler = SamplingProfiler(every=0, output_dir=str(tmp_path), control_path=str(control))
+    assert not profiler.begin_request()
+
+    control.write_text('seconds=60\n')
+    profiler._read_control()
+    assert profiler.enabled and profiler.begin_request()
+    profiler.end_request()
+
+    control.unlink()
+    profiler._read_control()
+    assert not profiler.enabled
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Testy úložiště rate limitů ve sdílené paměti (ratelimit.py)
+Spusť: python -m pytest test_ratelimit.py
+"""
+import time
+import multiprocessing
+
+import pytest
+from limits import parse, strategies
+from limits.storage import storage_from_string
+
+import ratelimit  # noqa: F401 - registruje shm:// a redis+lease://
+from redis_standin import RedisStandin
+
+
+def hit_many(uri, count):
+    """Zásahy z jiného procesu - vrátí počet povolených"""
+    limiter = strategies.FixedWindowRateLimiter(storage_from_string(uri))
+    return sum(limiter.hit(parse('100 per minute'), '10.0.0.1', 'joke') for _ in range(count))
+
+
+def test_fixed_window_shared_between_processes(tmp_path):
+    """Limit platí pro všechny procesy dohromady, ne pro každý zvlášť"""
+    uri = f"shm://{tmp_path / 'ratelimit'}"
+    storage_from_string(uri)
+    with multiprocessing.get_context('fork').Pool(4) as pool:
+        assert sum(pool.starmap(hit_many, [(uri, 60)] * 4)) == 100
+
+
+def test_token_bucket(tmp_path):
+    """Strategie gcra je token bucket - kapacita limit, váha zásahu jako tokeny"""
+    storage = storage_from_string(f"shm://{tmp_path / 'ratelimit'}")
+    limiter = strategies.STRATEGIES['gcra'](storage)
+    item = parse('10 per minute')
+    assert limiter.hit(item, 'a', cost=8)
+    assert limiter.test(item, 'a', cost=2) and not limiter.test(item, 'a', cost=3)
+    assert not limiter.hit(item, 'a', cost=3)
+    assert limiter.hit(item, 'a', cost=2)
+    assert not limiter.hit(item, 'a')
+    stats = limiter.get_window_stats(item, 'a')
+    assert stats.remaining == 0 and 59 < stats.reset_time - time.time() <= 60
+    assert limiter.hit(item, 'b')
+
+    # Moving window shm:// nepodporuje - nesmí potichu běžet jako token bucket
+    with pytest.raises(NotImplementedError):
+        strategies.MovingWindowRateLimiter(storage)
+    with pytest.raises(NotImplementedError):
+        strategies.STRATEGIES['gcra'](storage_from_string('memory://'))
+
+
+def test_eviction_and_reset(tmp_path):
+    """Plná tabulka přepisuje nejstarší klíče, reset vymaže vše"""
+    storage = storage_from_string(f"shm://{tmp_path / 'ratelimit'}?slots=64")
+    limiter = strategies.FixedWindowRateLimiter(storage)
+    item = parse('1 per minute')
+    for i in range(1000):
+        assert limiter.hit(item, f'10.0.{i // 256}.{i % 256}')
+    assert not limiter.hit(item, '10.0.3.231')
+
+    storage.reset()
+    assert limiter.hit(item, '10.0.3.231')
+
+
+@pytest.fixture
+def redis_standin():
+    """Lokální zástupce Redis serveru"""
+    pytest.importorskip('redis')
+    standin = RedisStandin()
+    url = standin.start()
+    yield standin, url.replace('redis://', 'redis+lease://')
+    standin.stop()
+
+
+def test_lease_avoids_round_trips(redis_standin):
+    """Zásahy v rámci lease nejdou po síti, flush je zapíše jednou pipeline"""
+    standin, url = redis_standin
+    storage = storage_from_string(f'{url}?lease=5&flush_ms=60000')
+    limiter = strategies.FixedWindowRateLimiter(storage)
+    item = parse('100 per minute')
+
+    assert all(limiter.hit(item, '10.0.0.1') for _ in range(5))
+    assert limiter.hit(item, '10.0.0.2')
+    assert standin.commands == 0  # ani spojení se ještě neotevřelo
+
+    storage.flush()
+    assert sorted(standin.data.values()) == [1, 5]
+
+
+def test_lease_error_bound(redis_standin):
+    """Dva workery s lease překročí globální limit nejvýš o 2 × lease"""
+    standin, url = redis_standin
+    workers = [strategies.FixedWindowRateLimiter(storage_from_string(f'{url}?lease=4&flush_ms=60000'))
+               for _ in range(2)]
+    item = parse('20 per minute')
+    allowed = sum(worker.hit(item, '10.0.0.1') for _ in range(40) for worker in workers)
+    assert 20 <= allowed <= 20 + 2 * 4
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))
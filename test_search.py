@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Testy fulltextového indexu (search.py) a endpointu /search
+Spusť: python -m pytest test_search.py
+"""
+import os
+import random
+
+import pytest
+
+# Testy nesmí spouštět auto-update ani narážet na rate limit
+os.environ.setdefault('AUTO_UPDATE_ENABLED', 'false')
+
+from app import app, limiter, load_jokes
+from search import SearchError, SearchIndex, intersect, parse_query, tokenize
+
+limiter.enabled = False
+client = app.test_client()
+
+JOKES = [
+    'Blondýna přijde do obchodu a chce koupit televizi.',
+    'Pepíček se ptá blondýny, proč nosí helmu.',
+    'Přijde chlap k doktorovi a doktor povídá: Máte štěstí.',
+    'ŠŤASTNÁ BLONDÝNA vyhrála v loterii.',
+]
+
+
+def test_tokenize_folds_diacritics():
+    """Slova se porovnávají bez diakritiky a velikosti písmen, krátká slova se vynechají"""
+    assert tokenize('Šťastná Blondýna a pes', 'cz') == ['stastna', 'blondyna', 'pes']
+    assert tokenize("Don't panic", 'en-gb') == ['dont', 'panic']
+    assert parse_query('Blondýna  blondyna OBCH*') == (('blondyna', False), ('obch', True))
+    with pytest.raises(SearchError):
+        parse_query('a v !')
+    with pytest.raises(SearchError):
+        parse_query('bl*')
+
+
+def test_search_and_prefix():
+    """AND více slov, prefixový dotaz a dotaz bez diakritiky"""
+    index = SearchIndex(JOKES, 'cz')
+    assert list(index.search('blondyna')) == [0, 3]
+    assert list(index.search('blond*')) == [0, 1, 3]
+    assert list(index.search('přijde doktor')) == [2]
+    assert list(index.search('stastna BLONDÝNA')) == [3]
+    assert list(index.search('blondyna helmu')) == []
+    assert index.memory() > 0
+
+
+def test_extended_matches_rebuild():
+    """Index rozšířený o nové vtipy odpovídá indexu postavenému znovu, původní se nemění"""
+    jokes = JOKES + ['Blondýna a doktor v obchodě.', 'Žirafa přijde do baru.']
+    base = SearchIndex(JOKES, 'cz')
+    extended = base.extended(jokes, len(JOKES))
+    rebuilt = SearchIndex(jokes, 'cz')
+    assert extended.postings == rebuilt.postings and extended.terms == rebuilt.terms
+    assert list(extended.search('blond* doktor')) == [4]
+    assert list(base.search('zirafa')) == [] and list(extended.search('zirafa')) == [5]
+
+
+def test_intersect_matches_sets():
+    """Průnik krátkého a dlouhého seznamu dává stejný výsledek jako množiny"""
+    from array import array
+
+    rng = random.Random(7)
+    for small, large in ((5, 5000), (300, 400), (0, 10)):
+        a = sorted(rng.sample(range(20000), small))
+        b = sorted(rng.sample(range(20000), large))
+        assert list(intersect([array('I', b), array('I', a)])) == sorted(set(a) & set(b))
+
+
+def test_search_endpoint():
+    """Náhodný výsledek, stránkování a chybové odpovědi /search"""
+    joke = load_jokes('cz', 'normal')[0]
+    word = tokenize(joke, 'cz')[0]
+
+    data = client.get(f'/search?q={word}&lang=cz').get_json()
+    assert data['joke'] == joke
+    assert data['matches'] == 1
+
+    data = client.get(f'/search?q={word}&lang=cz&page=1&per_page=5').get_json()
+    assert data['jokes'] == [joke]
+    assert data['pages'] == 1
+
+    assert client.get('/search?q=neexistujicislovo&lang=cz').status_code == 404
+    assert client.get('/search?q=neexistujicislovo&lang=cz&page=1').get_json()['jokes'] == []
+    assert client.get('/search?q=a').status_code == 400
+    assert client.get(f'/search?q={word}&page=0').status_code == 400
+    assert client.get(f'/search?q={word}&lang=xx').status_code == 400
+
+
+def test_lazy_index_for_mapped_corpus(tmp_path, monkeypatch):
+    """Nad zkompilovaným korpusem se index nestaví při načtení, ale až prvním /search"""
+    import app as joker
+    from config import Config
+    from corpus import LazyIndex, compile_corpus
+
+    path = str(tmp_path / 'jokes.corpus')
+    compile_corpus(Config.JOKES_DIR, path, Config.SUPPORTED_LANGUAGES, Config.SUPPORTED_CATEGORIES)
+    monkeypatch.setattr(joker, 'CORPUS_FILE', path)
+    monkeypatch.setattr(joker, 'corpus_snapshot', joker.corpus_snapshot)
+    joker.reload_jokes()
+
+    index = joker.corpus_snapshot.search['cz_normal']
+    assert isinstance(index, LazyIndex) and not index.built
+    joke = load_jokes('cz', 'normal')[0]
+    assert client.get(f"/search?q={tokenize(joke, 'cz')[0]}&lang=cz").get_json()['joke'] == joke
+    assert index.built and not joker.corpus_snapshot.search['sk_normal'].built
+
+    extended = LazyIndex(SearchIndex, JOKES[:2]).extended(JOKES, 2)
+    assert not extended.built and list(extended.search('blondyna')) == list(SearchIndex(JOKES).search('blondyna'))
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Testy neopakujícího se kurzoru (shuffle.py)
+Spusť: python -m pytest test_shuffle.py
+"""
+import base64
+
+import pytest
+
+from shuffle import CursorError, ShuffleCursor, permute
+
+
+def walk(cursor, total, steps):
+    """Projde kurzor o steps kroků, každý krok přes encode/decode jako u klienta"""
+    indices = []
+    for _ in range(steps):
+        indices.append(cursor.next_index(total))
+        cursor = ShuffleCursor.decode(cursor.encode())
+    return indices, cursor
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 7, 16, 17, 100, 1000, 4097])
+def test_permute_is_bijection(size):
+    """permute je bijekce na [0, size) pro libovolný klíč"""
+    for key in (0, 1, 0xDEADBEEF, 2 ** 64 - 1):
+        assert sorted(permute(i, size, key) for i in range(size)) == list(range(size))
+
+
+def test_no_repeats_until_exhausted():
+    """Kurzor neopakuje vtip, dokud neprojde celý seznam"""
+    for total in (1, 2, 9, 50, 333):
+        indices, _ = walk(ShuffleCursor.new(total), total, total)
+        assert sorted(indices) == list(range(total))
+
+
+def test_new_cycle_after_exhaustion():
+    """Po vyčerpání začne nový cyklus, opět bez opakování"""
+    total = 40
+    first, cursor = walk(ShuffleCursor.new(total), total, total)
+    second, _ = walk(cursor, total, total)
+    assert sorted(second) == list(range(total))
+
+
+def test_cursor_survives_corpus_growth():
+    """Po nárůstu korpusu kurzor doběhne starý rozsah a pak projde jen nové vtipy"""
+    cursor = ShuffleCursor.new(30)
+    seen, cursor = walk(cursor, 30, 12)
+
+    rest, _ = walk(cursor, 45, 33)
+    assert sorted(seen + rest) == list(range(45))
+    assert all(index >= 30 for index in rest[18:])
+
+
+def test_cursor_survives_corpus_shrink():
+    """Indexy za koncem zmenšeného korpusu se přeskočí"""
+    cursor = ShuffleCursor.new(30)
+    seen, cursor = walk(cursor, 30, 5)
+    rest, _ = walk(cursor, 20, 10)
+    assert all(index < 20 for index in rest)
+    assert len(set(seen + rest)) == len(seen + rest)
+
+
+def test_invalid_tokens():
+    """Poškozený token se odmítne"""
+    for token in ('', 'abc', '!!!!', ShuffleCursor(1, 0, 5, 9).encode()):
+        with pytest.raises(CursorError):
+            ShuffleCursor.decode(token)
+
+
+
+def test_signed_tokens():
+    """Token podepsaný jiným klíčem nebo upravený klientem se odmítne"""
+    token = ShuffleCursor.new(10, b'klic').encode()
+    assert ShuffleCursor.decode(token, b'klic').size == 10
+    with pytest.raises(CursorError):
+        ShuffleCursor.decode(token, b'jiny')
+    raw = bytearray(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    raw[13:17] = (2 ** 32 - 1).to_bytes(4, 'little')  # velikost segmentu
+    with pytest.raises(CursorError):
+        ShuffleCursor.decode(base64.urlsafe_b64encode(bytes(raw)).decode('ascii'), b'klic')
+
+
+def test_walk_is_bounded():
+    """Kurzor, jehož rozsah leží celý za koncem seznamu, skončí CursorError místo nekonečného průchodu"""
+    cursor = ShuffleCursor(1, 2 ** 32 - 2, 2 ** 32 - 1, 0)
+    assert not cursor.fits(23) and ShuffleCursor.new(23).fits(40)
+    with pytest.raises(CursorError):
+        cursor.next_index(23)
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))
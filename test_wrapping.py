@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Testy zalomení pro tiskárny (wrapping.py) a /joke?width=
+Spusť: python -m pytest test_wrapping.py
+"""
+import os
+import unicodedata
+
+import pytest
+
+# Testy nesmí spouštět auto-update ani narážet na rate limit
+os.environ.setdefault('AUTO_UPDATE_ENABLED', 'false')
+
+from app import app, limiter, load_jokes
+from wrapping import WrappedJokes, WrappedView, display_width, wrap_cache, wrap_joke
+
+limiter.enabled = False
+client = app.test_client()
+
+
+@pytest.mark.parametrize('width', [32, 42, 48])
+def test_wrap_fits_and_keeps_author_lines(width):
+    """Každý řádek se vejde do šířky, odřádkování autora a slova zůstanou"""
+    joke = ('Přijde chlap do obchodu a ptá se prodavačky, jestli mají rohlíky.\n'
+            'Prodavačka: "Nemáme."\n\n'
+            'Konec.')
+    wrapped = wrap_joke(joke, width)
+    assert all(display_width(line) <= width for line in wrapped.split('\n'))
+    assert wrapped.split() == joke.split()
+    assert 'Prodavačka: "Nemáme."' in wrapped.split('\n')
+    assert '\n\n' in wrapped
+
+
+def test_wrap_unicode_widths():
+    """Kombinující znaky nezabírají sloupec, široké znaky zabírají dva, dlouhé slovo se rozdělí"""
+    decomposed = unicodedata.normalize('NFD', 'žluťoučký kůň')
+    assert display_width(decomposed) == 13
+    assert wrap_joke(decomposed, 9) == 'žluťoučký\nkůň'
+    assert display_width('漢字') == 4
+    assert wrap_joke('漢字漢字', 5) == '漢字\n漢字'
+    assert wrap_joke('x' * 10, 4) == 'xxxx\nxxxx\nxx'
+
+
+def test_wrapped_jokes_blob():
+    """Zalomené texty jsou v blobu s offsety, prvek je UTF-8 tělo odpovědi"""
+    jokes = ['Krátký vtip.', 'Trochu delší vtip na dva řádky.']
+    wrapped = WrappedJokes(jokes, 16)
+    assert len(wrapped) == 2
+    assert wrapped[1] == wrap_joke(jokes[1], 16).encode('utf-8')
+    assert wrapped[-1] == wrapped[1]
+    assert wrapped.memory() >= sum(len(blob) for blob, _ in wrapped.parts)
+
+
+def test_wrapped_jokes_extended():
+    """Rozšířené texty jsou stejné jako zalomené znovu, původní blob zůstává"""
+    jokes = ['Krátký vtip.', 'Trochu delší vtip na dva řádky.', 'Nový vtip přidaný za běhu.']
+    for width in (16, None):
+        base = WrappedJokes(jokes[:2], width)
+        extended = base.extended(jokes, 2)
+        assert list(extended) == list(WrappedJokes(jokes, width))
+        assert len(base) == 2
+
+    # Přidávání po jednom vtipu nekopíruje celý blob - velká první část zůstává sdílená
+    jokes = [f'Vtip číslo {i} o několika slovech.' for i in range(140)]
+    wrapped = WrappedJokes(jokes[:100], 16)
+    first = wrapped.parts[0][0]
+    for end in range(101, 141):
+        wrapped = wrapped.extended(jokes[:end], end - 1)
+        assert len(wrapped.parts) <= 8
+    assert wrapped.parts[0][0] is first
+    assert list(wrapped) == list(WrappedJokes(jokes, 16))
+
+
+def test_wrapped_view_lru():
+    """Vtipy z mmap/SQLite se zalamují při přístupu, cache je omezená"""
+    jokes = ['Krátký vtip.', 'Trochu delší vtip na dva řádky.', 'Nový vtip přidaný za běhu.']
+    wrap = wrap_cache(2)
+    view = WrappedView(jokes[:2], 16, wrap)
+    assert list(view) == list(WrappedJokes(jokes[:2], 16))
+    extended = view.extended(jokes, 2)
+    assert list(extended) == list(WrappedJokes(jokes, 16)) and view.memory() == 0
+    assert wrap.cache_info().currsize == 2
+
+
+@pytest.mark.parametrize('make', [lambda jokes: WrappedJokes(jokes, 16),
+                                  lambda jokes: WrappedView(jokes, 16, wrap_cache(8))])
+def test_wrapped_line_counts(make):
+    """Index délek zalomených textů počítá řádky po zalomení, i po přidání vtipů"""
+    jokes = ['Krátký vtip.', 'Trochu delší vtip, který se na šestnáct sloupců zalomí na víc řádků.']
+    wrapped = make(jokes[:1])
+    assert list(wrapped.lengths.select(max_lines=1)) == [0]
+    extended = wrapped.extended(jokes, 1)
+    assert list(extended.lengths.select(max_lines=1)) == [0]
+    lines = wrap_joke(jokes[1], 16).count('\n') + 1
+    assert lines > 2 and list(extended.lengths.select(min_lines=lines, max_lines=lines)) == [1]
+
+
+def test_width_respects_max_lines():
+    """S width omezení řádků platí pro zalomený text - vytiskne se nejvýš max_lines řádků"""
+    jokes = load_jokes('cz', 'normal')
+    lines = min(wrap_joke(joke, 32).count('\n') + 1 for joke in jokes)
+    for _ in range(20):
+        response = client.get(f'/joke?lang=cz&width=32&format=text&max_lines={lines}')
+        assert response.get_data(as_text=True).count('\n') + 1 <= lines
+    if lines > 1:
+        assert client.get(f'/joke?lang=cz&width=32&format=text&max_lines={lines - 1}').status_code == 404
+
+
+def test_joke_width_endpoint():
+    """/joke?width=N&format=text vrací zalomený text, JSON nese zalomený vtip, /stats paměť"""
+    joke = load_jokes('sk', 'normal')[0]
+    response = client.get('/joke?lang=sk&width=32&format=text')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert response.get_data(as_text=True) == wrap_joke(joke, 32)
+
+    assert client.get('/joke?lang=sk&width=42').get_json()['joke'] == wrap_joke(joke, 42)
+    response = client.get('/joke?lang=sk&format=text&cursor=new')
+    assert response.get_data(as_text=True) == joke
+    assert response.headers['X-Cursor']
+
+    assert client.get('/joke?width=33').status_code == 400
+    assert client.get('/joke?format=xml').status_code == 400
+    assert client.get('/stats').get_json()['print_cache']['memory_bytes'] > 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,181 @@
+"""
+Zalomení vtipů pro účtenkové tiskárny PrintMasteru (32/42/48 sloupců)
+Zalamuje podle šířky znaků na displeji (kombinující znaky 0, široké znaky 2 sloupce)
+a zachovává odřádkování autora (JOKE_FORMAT.md). Zalomené texty TXT korpusu se připraví
+jednou při načtení pro nastavené šířky a uloží jako UTF-8 blob s tabulkou offsetů; stejně
+se připraví i nezalomené texty pro /joke?format=text. Vtipy ze zkompilovaného korpusu
+a SQLite se zalamují až při přístupu přes omezenou LRU cache (WrappedView).
+"""
+import unicodedata
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence
+from functools import lru_cache, partial
+from itertools import accumulate
+
+from corpus import LazyIndex, RenderedView
+from length_index import LengthIndex
+
+
+def char_width(char):
+    """Počet sloupců, které znak zabere na tiskárně"""
+    if unicodedata.combining(char) or unicodedata.category(char) == 'Cf':
+        return 0
+    return 2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+
+
+def display_width(text):
+    """Šířka textu ve sloupcích"""
+    if text.isascii():
+        return len(text)
+    return sum(char_width(char) for char in text)
+
+
+def split_word(word, width):
+    """Rozdělí slovo delší než řádek - vrátí (část do šířky, zbytek)"""
+    used = 0
+    for position, char in enumerate(word):
+        used += char_width(char)
+        # Alespoň jeden znak na řádek, i když je širší než celý řádek
+        if used > width and position > 0:
+            return word[:position], word[position:]
+    return word, ''
+
+
+def wrap_line(line, width, measure=display_width):
+    """Zalomí jeden řádek autora po slovech, příliš dlouhá slova rozdělí"""
+    lines = []
+    current = []
+    used = 0
+    for word in line.split():
+        size = measure(word)
+        while size > width:
+            if current:
+                lines.append(' '.join(current))
+                current, used = [], 0
+            head, word = split_word(word, width)
+            lines.append(head)
+            size = measure(word)
+        if not word:
+            continue
+        if current and used + 1 + size > width:
+            lines.append(' '.join(current))
+            current, used = [], 0
+        used += size + (1 if current else 0)
+        current.append(word)
+    if current or not lines:
+        lines.append(' '.join(current))
+    return lines
+
+
+def wrap_joke(joke, width):
+    """Zalomí vtip na šířku tiskárny, odřádkování autora zůstávají"""
+    joke = unicodedata.normalize('NFC', joke)
+    # Vtip jen ze znaků o šířce 1 sloupce (čeština, slovenština, angličtina) se měří přes len()
+    measure = len if all(char_width(char) == 1 for char in set(joke)) else display_width
+    return '\n'.join(wrapped for line in joke.split('\n') for wrapped in wrap_line(line, width, measure))
+
+
+def wrap_cache(maxsize):
+    """Omezená LRU cache zalomených těl - wrap(vtip, šířka) vrátí UTF-8 bytes"""
+    @lru_cache(maxsize=maxsize)
+    def wrap(joke, width):
+        return wrap_joke(joke, width).encode('utf-8')
+    return wrap
+
+
+class WrappedJokes(Sequence):
+    """Zalomené vtipy jednoho záznamu pro jednu šířku - UTF-8 bloby a array('I') offsetů
+
+    Prvek je hotové tělo text/plain odpovědi (bytes); paměť je velikost textu plus 4 B
+    na vtip, bez objektu na každý vtip. Šířka None znamená texty bez zalomení.
+    Vtipy přidané přes extended() tvoří další části, poslední části se slévají, když nejsou
+    menší než polovina předchozí - přidání nekopíruje celý blob a částí je O(log n).
+    lengths je index délek a řádků zalomených textů (sestaví se při prvním použití).
+    """
+
+    def __init__(self, jokes, width):
+        self.width = width
+        self._set_parts([self._pack(jokes)])
+        self.lengths = LazyIndex(LengthIndex, RenderedView(self, bytes.decode))
+
+    def _pack(self, jokes):
+        """Zalomí vtipy do jedné části (blob, offsety)"""
+        blob = bytearray()
+        offsets = array('I', [0])
+        for joke in jokes:
+            blob += (wrap_joke(joke, self.width) if self.width else joke).encode('utf-8')
+            offsets.append(len(blob))
+        return bytes(blob), offsets
+
+    def _set_parts(self, parts):
+        self.parts = parts
+        self.ends = list(accumulate(len(offsets) - 1 for _, offsets in parts))
+
+    def extended(self, jokes, start):
+        """Nové texty s vtipy jokes[start:] navíc - staré vtipy se znovu nezalamují ani nekopírují"""
+        parts = self.parts + [self._pack(jokes[index] for index in range(start, len(jokes)))]
+        while len(parts) > 1 and len(parts[-2][0]) <= 2 * len(parts[-1][0]):
+            (blob, offsets), (tail, tail_offsets) = parts[-2:]
+            offsets = array('I', offsets)
+            offsets.extend(offset + len(blob) for offset in tail_offsets[1:])
+            parts[-2:] = [(blob + tail, offsets)]
+
+        wrapped = WrappedJokes.__new__(WrappedJokes)
+        wrapped.width = self.width
+        wrapped._set_parts(parts)
+        wrapped.lengths = self.lengths.extended(RenderedView(wrapped, bytes.decode), start)
+        return wrapped
+
+    def __len__(self):
+        return self.ends[-1]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        part = bisect_right(self.ends, index) if len(self.parts) > 1 else 0
+        blob, offsets = self.parts[part]
+        if part:
+            index -= self.ends[part - 1]
+        return blob[offsets[index]:offsets[index + 1]]
+
+    def memory(self):
+        """Paměť v bajtech (bloby a tabulky offsetů)"""
+        return sum(len(blob) + offsets.buffer_info()[1] * offsets.itemsize for blob, offsets in self.parts)
+
+
+class WrappedView(Sequence):
+    """Zalomené vtipy záznamu z mmap nebo SQLite - zalamují se při přístupu přes LRU cache wrap
+
+    Korpus, který se do paměti nenačítá, by předzalomením pro každou šířku ztratil smysl
+    (start, RSS i reload úměrné celému korpusu). Index délek zalomených textů (lengths)
+    zalomí vtipy mimo cache až při prvním výběru s omezením délky.
+    """
+
+    def __init__(self, jokes, width, wrap, lengths=None):
+        self.width = width
+        self._jokes = jokes
+        self._wrap = wrap
+        self.lengths = lengths or LazyIndex(LengthIndex, RenderedView(jokes, partial(wrap_joke, width=width)))
+
+    def rebound(self, jokes):
+        """Stejné texty nad jinou sekvencí se stejnými vtipy (nový čtecí snímek)"""
+        return WrappedView(jokes, self.width, self._wrap,
+                           self.lengths.rebound(RenderedView(jokes, partial(wrap_joke, width=self.width))))
+
+    def extended(self, jokes, start):
+        """Texty pro jokes, které jsou původní vtipy + nové od start"""
+        return WrappedView(jokes, self.width, self._wrap,
+                           self.lengths.extended(RenderedView(jokes, partial(wrap_joke, width=self.width)), start))
+
+    def __len__(self):
+        return len(self._jokes)
+
+    def __getitem__(self, index):
+        return self._wrap(self._jokes[index], self.width)
+
+    def memory(self):
+        """Paměť v bajtech - texty drží sdílená LRU cache, ne záznam"""
+        return 0